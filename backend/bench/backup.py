@@ -0,0 +1,82 @@
+"""Fotografia do banco em uso: duração e latência de quem grava durante a cópia (services/backup)
+
+    python -m bench.backup [--tickets 2000000] [--interval 0.005]
+
+Uma thread grava uma senha a cada --interval segundos em outra conexão
+enquanto create_snapshot copia o banco, com cada método disponível; por fim
+mede a restauração da última fotografia.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bench.common import make_app, percentile, print_table, seed_tickets
+from src.services import backup
+
+
+def _writer(path, interval, stop, latencies):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA busy_timeout=30000')
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute(
+                "INSERT INTO tickets (ticket_number, category_id, unit_id, status, generated_at) "
+                "VALUES ('B001', 1, 1, 'waiting', datetime('now'))"
+            )
+            conn.commit()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(interval)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=2000000, help='senhas no banco copiado')
+    parser.add_argument('--interval', type=float, default=0.005, help='intervalo entre gravações (s)')
+    args = parser.parse_args()
+
+    methods = ['vacuum', 'backup'] if backup._supports_vacuum_into() else ['backup']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(workdir)
+        seed_tickets(app, args.tickets)
+
+        with app.app_context():
+            path = backup.database_path()
+            print(f'banco: {os.path.getsize(path) / 2 ** 20:.0f} MB')
+
+            rows = []
+            snapshot = None
+            for method in methods:
+                latencies = []
+                stop = threading.Event()
+                writer = threading.Thread(target=_writer, args=(path, args.interval, stop, latencies))
+                writer.start()
+                time.sleep(0.5)
+                try:
+                    snapshot = backup.create_snapshot(method=method)
+                finally:
+                    stop.set()
+                    writer.join()
+
+                rows.append((
+                    method,
+                    f"{snapshot['seconds']:.1f}",
+                    f'{percentile(latencies, 0.5) * 1e3:.2f}',
+                    f'{percentile(latencies, 0.99) * 1e3:.2f}',
+                    f'{max(latencies) * 1e3:.1f}',
+                ))
+            print_table(('método', 'cópia s', 'commit p50 ms', 'p99 ms', 'máx ms'), rows)
+
+            started = time.perf_counter()
+            backup.restore(snapshot['name'])
+            print(f"restauração de {snapshot['size'] / 2 ** 20:.0f} MB: {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Banco padrão descartável antes de importar a aplicação (como nos testes)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app  # noqa: E402
+from src.models.ticket import Ticket  # noqa: E402
+from src.models.user import User, db  # noqa: E402
+from src.services import reference_cache  # noqa: E402
+from src.services.bootstrap import init_database  # noqa: E402
+
+# Utilitários compartilhados pelos benchmarks.
+#
+# Cada benchmark monta a aplicação sobre um diretório temporário (banco,
+# caches e backups), nunca sobre src/database/app.db, e popula a tabela de
+# senhas em lote, sem passar pelo ORM.
+
+SEED_BATCH_SIZE = 50000
+STATUSES = ('finished',) * 8 + ('missed', 'waiting')
+
+
+def make_app(workdir, **config):
+    """Aplicação com banco e diretórios auxiliares dentro de workdir"""
+    database = os.path.join(workdir, 'database')
+    os.makedirs(database, exist_ok=True)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(database, 'app.db')}",
+        'REFERENCE_CACHE_VERSION_FILE': os.path.join(database, 'reference.version'),
+        'REPORT_CACHE_DIR': os.path.join(database, 'report_cache'),
+        'BACKUP_DIR': os.path.join(database, 'backups'),
+        'MAINTENANCE_STAMP_FILE': os.path.join(database, 'maintenance.stamp'),
+        'MAINTENANCE_RUNS_FILE': os.path.join(database, 'maintenance.runs.jsonl'),
+        'UNIT_SHARD_DIR': os.path.join(database, 'units'),
+        'ANNOUNCEMENT_RECORDINGS_DIR': os.path.join(database, 'announcements', 'recordings'),
+        'ANNOUNCEMENT_CACHE_DIR': os.path.join(database, 'announcements', 'cache'),
+        **config,
+    })
+    with app.app_context():
+        init_database()
+        reference_cache.invalidate()
+    return app
+
+
+def seed_tickets(app, count, unit_id=1, status=None, days=90, seed=42):
+    """Insere count senhas distribuídas pelos últimos days dias"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    table = Ticket.__table__
+
+    with app.app_context():
+        inserted = 0
+        while inserted < count:
+            rows = []
+            for number in range(inserted, min(inserted + SEED_BATCH_SIZE, count)):
+                category_id = rng.choice((1, 2, 3))
+                row_status = status or rng.choice(STATUSES)
+                generated_at = now - timedelta(seconds=rng.randrange(days * 86400))
+                called = row_status != 'waiting'
+                service_time = rng.randrange(60, 900) if row_status == 'finished' else None
+                rows.append({
+                    'ticket_number': f"{'NPR'[category_id - 1]}{number % 1000:03d}",
+                    'category_id': category_id,
+                    'unit_id': unit_id,
+                    'counter_id': rng.choice((1, 2, 3)) if called else None,
+                    'status': row_status,
+                    'generated_at': generated_at,
+                    'called_at': generated_at + timedelta(seconds=rng.randrange(30, 1800)) if called else None,
+                    'finished_at': generated_at + timedelta(seconds=1800 + service_time) if service_time else None,
+                    'service_time': service_time,
+                })
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+            inserted += len(rows)
+
+
+def admin_headers(app):
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').first()
+        return {'Authorization': f'Bearer {admin.generate_token()}'}
+
+
+def best_of(fn, repeat=5, number=1):
+    """Menor tempo (segundos) por chamada entre repeat rodadas de number chamadas"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (MB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb():
+    """Memória residente atual do processo (MB); sem /proc, o pico"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print('  '.join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip())
@@ -0,0 +1,80 @@
+"""Vazão e latência de um servidor em execução com clientes keep-alive
+
+    python -m bench.http_load http://127.0.0.1:5000 [--clients 16] [--seconds 10]
+        [--path '/api/tickets/current-display?unit_id=1'] [--token JWT]
+
+Compare o servidor de desenvolvimento (python src/main.py) com o gunicorn
+(gunicorn -c gunicorn.conf.py src.main:app, variando GUNICORN_WORKERS e
+GUNICORN_THREADS). O gerador de carga divide a CPU com o servidor: em uma
+máquina de um núcleo, o ganho de mais workers não aparece.
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from bench.common import percentile, print_table
+
+DEFAULT_PATHS = ('/api/tickets/current-display?unit_id=1',)
+
+
+def _client(url, paths, headers, deadline, latencies, errors):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        if response.status >= 400:
+            errors.append(path)
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='endereço do servidor, ex.: http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=16, help='conexões simultâneas')
+    parser.add_argument('--seconds', type=float, default=10, help='duração da medição')
+    parser.add_argument('--path', action='append', help='rota medida (pode repetir); padrão: painel da unidade 1')
+    parser.add_argument('--token', help='JWT para rotas autenticadas (ex.: /api/tickets/queue?unit_id=1)')
+    args = parser.parse_args()
+
+    paths = args.path or DEFAULT_PATHS
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.seconds
+
+    threads = [
+        threading.Thread(target=_client, args=(args.url, paths, headers, deadline, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print_table(('req/s', 'p50 ms', 'p99 ms', 'erros'), [(
+        f'{len(latencies) / elapsed:.0f}',
+        f'{percentile(latencies, 0.5) * 1e3:.0f}',
+        f'{percentile(latencies, 0.99) * 1e3:.0f}',
+        len(errors),
+    )])
+
+
+if __name__ == '__main__':
+    main()
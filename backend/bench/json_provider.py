@@ -0,0 +1,67 @@
+"""FastJSONProvider contra o provider padrão e leitura por colunas contra ORM
+
+    python -m bench.json_provider [--dicts 500] [--tickets 10000]
+"""
+import argparse
+import tempfile
+
+from flask.json.provider import DefaultJSONProvider
+
+from bench.common import best_of, make_app, print_table, seed_tickets
+from src.models.ticket import Ticket
+from src.models.user import db
+from src.services import read_models, serialization
+from src.services.serialization import FastJSONProvider, ticket_row_to_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dicts', type=int, default=500, help='senhas serializadas por chamada')
+    parser.add_argument('--tickets', type=int, default=10000, help='senhas no histórico lido')
+    args = parser.parse_args()
+
+    if serialization.orjson is None:
+        print('orjson não instalado: FastJSONProvider delega ao provider padrão')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(workdir)
+        seed_tickets(app, args.tickets)
+        fast = FastJSONProvider(app)
+        stock = DefaultJSONProvider(app)
+
+        with app.app_context():
+            ascii_payload = [ticket_row_to_dict(row) for row in read_models.history_rows(1)][:args.dicts]
+            accented_payload = [
+                dict(ticket, category=dict(ticket['category'], name='Preferência'))
+                for ticket in ascii_payload
+            ]
+
+            rows = []
+            for name, payload in (('ASCII', ascii_payload), ('com "Preferência"', accented_payload)):
+                assert fast.dumpb(payload) == stock.dumps(payload, separators=(',', ':')).encode('utf-8')
+                rows.append((
+                    name,
+                    f'{best_of(lambda: fast.dumpb(payload)) * 1e3:.2f}',
+                    f"{best_of(lambda: stock.dumps(payload, separators=(',', ':'))) * 1e3:.2f}",
+                ))
+            print_table((f'{len(ascii_payload)} senhas', 'fast ms', 'padrão ms'), rows)
+
+            # Histórico completo: objetos ORM + to_dict() contra tuplas de colunas
+            def orm():
+                result = [ticket.to_dict() for ticket in Ticket.query.filter_by(unit_id=1).order_by(
+                    Ticket.generated_at.desc()).all()]
+                db.session.remove()
+                return result
+
+            def columns():
+                return [ticket_row_to_dict(row) for row in read_models.history_rows(1)]
+
+            print()
+            print_table((f'{args.tickets} senhas', 'ms'), [
+                ('ORM + to_dict', f'{best_of(orm, repeat=3) * 1e3:.0f}'),
+                ('colunas + ticket_row_to_dict', f'{best_of(columns, repeat=3) * 1e3:.0f}'),
+            ])
+
+
+if __name__ == '__main__':
+    main()
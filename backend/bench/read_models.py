@@ -0,0 +1,91 @@
+"""Memória e tempo do histórico: objetos ORM contra leitura por colunas (services/read_models)
+
+    python -m bench.read_models [--tickets 1000000] [--tracemalloc]
+
+Cada variante roda em um processo próprio, para que o pico de memória de uma
+não conte na outra; o banco é populado uma única vez.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench.common import current_rss_mb, make_app, peak_rss_mb, print_table, seed_tickets
+from src.models.ticket import Ticket
+from src.services import read_models
+from src.services.serialization import ticket_row_to_dict
+
+
+def _orm_rows():
+    return Ticket.query.filter_by(unit_id=1).order_by(Ticket.generated_at.desc()).all()
+
+
+VARIANTS = {
+    'orm': lambda: _orm_rows(),
+    'colunas': lambda: list(read_models.history_rows(1)),
+    'orm + to_dict': lambda: [ticket.to_dict() for ticket in _orm_rows()],
+    'colunas + ticket_row_to_dict': lambda: [ticket_row_to_dict(row) for row in read_models.history_rows(1)],
+}
+
+
+def run_variant(workdir, variant, trace):
+    app = make_app(workdir)
+    with app.app_context():
+        # Aquece o cache de referência fora da medição
+        ticket_row_to_dict(next(iter(read_models.history_rows(1))))
+
+        baseline = current_rss_mb()
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = VARIANTS[variant]()
+        seconds = time.perf_counter() - started
+        traced = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace else None
+
+    print(json.dumps({
+        'rows': len(result),
+        'seconds': seconds,
+        'rss_mb': peak_rss_mb() - baseline,
+        'traced_mb': traced,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=1000000, help='senhas no histórico')
+    parser.add_argument('--tracemalloc', action='store_true', help='também mede o pico com tracemalloc (mais lento)')
+    parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.workdir, args.variant, args.tracemalloc)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        seed_tickets(make_app(workdir), args.tickets)
+        print(f'{args.tickets} senhas inseridas em {time.perf_counter() - started:.1f} s')
+
+        rows = []
+        for variant in VARIANTS:
+            command = [sys.executable, '-m', 'bench.read_models', '--variant', variant, '--workdir', workdir]
+            if args.tracemalloc:
+                command.append('--tracemalloc')
+            output = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+            row = (variant, output['rows'], f"{output['seconds']:.1f}", f"{output['rss_mb']:.0f}")
+            if args.tracemalloc:
+                row += (f"{output['traced_mb']:.0f}",)
+            rows.append(row)
+
+        headers = ('variante', 'linhas', 's', 'RSS MB')
+        if args.tracemalloc:
+            headers += ('tracemalloc MB',)
+        print_table(headers, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Tamanho e custo de serialização da fila em cada formato (services/wire_format)
+
+    python -m bench.wire_format [--tickets 30]
+"""
+import argparse
+import json
+import tempfile
+
+from bench.common import admin_headers, best_of, make_app, print_table, seed_tickets
+from src.services import wire_format
+
+VARIANTS = (
+    ('json', 'application/json', 'identity'),
+    ('json+gzip', 'application/json', 'gzip'),
+    ('compact', wire_format.COMPACT_MIMETYPE, 'identity'),
+    ('compact+gzip', wire_format.COMPACT_MIMETYPE, 'gzip'),
+    ('compact+br', wire_format.COMPACT_MIMETYPE, 'br'),
+    ('msgpack', wire_format.MSGPACK_MIMETYPE, 'identity'),
+    ('msgpack+br', wire_format.MSGPACK_MIMETYPE, 'br'),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=30, help='senhas aguardando na fila')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(workdir)
+        seed_tickets(app, args.tickets, status='waiting', days=1)
+        client = app.test_client()
+        headers = admin_headers(app)
+
+        rows = []
+        for name, accept, encoding in VARIANTS:
+            request_headers = dict(headers, Accept=accept, **{'Accept-Encoding': encoding})
+            response = client.get('/api/tickets/queue?unit_id=1', headers=request_headers)
+            rows.append((name, response.headers.get('Content-Encoding', '-'), len(response.get_data())))
+        print_table(('formato', 'codificação', 'bytes'), rows)
+
+        # Só a serialização do payload já montado, sem a rota
+        payload = client.get('/api/tickets/queue?unit_id=1', headers=headers).get_json()
+        with app.app_context():
+            timings = (
+                ('jsonify', lambda: app.json.response(payload)),
+                ('compact', lambda: json.dumps(
+                    wire_format.compact_payload(payload), ensure_ascii=False, separators=(',', ':'))),
+            )
+            if wire_format.msgpack is not None:
+                timings += (('msgpack', lambda: wire_format.msgpack.packb(
+                    wire_format.compact_payload(payload), use_bin_type=True)),)
+            print()
+            print_table(('serialização', 'µs'), [
+                (name, f'{best_of(fn, repeat=5, number=200) * 1e6:.1f}') for name, fn in timings
+            ])
+
+
+if __name__ == '__main__':
+    main()
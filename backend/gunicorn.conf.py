@@ -0,0 +1,62 @@
+# Configuração do gunicorn para produção (usada por start_backend.sh):
+#
+#   gunicorn -c gunicorn.conf.py src.main:app
+#
+# A aplicação é carregada uma vez no processo mestre (preload_app) e os
+# workers são criados por fork, compartilhando o código já importado. Cada
+# worker atende várias requisições ao mesmo tempo em threads (gthread), o que
+# acomoda as esperas longas de /api/tickets/events e /api/display/wall (até
+# LONG_POLL_MAX_WAIT, 10 s) e as leituras em WAL.
+#
+# Recarregar sem derrubar conexões: com preload_app o sinal HUP não relê o
+# código; use reload_backend.sh (USR2 sobe um novo mestre com o código novo,
+# QUIT encerra o antigo depois que as requisições em andamento terminam).
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+pidfile = os.environ.get('GUNICORN_PIDFILE', 'gunicorn.pid')
+
+# Requisições longas: as esperas de eventos e do painel duram no máximo 10 s
+# (LONG_POLL_MAX_WAIT) e os relatórios rodam no pool de jobs, com a requisição
+# esperando só REPORT_JOB_WAIT; a folga cobre o histórico completo de senhas,
+# a rota síncrona mais lenta
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla workers periodicamente (com variação para não reiniciarem juntos)
+max_requests = 5000
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def when_ready(server):
+    # Manifesto dos arquivos estáticos montado antes do fork, herdado pelos workers
+    from src.main import app
+    from src.services import static_assets
+    static_assets.get_manifest(app)
+
+
+def post_fork(server, worker):
+    # Conexões abertas pelo mestre não podem ser usadas pelo processo filho
+    from src.main import app
+    from src.models.user import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Agendadores de backup, manutenção, réplica, nó local e anúncios em um único
+    # worker (trava em arquivo), nunca no mestre: o mestre segue fazendo fork e
+    # um fork com uma thread segurando uma trava deixaria o filho com ela presa
+    from src.main import app, claim_background_tasks
+    claim_background_tasks(app)
@@ -1,11 +1,18 @@
 import os
 import sys
+import threading
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.user import db
+from src.services.serialization import FastJSONProvider
+from src.services import announcements, backup, edge, maintenance, replica, shards, static_assets
+from src.services.bootstrap import init_database, init_db_command
+from src.services.sql import configure_sqlite
 
 # Importar todos os modelos para criar as tabelas
 from src.models.user import User
@@ -14,6 +21,13 @@ from src.models.counter import Counter
 from src.models.category import Category
 from src.models.ticket import Ticket
 from src.models.display_settings import DisplaySettings
+from src.models.idempotency_key import IdempotencyKey
+from src.models.unit_watermark import UnitWatermark
+from src.models.quantile_bucket import QuantileBucket
+from src.models.ticket_event import TicketEvent
+from src.models.edge_cursor import EdgeCursor
+from src.models.counter_session import CounterSession
+from src.models.counter_usage import CounterUsage
 
 # Importar todas as rotas
 from src.routes.user import user_bp
@@ -22,100 +36,234 @@ from src.routes.units import units_bp
 from src.routes.counters import counters_bp
 from src.routes.categories import categories_bp
 from src.routes.tickets import tickets_bp
-from src.routes.reports import reports_bp
 from src.routes.display import display_bp
+from src.routes.sync import sync_bp
+from src.routes.lazy import LazyBlueprint
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Habilitar CORS para todas as rotas
-CORS(app, origins="*")
-
-# Registrar blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(units_bp, url_prefix='/api')
-app.register_blueprint(counters_bp, url_prefix='/api')
-app.register_blueprint(categories_bp, url_prefix='/api')
-app.register_blueprint(tickets_bp, url_prefix='/api')
-app.register_blueprint(reports_bp, url_prefix='/api')
-app.register_blueprint(display_bp, url_prefix='/api')
-
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Criar tabelas e dados iniciais
-with app.app_context():
-    db.create_all()
-    
-    # Criar dados iniciais se não existirem
-    if not User.query.first():
-        # Criar usuário admin padrão
-        admin = User(
-            username='admin',
-            email='admin@sistema.com',
-            role='admin'
-        )
-        admin.set_password('admin123')
-        db.session.add(admin)
-        
-        # Criar unidade padrão
-        unit = Unit(
-            name='Unidade Principal',
-            address='Endereço da unidade principal'
-        )
-        db.session.add(unit)
-        db.session.flush()  # Para obter o ID da unidade
-        
-        # Associar admin à unidade
-        admin.unit_id = unit.id
-        
-        # Criar categorias padrão
-        categories = [
-            Category(name='Normal', prefix='N', priority=1, unit_id=unit.id),
-            Category(name='Preferencial', prefix='P', priority=2, unit_id=unit.id),
-            Category(name='Urgência', prefix='U', priority=3, unit_id=unit.id)
-        ]
-        for category in categories:
-            db.session.add(category)
-        
-        # Criar guichês padrão
-        counters = [
-            Counter(name='Guichê 01', unit_id=unit.id),
-            Counter(name='Guichê 02', unit_id=unit.id),
-            Counter(name='Caixa 01', unit_id=unit.id)
-        ]
-        for counter in counters:
-            db.session.add(counter)
-        
-        # Criar configurações do painel
-        display_settings = DisplaySettings(
-            unit_id=unit.id,
-            message='Bem-vindos ao nosso atendimento!'
-        )
-        db.session.add(display_settings)
+def create_app(config=None):
+    """Cria a aplicação Flask (sem tocar no banco: use "flask init-db")"""
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    
+    # Serialização JSON com orjson (quando instalado)
+    app.json = FastJSONProvider(app)
+    
+    # Habilitar CORS para todas as rotas
+    CORS(app, origins="*")
+    
+    # Registrar blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(units_bp, url_prefix='/api')
+    app.register_blueprint(counters_bp, url_prefix='/api')
+    app.register_blueprint(categories_bp, url_prefix='/api')
+    app.register_blueprint(tickets_bp, url_prefix='/api')
+    app.register_blueprint(display_bp, url_prefix='/api')
+    app.register_blueprint(sync_bp, url_prefix='/api')
+    
+    # Relatórios e manutenção (e o numpy da previsão) só são importados no primeiro uso
+    LazyBlueprint('src.routes.reports', 'reports_bp', '/api').register(app, '/reports/<path:subpath>')
+    LazyBlueprint('src.routes.maintenance', 'maintenance_bp', '/api').register(
+        app, '/maintenance', '/maintenance/<path:subpath>'
+    )
+    
+    # Configuração do banco de dados
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Cache de dados de referência (versão compartilhada entre workers)
+    app.config['REFERENCE_CACHE_VERSION_FILE'] = os.path.join(os.path.dirname(__file__), 'database', 'reference.version')
+    app.config['REFERENCE_CACHE_CHECK_INTERVAL'] = 1.0
+    
+    # Excluir unidade/categoria/guichê com histórico apenas o arquiva
+    app.config['ARCHIVE_ON_DELETE'] = True
+    
+    # Validade das chaves de idempotência na emissão de senhas (segundos)
+    app.config['IDEMPOTENCY_TTL'] = 24 * 3600
+    
+    # Relatórios em segundo plano: threads dedicadas e resultados em disco
+    app.config['REPORT_JOB_WORKERS'] = 2
+    # Quanto a requisição espera pelo job antes de responder 202 (segundos)
+    app.config['REPORT_JOB_WAIT'] = 0.5
+    app.config['REPORT_CACHE_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'report_cache')
+    # Limites dos resultados em disco (versões superadas são apagadas após alguns minutos)
+    app.config['REPORT_CACHE_MAX_AGE_HOURS'] = 24
+    app.config['REPORT_CACHE_MAX_MB'] = 256
+    
+    # Fuso horário das unidades: a previsão agrupa as senhas por dia da semana e horário locais
+    app.config['LOCAL_TIMEZONE'] = os.environ.get('LOCAL_TIMEZONE', 'America/Sao_Paulo')
+    
+    # Cache de relatórios em memória: idade máxima da marca d'água local (segundos)
+    app.config['REPORT_CACHE_WATERMARK_MAX_AGE'] = 1.0
+    
+    # Painéis públicos: idade máxima da marca d'água usada pelos snapshots das unidades (segundos)
+    app.config['DISPLAY_SNAPSHOT_MAX_AGE'] = 1.0
+    
+    # Espera longa (?wait=) em painéis e eventos: requisições esperando ao mesmo
+    # tempo por worker (cada uma ocupa uma thread) e espera máxima (segundos)
+    app.config['LONG_POLL_MAX_WAITERS'] = 2
+    app.config['LONG_POLL_MAX_WAIT'] = 10
+    
+    # Anúncios falados: TTS local (ex.: 'espeak-ng -v pt-br -w {output} {text}') e/ou
+    # gravações <trecho>.wav; trechos gerados ficam em disco, anúncios montados em memória
+    app.config['ANNOUNCEMENT_TTS_COMMAND'] = os.environ.get('ANNOUNCEMENT_TTS_COMMAND')
+    app.config['ANNOUNCEMENT_RECORDINGS_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'announcements', 'recordings')
+    app.config['ANNOUNCEMENT_CACHE_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'announcements', 'cache')
+    app.config['ANNOUNCEMENT_GAP_MS'] = 150
+    app.config['ANNOUNCEMENT_MEMORY_ITEMS'] = 256
+    
+    # Backups com o serviço em funcionamento: intervalo (horas, 0 desativa) e quantidade mantida
+    app.config['BACKUP_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'backups')
+    app.config['BACKUP_INTERVAL_HOURS'] = 24
+    app.config['BACKUP_KEEP'] = 14
+    
+    # Manutenção do banco (ANALYZE, vacuum incremental, integridade) na janela de pouco movimento
+    app.config['MAINTENANCE_WINDOW'] = '02:00-05:00'
+    app.config['MAINTENANCE_INTERVAL_HOURS'] = 24
+    app.config['MAINTENANCE_IDLE_SECONDS'] = 120
+    app.config['MAINTENANCE_MAX_SECONDS'] = 600
+    app.config['MAINTENANCE_STAMP_FILE'] = os.path.join(os.path.dirname(__file__), 'database', 'maintenance.stamp')
+    app.config['MAINTENANCE_RUNS_FILE'] = os.path.join(os.path.dirname(__file__), 'database', 'maintenance.runs.jsonl')
+    
+    # Trava que escolhe o worker do gunicorn que roda as tarefas de segundo plano
+    app.config['BACKGROUND_LOCK_FILE'] = os.path.join(os.path.dirname(__file__), 'database', 'background.lock')
+    
+    # Hash de senhas (formato do werkzeug; senhas antigas são regravadas no login)
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+    # Verificações de senha simultâneas e máximo aguardando (acima disso, 503)
+    app.config['PASSWORD_VERIFY_WORKERS'] = 1
+    app.config['PASSWORD_VERIFY_MAX_PENDING'] = 16
+    # Falhas de login permitidas por (quantidade, segundos) por IP e por usuário
+    app.config['LOGIN_RATE_LIMIT_IP'] = (20, 60)
+    app.config['LOGIN_RATE_LIMIT_USER'] = (5, 300)
+    # Proxies reversos confiáveis na frente da aplicação (0 = acesso direto; o nginx instalado
+    # com USE_NGINX=1 grava 1 em proxy.env): o IP do cliente (limite de login por IP) vem do
+    # X-Forwarded-For que eles gravam. Sem proxy, o cabeçalho vem do cliente e é ignorado
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+    
+    # Réplica de leitura para relatórios e histórico: URL de uma réplica (ex.: Postgres)
+    # ou, no SQLite, cópia renovada a cada REPLICA_SNAPSHOT_SECONDS (0 desativa)
+    app.config['REPLICA_DATABASE_URL'] = os.environ.get('REPLICA_DATABASE_URL')
+    app.config['REPLICA_SNAPSHOT_SECONDS'] = 0
+    app.config['REPLICA_SNAPSHOT_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'replica.db')
+    # Atraso máximo tolerado (acima disso, leituras no principal) e intervalo da medição
+    app.config['REPLICA_MAX_LAG_SECONDS'] = 300
+    app.config['REPLICA_CHECK_SECONDS'] = 5
+    
+    # Um banco SQLite por unidade para senhas e eventos (converter com "flask shards migrate")
+    app.config['UNIT_SHARDS'] = os.environ.get('UNIT_SHARDS') == '1'
+    app.config['UNIT_SHARD_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'units')
+    app.config['UNIT_SHARD_FANOUT_WORKERS'] = 4
+    
+    # Nó local da filial: unidade atendida, servidor central e token da unidade
+    # (emitido no central com "flask edge token <unit_id>")
+    app.config['EDGE_UNIT_ID'] = int(os.environ['EDGE_UNIT_ID']) if os.environ.get('EDGE_UNIT_ID') else None
+    app.config['EDGE_CENTRAL_URL'] = os.environ.get('EDGE_CENTRAL_URL')
+    app.config['EDGE_SYNC_TOKEN'] = os.environ.get('EDGE_SYNC_TOKEN')
+    # No central: segredo do qual saem os tokens de cada unidade; ativa o
+    # recebimento de eventos dos nós (exige UNIT_SHARDS)
+    app.config['EDGE_SYNC_SECRET'] = os.environ.get('EDGE_SYNC_SECRET')
+    # Intervalo de envio dos eventos, eventos por lote e intervalo de cópia dos dados de referência
+    app.config['EDGE_SYNC_SECONDS'] = 5
+    app.config['EDGE_SYNC_BATCH'] = 1000
+    app.config['EDGE_REFERENCE_SECONDS'] = 300
+    app.config['EDGE_HTTP_TIMEOUT'] = 10
+    
+    # Overrides (testes, outro banco)
+    if config:
+        app.config.update(config)
+    
+    # IP e esquema do cliente a partir dos cabeçalhos do proxy reverso
+    if app.config['TRUSTED_PROXY_HOPS']:
+        hops = app.config['TRUSTED_PROXY_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    
+    replica.configure(app)
+    db.init_app(app)
+    
+    # Pragmas do SQLite em cada conexão nova (sem abrir conexão agora)
+    with app.app_context():
+        configure_sqlite(db.engine)
+        replica.configure_engine()
+    
+    # Direciona cada requisição ao banco da unidade (modo UNIT_SHARDS)
+    app.before_request(shards.route_request)
+    app.teardown_request(shards.end_request)
+    
+    # Comandos "flask init-db", "flask backup ...", "flask maintenance ...", "flask assets ...",
+    # "flask shards ...", "flask edge ..." e "flask announcements ..."
+    app.cli.add_command(backup.backup_cli)
+    app.cli.add_command(maintenance.maintenance_cli)
+    app.cli.add_command(static_assets.assets_cli)
+    app.cli.add_command(shards.shards_cli)
+    app.cli.add_command(edge.edge_cli)
+    app.cli.add_command(announcements.announcements_cli)
+    app.cli.add_command(init_db_command)
+    
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
         
-        db.session.commit()
-        print("Dados iniciais criados com sucesso!")
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+        # Manifesto em memória: ETag, variantes .br/.gz e cabeçalhos de cache
+        return static_assets.serve(path)
+    
+    return app
+
+
+def start_background_tasks(app):
+    """Agendadores e threads de segundo plano (um processo por servidor): backup, manutenção,
+    cópia da réplica, sincronização do nó local e geração dos trechos de anúncio"""
+    backup.start_scheduler(app)
+    maintenance.start_scheduler(app)
+    replica.start_refresher(app)
+    edge.start_sync(app)
+    announcements.start_renderer(app)
+
+
+BACKGROUND_CLAIM_INTERVAL = 10
+_background_lock = None
+
+
+def claim_background_tasks(app):
+    """Em cada worker do gunicorn: o que obtiver BACKGROUND_LOCK_FILE roda start_background_tasks
+
+    A trava (flock) é liberada quando o worker termina (reciclagem por
+    max_requests, reinício); os demais tentam de novo a cada
+    BACKGROUND_CLAIM_INTERVAL segundos e um deles assume as tarefas.
+    """
+    import fcntl
+
+    def loop():
+        global _background_lock
+        handle = open(app.config['BACKGROUND_LOCK_FILE'], 'a')
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                time.sleep(BACKGROUND_CLAIM_INTERVAL)
+                continue
+            # Mantém o arquivo aberto (e a trava) enquanto o processo existir
+            _background_lock = handle
+            app.logger.info('Tarefas de segundo plano no worker %d', os.getpid())
+            start_background_tasks(app)
+            return
+
+    threading.Thread(target=loop, name='background-claim', daemon=True).start()
+
+
+# Instância usada por "gunicorn src.main:app" e "flask --app src.main"
+app = create_app()
 
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção use start_backend.sh (gunicorn.conf.py)
+    with app.app_context():
+        init_database()
+    start_background_tasks(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
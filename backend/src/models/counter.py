@@ -10,19 +10,30 @@ class Counter(db.Model):
     unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    archived_at = db.Column(db.DateTime, nullable=True)  # exclusão lógica
     
     # Relacionamentos
-    tickets = db.relationship('Ticket', backref='counter', lazy=True)
+    tickets = db.relationship('Ticket', backref='counter', lazy='dynamic')
     
     def __repr__(self):
         return f'<Counter {self.name}>'
     
+    def has_tickets(self):
+        """Verifica via EXISTS se há senhas relacionadas, sem carregá-las"""
+        return db.session.query(self.tickets.exists()).scalar()
+    
+    def archive(self):
+        """Exclusão lógica: desativa e oculta o registro sem tocar no histórico"""
+        self.is_active = False
+        self.archived_at = datetime.utcnow()
+    
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'unit_id': self.unit_id,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
         }
 
@@ -0,0 +1,51 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+from datetime import datetime
+
+class CounterSession(db.Model):
+    __tablename__ = 'counter_sessions'
+    
+    # Período em que um atendente ocupa um guichê (abertura, pausas, fechamento)
+    id = db.Column(db.Integer, primary_key=True)
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), nullable=False)
+    counter_id = db.Column(db.Integer, db.ForeignKey('counters.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    opened_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime, nullable=True)
+    
+    # Pausa em andamento (None = disponível) e total de pausas já encerradas
+    paused_at = db.Column(db.DateTime, nullable=True)
+    paused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Até onde o tempo da sessão já foi somado em counter_usage
+    accounted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # No máximo uma sessão aberta por guichê
+    __table_args__ = (
+        db.Index('uq_counter_sessions_open', 'counter_id', unique=True,
+                 sqlite_where=db.text('closed_at IS NULL'), postgresql_where=db.text('closed_at IS NULL')),
+        db.Index('ix_counter_sessions_unit_opened_at', 'unit_id', 'opened_at'),
+    )
+    
+    def __repr__(self):
+        return f'<CounterSession {self.counter_id}:{self.user_id}>'
+    
+    @property
+    def status(self):
+        if self.closed_at:
+            return 'closed'
+        return 'paused' if self.paused_at else 'open'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'unit_id': self.unit_id,
+            'counter_id': self.counter_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'opened_at': self.opened_at.isoformat() if self.opened_at else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'paused_at': self.paused_at.isoformat() if self.paused_at else None,
+            'paused_seconds': self.paused_seconds
+        }
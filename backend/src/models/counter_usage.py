@@ -0,0 +1,21 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+
+class CounterUsage(db.Model):
+    __tablename__ = 'counter_usage'
+    
+    # Uso de cada guichê por hora (UTC) e atendente, somado a cada transição
+    # de sessão e a cada atendimento finalizado (services/counter_usage)
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.SmallInteger, primary_key=True)
+    counter_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 = sem sessão aberta
+    
+    available_seconds = db.Column(db.Integer, nullable=False, default=0)  # sessão aberta, fora de pausas
+    paused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    busy_seconds = db.Column(db.Integer, nullable=False, default=0)  # da chamada à finalização
+    tickets = db.Column(db.Integer, nullable=False, default=0)  # atendimentos finalizados
+    
+    def __repr__(self):
+        return f'<CounterUsage {self.counter_id} {self.day} {self.hour}h>'
@@ -3,20 +3,33 @@ from src.models.user import db
 from datetime import datetime
 import json
 
+# Valores padrão usados quando a unidade ainda não salvou configurações
+DEFAULT_SETTINGS = {
+    'message': 'Bem-vindos!',
+    'show_last_tickets_count': 5,
+    'sound_enabled': True,
+    'theme': 'light'
+}
+
 class DisplaySettings(db.Model):
     __tablename__ = 'display_settings'
     
     id = db.Column(db.Integer, primary_key=True)
     unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), nullable=False)
-    message = db.Column(db.Text, default='Bem-vindos!')
-    show_last_tickets_count = db.Column(db.Integer, default=5)
-    sound_enabled = db.Column(db.Boolean, default=True)
-    theme = db.Column(db.String(20), default='light')  # light, dark
+    message = db.Column(db.Text, default=DEFAULT_SETTINGS['message'])
+    show_last_tickets_count = db.Column(db.Integer, default=DEFAULT_SETTINGS['show_last_tickets_count'])
+    sound_enabled = db.Column(db.Boolean, default=DEFAULT_SETTINGS['sound_enabled'])
+    theme = db.Column(db.String(20), default=DEFAULT_SETTINGS['theme'])  # light, dark
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamento
     unit = db.relationship('Unit', backref='display_settings')
     
+    # Uma única configuração por unidade (permite upsert por unit_id)
+    __table_args__ = (
+        db.Index('uq_display_settings_unit_id', 'unit_id', unique=True),
+    )
+    
     def __repr__(self):
         return f'<DisplaySettings for Unit {self.unit_id}>'
     
@@ -30,4 +43,14 @@ class DisplaySettings(db.Model):
             'theme': self.theme,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+    
+    @staticmethod
+    def default_dict(unit_id):
+        """Configurações padrão de uma unidade sem registro salvo (sem acessar o banco)"""
+        return {
+            **DEFAULT_SETTINGS,
+            'id': None,
+            'unit_id': unit_id,
+            'updated_at': None
+        }
 
@@ -0,0 +1,25 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+from datetime import datetime
+
+class EdgeCursor(db.Model):
+    __tablename__ = 'edge_cursors'
+
+    # Unidade operada por um nó local (services/edge): último seq do registro
+    # de eventos do nó já aplicado no servidor central
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+    registered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<EdgeCursor {self.unit_id}:{self.last_seq}>'
+
+    def to_dict(self):
+        return {
+            'unit_id': self.unit_id,
+            'last_seq': self.last_seq,
+            'registered_at': self.registered_at.isoformat() if self.registered_at else None,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None
+        }
@@ -0,0 +1,18 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+
+class QuantileBucket(db.Model):
+    __tablename__ = 'quantile_buckets'
+    
+    # Esboço de quantis (estilo DDSketch) por unidade, dia, categoria e guichê:
+    # cada linha é um intervalo logarítmico de valores e quantas amostras caíram nele
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(10), primary_key=True)  # service, wait
+    category_id = db.Column(db.Integer, primary_key=True)
+    counter_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 = sem guichê
+    bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<QuantileBucket {self.metric} {self.day} #{self.bucket}>'
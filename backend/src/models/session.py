@@ -0,0 +1,30 @@
+from contextvars import ContextVar
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+# Engine para onde vão as leituras do contexto atual (None = banco principal).
+# Definido por services/replica.reads() nas rotas de relatório e histórico.
+read_engine = ContextVar('read_engine', default=None)
+
+# Banco da unidade do contexto atual no modo UNIT_SHARDS (services/shards):
+# recebe todas as instruções, leituras e escritas.
+unit_engine = ContextVar('unit_engine', default=None)
+
+
+class RoutingSession(Session):
+    """Sessão que envia as instruções ao banco da unidade (unit_engine) ou as
+    leituras à réplica (read_engine)
+
+    Com réplica, escritas (flush de objetos e INSERT/UPDATE/DELETE explícitos)
+    sempre vão para o banco principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = unit_engine.get()
+        if shard is not None and bind is None:
+            return shard
+
+        engine = read_engine.get()
+        if engine is not None and bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
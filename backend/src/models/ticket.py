@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from src.models.user import db
+from src.services import reference_cache
 from datetime import datetime
 
 class Ticket(db.Model):
@@ -7,9 +8,9 @@ class Ticket(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     ticket_number = db.Column(db.String(10), nullable=False)  # Ex: 'N001', 'P005'
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False, index=True)
     unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), nullable=False)
-    counter_id = db.Column(db.Integer, db.ForeignKey('counters.id'), nullable=True)
+    counter_id = db.Column(db.Integer, db.ForeignKey('counters.id'), nullable=True, index=True)
     
     # Status: waiting, calling, called, finished, missed
     status = db.Column(db.String(20), default='waiting', nullable=False)
@@ -22,6 +23,11 @@ class Ticket(db.Model):
     # Tempo de atendimento em segundos
     service_time = db.Column(db.Integer, nullable=True)
     
+    # Consultas por unidade e período (fila do dia, dashboard, relatórios)
+    __table_args__ = (
+        db.Index('ix_tickets_unit_generated_at', 'unit_id', 'generated_at'),
+    )
+    
     def __repr__(self):
         return f'<Ticket {self.ticket_number}>'
     
@@ -37,8 +43,8 @@ class Ticket(db.Model):
             'called_at': self.called_at.isoformat() if self.called_at else None,
             'finished_at': self.finished_at.isoformat() if self.finished_at else None,
             'service_time': self.service_time,
-            'category': self.category.to_dict() if self.category else None,
-            'counter': self.counter.to_dict() if self.counter else None
+            'category': reference_cache.get_dict('category', self.category_id),
+            'counter': reference_cache.get_dict('counter', self.counter_id)
         }
     
     def calculate_service_time(self):
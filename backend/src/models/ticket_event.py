@@ -0,0 +1,23 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+
+class TicketEvent(db.Model):
+    __tablename__ = 'ticket_events'
+
+    # Registro somente de inserção: cada transição de senha é uma linha nova.
+    # seq é crescente e nunca reutilizado (AUTOINCREMENT), servindo de cursor.
+    seq = db.Column(db.Integer, primary_key=True)
+    unit_id = db.Column(db.Integer, nullable=False)
+    ticket_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.SmallInteger, nullable=False)  # ver services/events.KINDS
+    category_id = db.Column(db.Integer, nullable=False)
+    counter_id = db.Column(db.Integer, nullable=True)
+    at = db.Column(db.BigInteger, nullable=False)  # milissegundos desde 1970 (UTC)
+
+    __table_args__ = (
+        db.Index('ix_ticket_events_unit_seq', 'unit_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<TicketEvent {self.seq}>'
@@ -9,20 +9,40 @@ class Unit(db.Model):
     name = db.Column(db.String(100), nullable=False)
     address = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    archived_at = db.Column(db.DateTime, nullable=True)  # exclusão lógica
     
     # Relacionamentos
-    counters = db.relationship('Counter', backref='unit', lazy=True, cascade='all, delete-orphan')
-    categories = db.relationship('Category', backref='unit', lazy=True, cascade='all, delete-orphan')
-    tickets = db.relationship('Ticket', backref='unit', lazy=True, cascade='all, delete-orphan')
+    counters = db.relationship('Counter', backref='unit', lazy='dynamic', cascade='all, delete-orphan')
+    categories = db.relationship('Category', backref='unit', lazy='dynamic', cascade='all, delete-orphan')
+    tickets = db.relationship('Ticket', backref='unit', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Unit {self.name}>'
     
+    def has_dependents(self):
+        """Verifica via EXISTS se há guichês, categorias ou senhas, sem carregá-los"""
+        return any(
+            db.session.query(relation.exists()).scalar()
+            for relation in (self.counters, self.categories, self.tickets)
+        )
+    
+    def archive(self):
+        """Exclusão lógica: a unidade sai das listagens, o histórico é mantido
+
+        Guichês e categorias da unidade são arquivados junto, para que não
+        continuem emitindo nem chamando senhas.
+        """
+        self.archived_at = datetime.utcnow()
+        for relation in (self.counters, self.categories):
+            for item in relation.filter_by(archived_at=None):
+                item.archive()
+    
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'address': self.address,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
         }
 
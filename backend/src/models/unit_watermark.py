@@ -0,0 +1,25 @@
+from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
+from datetime import datetime
+
+class UnitWatermark(db.Model):
+    __tablename__ = 'unit_watermarks'
+    
+    # Versão dos dados de senhas da unidade: incrementada a cada alteração
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Incrementada só quando muda uma senha de dia já encerrado
+    history_version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UnitWatermark {self.unit_id}:{self.version}>'
+    
+    def to_dict(self):
+        return {
+            'unit_id': self.unit_id,
+            'version': self.version,
+            'history_version': self.history_version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,10 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from datetime import datetime
 import jwt
 import os
+from src.models.session import RoutingSession
+from src.services.passwords import hash_password
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -26,7 +28,7 @@ class User(db.Model):
     
     def set_password(self, password):
         """Define a senha do usuário com hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Verifica se a senha está correta"""
@@ -1,9 +1,23 @@
-from flask import Blueprint, jsonify, request
+import hmac
+import math
+from flask import Blueprint, current_app, jsonify, request
 from functools import wraps
 from src.models.user import User, db
+from src.services import edge, passwords
+from src.services.rate_limit import SlidingWindowLimiter
 
 auth_bp = Blueprint('auth', __name__)
 
+# Limitadores de falhas de login, criados a partir da configuração no primeiro uso
+_login_limiters = {}
+
+def _login_limiter(name):
+    limiter = _login_limiters.get(name)
+    if limiter is None:
+        limit, window = current_app.config[name]
+        limiter = _login_limiters.setdefault(name, SlidingWindowLimiter(limit, window))
+    return limiter
+
 def token_required(f):
     """Decorator para proteger rotas que requerem autenticação"""
     @wraps(f)
@@ -43,6 +57,22 @@ def admin_required(f):
     
     return decorated
 
+def sync_token_required(f):
+    """Decorator para as rotas chamadas pelos nós locais (cabeçalho X-Sync-Token)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not edge.accepts_sync():
+            return jsonify({'message': 'Sincronização de nós locais desativada'}), 404
+        
+        # Cada nó tem o token da sua unidade: não serve para as demais
+        token = request.headers.get('X-Sync-Token', '')
+        if not hmac.compare_digest(token.encode(), edge.unit_token(kwargs['unit_id']).encode()):
+            return jsonify({'message': 'Token de sincronização inválido'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Endpoint de login"""
@@ -52,14 +82,35 @@ def login():
         if not data or not data.get('username') or not data.get('password'):
             return jsonify({'message': 'Username e password são obrigatórios'}), 400
         
+        # Falhas recentes do mesmo IP ou usuário bloqueiam antes de calcular o hash
+        ip_key = request.remote_addr
+        user_key = data['username'].lower()
+        ip_limiter = _login_limiter('LOGIN_RATE_LIMIT_IP')
+        user_limiter = _login_limiter('LOGIN_RATE_LIMIT_USER')
+        
+        retry_after = max(ip_limiter.retry_after(ip_key), user_limiter.retry_after(user_key))
+        if retry_after:
+            response = jsonify({'message': 'Muitas tentativas. Tente novamente mais tarde.'})
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response, 429
+        
         user = User.query.filter_by(username=data['username']).first()
         
-        if not user or not user.check_password(data['password']):
+        if not user or not passwords.verify(user.password_hash, data['password']):
+            ip_limiter.hit(ip_key)
+            user_limiter.hit(user_key)
             return jsonify({'message': 'Credenciais inválidas'}), 401
         
+        user_limiter.reset(user_key)
+        
         if not user.is_active:
             return jsonify({'message': 'Usuário inativo'}), 401
         
+        # Parâmetros de hash alterados na configuração: regrava com os atuais
+        if passwords.needs_rehash(user.password_hash):
+            user.set_password(data['password'])
+            db.session.commit()
+        
         token = user.generate_token()
         
         return jsonify({
@@ -68,6 +119,10 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except passwords.VerifyBusy:
+        response = jsonify({'message': 'Servidor ocupado. Tente novamente em instantes.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
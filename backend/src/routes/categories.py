@@ -1,10 +1,17 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from src.models.user import db
 from src.models.category import Category
 from src.routes.auth import token_required, admin_required
+from src.services import reference_cache
 
 categories_bp = Blueprint('categories', __name__)
 
+def _visible(query):
+    """Oculta categorias arquivadas, a menos que include_archived=true"""
+    if request.args.get('include_archived') == 'true':
+        return query
+    return query.filter(Category.archived_at.is_(None))
+
 @categories_bp.route('/categories', methods=['GET'])
 @token_required
 def get_categories(current_user):
@@ -13,12 +20,12 @@ def get_categories(current_user):
         if current_user.role == 'admin':
             unit_id = request.args.get('unit_id')
             if unit_id:
-                categories = Category.query.filter_by(unit_id=unit_id).order_by(Category.priority.desc()).all()
+                categories = _visible(Category.query.filter_by(unit_id=unit_id)).order_by(Category.priority.desc()).all()
             else:
-                categories = Category.query.order_by(Category.priority.desc()).all()
+                categories = _visible(Category.query).order_by(Category.priority.desc()).all()
         else:
             # Atendentes só veem categorias de sua unidade
-            categories = Category.query.filter_by(unit_id=current_user.unit_id).order_by(Category.priority.desc()).all() if current_user.unit_id else []
+            categories = _visible(Category.query.filter_by(unit_id=current_user.unit_id)).order_by(Category.priority.desc()).all() if current_user.unit_id else []
         
         return jsonify([category.to_dict() for category in categories]), 200
     except Exception as e:
@@ -57,6 +64,7 @@ def create_category(current_user):
         
         db.session.add(category)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Categoria criada com sucesso',
@@ -71,7 +79,7 @@ def create_category(current_user):
 def get_category(current_user, category_id):
     """Obtém uma categoria específica"""
     try:
-        category = Category.query.get_or_404(category_id)
+        category = reference_cache.get_or_404('category', category_id)
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != category.unit_id:
@@ -108,6 +116,7 @@ def update_category(current_user, category_id):
         category.is_active = data.get('is_active', category.is_active)
         
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Categoria atualizada com sucesso',
@@ -128,12 +137,25 @@ def delete_category(current_user, category_id):
         if current_user.role != 'admin' and current_user.unit_id != category.unit_id:
             return jsonify({'message': 'Acesso negado'}), 403
         
-        # Verifica se há senhas relacionadas
-        if category.tickets:
-            return jsonify({'message': 'Não é possível excluir categoria com senhas relacionadas'}), 400
+        # Verifica (via EXISTS) se há senhas relacionadas
+        if category.has_tickets():
+            if not current_app.config.get('ARCHIVE_ON_DELETE', True):
+                return jsonify({'message': 'Não é possível excluir categoria com senhas relacionadas'}), 400
+            
+            # Exclusão lógica: o histórico de senhas não é alterado
+            category.archive()
+            db.session.commit()
+            reference_cache.invalidate()
+            
+            return jsonify({
+                'message': 'Categoria arquivada (possui senhas relacionadas)',
+                'archived': True,
+                'category': category.to_dict()
+            }), 200
         
         db.session.delete(category)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({'message': 'Categoria excluída com sucesso'}), 200
         
@@ -1,10 +1,17 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from src.models.user import db
 from src.models.counter import Counter
 from src.routes.auth import token_required, admin_required
+from src.services import counter_usage, reference_cache
 
 counters_bp = Blueprint('counters', __name__)
 
+def _visible(query):
+    """Oculta guichês arquivados, a menos que include_archived=true"""
+    if request.args.get('include_archived') == 'true':
+        return query
+    return query.filter(Counter.archived_at.is_(None))
+
 @counters_bp.route('/counters', methods=['GET'])
 @token_required
 def get_counters(current_user):
@@ -13,12 +20,12 @@ def get_counters(current_user):
         if current_user.role == 'admin':
             unit_id = request.args.get('unit_id')
             if unit_id:
-                counters = Counter.query.filter_by(unit_id=unit_id).all()
+                counters = _visible(Counter.query.filter_by(unit_id=unit_id)).all()
             else:
-                counters = Counter.query.all()
+                counters = _visible(Counter.query).all()
         else:
             # Atendentes só veem guichês de sua unidade
-            counters = Counter.query.filter_by(unit_id=current_user.unit_id).all() if current_user.unit_id else []
+            counters = _visible(Counter.query.filter_by(unit_id=current_user.unit_id)).all() if current_user.unit_id else []
         
         return jsonify([counter.to_dict() for counter in counters]), 200
     except Exception as e:
@@ -50,6 +57,7 @@ def create_counter(current_user):
         
         db.session.add(counter)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Guichê criado com sucesso',
@@ -64,7 +72,7 @@ def create_counter(current_user):
 def get_counter(current_user, counter_id):
     """Obtém um guichê específico"""
     try:
-        counter = Counter.query.get_or_404(counter_id)
+        counter = reference_cache.get_or_404('counter', counter_id)
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
@@ -93,6 +101,7 @@ def update_counter(current_user, counter_id):
         counter.is_active = data.get('is_active', counter.is_active)
         
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Guichê atualizado com sucesso',
@@ -113,15 +122,124 @@ def delete_counter(current_user, counter_id):
         if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
             return jsonify({'message': 'Acesso negado'}), 403
         
-        # Verifica se há senhas relacionadas
-        if counter.tickets:
-            return jsonify({'message': 'Não é possível excluir guichê com senhas relacionadas'}), 400
+        # Verifica (via EXISTS) se há senhas relacionadas
+        if counter.has_tickets():
+            if not current_app.config.get('ARCHIVE_ON_DELETE', True):
+                return jsonify({'message': 'Não é possível excluir guichê com senhas relacionadas'}), 400
+            
+            # Exclusão lógica: o histórico de senhas não é alterado
+            counter.archive()
+            db.session.commit()
+            reference_cache.invalidate()
+            
+            return jsonify({
+                'message': 'Guichê arquivado (possui senhas relacionadas)',
+                'archived': True,
+                'counter': counter.to_dict()
+            }), 200
         
         db.session.delete(counter)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({'message': 'Guichê excluído com sucesso'}), 200
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@counters_bp.route('/counters/<int:counter_id>/session', methods=['GET'])
+@token_required
+def get_counter_session(current_user, counter_id):
+    """Obtém a sessão aberta do guichê"""
+    try:
+        counter = reference_cache.get_or_404('counter', counter_id)
+        
+        # Verifica permissões
+        if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
+            return jsonify({'message': 'Acesso negado'}), 403
+        
+        session = counter_usage.current_session(counter_id)
+        if not session:
+            return jsonify({'message': 'Guichê sem sessão aberta'}), 404
+        
+        return jsonify(session.to_dict()), 200
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@counters_bp.route('/counters/<int:counter_id>/session/open', methods=['POST'])
+@token_required
+def open_counter_session(current_user, counter_id):
+    """Abre a sessão do atendente no guichê"""
+    try:
+        counter = reference_cache.get_or_404('counter', counter_id)
+        
+        # Verifica permissões
+        if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
+            return jsonify({'message': 'Acesso negado'}), 403
+        
+        if not counter.is_active or counter.archived_at:
+            return jsonify({'message': 'Guichê inativo'}), 400
+        
+        session = counter_usage.open_session(counter, current_user.id)
+        
+        return jsonify({
+            'message': 'Sessão aberta com sucesso',
+            'session': session.to_dict()
+        }), 201
+        
+    except counter_usage.SessionError as e:
+        return jsonify({'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+def _change_session(current_user, counter_id, action, message):
+    counter = reference_cache.get_or_404('counter', counter_id)
+    
+    # Verifica permissões
+    if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
+        return jsonify({'message': 'Acesso negado'}), 403
+    
+    session = counter_usage.current_session(counter_id)
+    if not session:
+        return jsonify({'message': 'Guichê sem sessão aberta'}), 404
+    
+    # Atendentes só alteram a própria sessão
+    if current_user.role != 'admin' and session.user_id != current_user.id:
+        return jsonify({'message': 'Sessão pertence a outro atendente'}), 403
+    
+    try:
+        action(session)
+    except counter_usage.SessionError as e:
+        return jsonify({'message': str(e)}), 409
+    
+    return jsonify({
+        'message': message,
+        'session': session.to_dict()
+    }), 200
+
+@counters_bp.route('/counters/<int:counter_id>/session/pause', methods=['POST'])
+@token_required
+def pause_counter_session(current_user, counter_id):
+    """Pausa a sessão do guichê"""
+    try:
+        return _change_session(current_user, counter_id, counter_usage.pause, 'Sessão pausada')
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@counters_bp.route('/counters/<int:counter_id>/session/resume', methods=['POST'])
+@token_required
+def resume_counter_session(current_user, counter_id):
+    """Retoma a sessão pausada do guichê"""
+    try:
+        return _change_session(current_user, counter_id, counter_usage.resume, 'Sessão retomada')
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@counters_bp.route('/counters/<int:counter_id>/session/close', methods=['POST'])
+@token_required
+def close_counter_session(current_user, counter_id):
+    """Encerra a sessão do guichê"""
+    try:
+        return _change_session(current_user, counter_id, counter_usage.close, 'Sessão encerrada')
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
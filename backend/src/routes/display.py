@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from datetime import datetime
 from src.models.user import db
 from src.models.display_settings import DisplaySettings
 from src.routes.auth import token_required
+from src.services import announcements, display_snapshots, long_poll, reference_cache, wire_format
+from src.services.sql import insert_for_dialect
 
 display_bp = Blueprint('display', __name__)
 
@@ -9,15 +12,78 @@ display_bp = Blueprint('display', __name__)
 def get_display_settings(unit_id):
     """Obtém configurações do painel de exibição (público)"""
     try:
-        settings = DisplaySettings.query.filter_by(unit_id=unit_id).first()
+        # Somente leitura: unidades sem registro recebem os padrões em memória
+        return jsonify(reference_cache.display_settings_dict(unit_id)), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@display_bp.route('/display/wall', methods=['GET'])
+def get_display_wall():
+    """Painel de várias unidades em uma tela: ?units=1,2,3 (público)"""
+    try:
+        try:
+            unit_ids = list(dict.fromkeys(int(u) for u in request.args.get('units', '').split(',') if u.strip()))
+        except ValueError:
+            return jsonify({'message': 'Lista de unidades inválida'}), 400
+        
+        if not unit_ids or len(unit_ids) > display_snapshots.MAX_WALL_UNITS:
+            return jsonify({'message': f'Informe de 1 a {display_snapshots.MAX_WALL_UNITS} unidades'}), 400
+        
+        if any(reference_cache.get('unit', unit_id) is None for unit_id in unit_ids):
+            return jsonify({'message': 'Unidade não encontrada'}), 404
+        
+        # Nada mudou desde a última resposta do painel: 304, opcionalmente
+        # depois de aguardar até wait segundos por uma mudança (se houver vaga)
+        etag, versions = display_snapshots.wall_state(unit_ids)
+        if request.if_none_match.contains(etag):
+            wait = long_poll.max_wait(request.args.get('wait', 0, type=float))
+            if wait:
+                with long_poll.slot() as waiting:
+                    if waiting:
+                        etag, versions = display_snapshots.wait_for_change(unit_ids, etag, wait)
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+        
+        response = wire_format.respond({'units': display_snapshots.wall(unit_ids, versions)})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@display_bp.route('/announcements/<ticket_number>/<int:counter_id>.wav', methods=['GET'])
+def get_announcement(ticket_number, counter_id):
+    """Áudio do anúncio de uma senha chamada, montado com trechos pré-gravados (público)"""
+    try:
+        if not announcements.is_enabled():
+            return jsonify({'message': 'Anúncios falados desativados'}), 404
+        
+        if announcements.parse(ticket_number) is None or reference_cache.get('counter', counter_id) is None:
+            return jsonify({'message': 'Anúncio não encontrado'}), 404
         
-        if not settings:
-            # Cria configurações padrão se não existir
-            settings = DisplaySettings(unit_id=unit_id)
-            db.session.add(settings)
-            db.session.commit()
+        try:
+            audio = announcements.render(ticket_number, counter_id)
+        except announcements.Unavailable:
+            # Trecho ainda não gerado: a requisição não chama o TTS
+            return jsonify({'message': 'Anúncio não encontrado'}), 404
+        except ValueError as e:
+            # Gravação em formato diferente das demais
+            current_app.logger.warning('Anúncio %s indisponível: %s', ticket_number, e)
+            return jsonify({'message': 'Áudio do anúncio indisponível'}), 503
         
-        return jsonify(settings.to_dict()), 200
+        response = current_app.response_class(audio, mimetype='audio/wav')
+        version = announcements.version(counter_id)
+        response.set_etag(version + ticket_number)
+        # A versão na URL muda com o guichê e a voz: o mesmo endereço nunca muda de conteúdo
+        if request.args.get('v') == version:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -35,30 +101,34 @@ def update_display_settings(current_user, unit_id):
         if not data:
             return jsonify({'message': 'Dados são obrigatórios'}), 400
         
-        settings = DisplaySettings.query.filter_by(unit_id=unit_id).first()
-        
-        if not settings:
-            settings = DisplaySettings(unit_id=unit_id)
-            db.session.add(settings)
-        
         # Atualiza campos
+        values = {}
+        
         if 'message' in data:
-            settings.message = data['message']
+            values['message'] = data['message']
         
         if 'show_last_tickets_count' in data:
             count = data['show_last_tickets_count']
             if isinstance(count, int) and 1 <= count <= 10:
-                settings.show_last_tickets_count = count
+                values['show_last_tickets_count'] = count
         
         if 'sound_enabled' in data:
-            settings.sound_enabled = bool(data['sound_enabled'])
+            values['sound_enabled'] = bool(data['sound_enabled'])
         
         if 'theme' in data:
             theme = data['theme']
             if theme in ['light', 'dark']:
-                settings.theme = theme
+                values['theme'] = theme
         
+        # Upsert por unit_id: evita registros duplicados em requisições concorrentes
+        values['updated_at'] = datetime.utcnow()
+        stmt = insert_for_dialect()(DisplaySettings).values(unit_id=unit_id, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=['unit_id'], set_=values)
+        db.session.execute(stmt)
         db.session.commit()
+        reference_cache.invalidate()
+        
+        settings = DisplaySettings.query.filter_by(unit_id=unit_id).first()
         
         return jsonify({
             'message': 'Configurações atualizadas com sucesso',
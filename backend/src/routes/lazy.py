@@ -0,0 +1,49 @@
+import importlib
+import threading
+from flask import Flask, request
+
+# Blueprints carregados sob demanda.
+#
+# Rotas pouco usadas (relatórios, manutenção) e suas dependências (numpy,
+# por exemplo) não são importadas na subida do processo. No lugar delas a
+# aplicação registra apenas o prefixo; a primeira requisição importa o módulo,
+# monta o mapa de rotas do blueprint e passa a despachar para as views
+# originais, que rodam no contexto da aplicação principal.
+
+HTTP_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+
+class LazyBlueprint:
+    """Importa module_name e despacha para o blueprint blueprint_name no primeiro uso"""
+
+    def __init__(self, module_name, blueprint_name, url_prefix):
+        self.module_name = module_name
+        self.blueprint_name = blueprint_name
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._routes = None
+
+    def _load(self):
+        with self._lock:
+            if self._routes is None:
+                module = importlib.import_module(self.module_name)
+
+                # Aplicação auxiliar só para montar o mapa de URLs do blueprint
+                scratch = Flask(self.module_name)
+                scratch.register_blueprint(getattr(module, self.blueprint_name), url_prefix=self.url_prefix)
+                self._routes = (scratch.url_map, scratch.view_functions)
+        return self._routes
+
+    def dispatch(self, **kwargs):
+        url_map, view_functions = self._routes or self._load()
+        endpoint, args = url_map.bind_to_environ(request.environ).match()
+        return view_functions[endpoint](**args)
+
+    def register(self, app, *paths):
+        """Registra os caminhos (relativos ao prefixo) que disparam o carregamento"""
+        endpoint = f'lazy_{self.blueprint_name}'
+        for path in paths:
+            app.add_url_rule(
+                f'{self.url_prefix}{path}', endpoint=endpoint,
+                view_func=self.dispatch, methods=HTTP_METHODS
+            )
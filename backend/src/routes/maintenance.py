@@ -0,0 +1,53 @@
+import threading
+from flask import Blueprint, current_app, jsonify, request
+from src.routes.auth import token_required, admin_required
+from src.services import edge, maintenance, replica
+
+maintenance_bp = Blueprint('maintenance', __name__)
+
+@maintenance_bp.route('/maintenance', methods=['GET'])
+@token_required
+@admin_required
+def get_maintenance_status(current_user):
+    """Estado do banco (páginas livres, auto_vacuum), últimas manutenções, réplica e nós locais"""
+    try:
+        return jsonify({**maintenance.status(), 'replica': replica.status(), 'edge': edge.status()}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@maintenance_bp.route('/maintenance/run', methods=['POST'])
+@token_required
+@admin_required
+def run_maintenance(current_user):
+    """Dispara a manutenção em segundo plano, fora da janela configurada"""
+    try:
+        data = request.get_json(silent=True) or {}
+        tasks = data.get('tasks') or maintenance.TASKS
+        
+        if any(task not in maintenance.TASKS for task in tasks):
+            return jsonify({'message': 'Tarefa de manutenção inválida'}), 400
+        
+        # Mesma trava do agendador: uma execução por vez
+        if not maintenance.acquire_run_lock():
+            return jsonify({'message': 'Manutenção já em andamento'}), 409
+        
+        app = current_app._get_current_object()
+        
+        def work():
+            with app.app_context():
+                try:
+                    maintenance.run(tasks)
+                finally:
+                    maintenance.release_run_lock()
+        
+        try:
+            threading.Thread(target=work, name='db-maintenance-manual', daemon=True).start()
+        except Exception:
+            maintenance.release_run_lock()
+            raise
+        
+        return jsonify({'message': 'Manutenção iniciada', 'tasks': list(tasks)}), 202
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
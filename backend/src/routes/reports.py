@@ -1,16 +1,104 @@
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import case, func, and_
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
 from src.models.user import db
 from src.models.ticket import Ticket
 from src.models.category import Category
 from src.models.counter import Counter
+from src.models.unit import Unit
 from src.routes.auth import token_required
+from src.services import counter_usage, forecast, quantiles, read_models, reference_cache, report_cache, report_jobs, shards
+from src.services.replica import use_replica
 
 reports_bp = Blueprint('reports', __name__)
 
+def _report_response(report, unit_id, params, closed=False):
+    """Resultado do relatório (200) ou, se o cálculo ainda está na fila, o job (202)
+
+    O cálculo roda no pool de report_jobs, nunca na thread da requisição, que
+    espera no máximo REPORT_JOB_WAIT segundos. O cliente acompanha o job em
+    /reports/jobs/<id> e baixa o resultado em /reports/jobs/<id>/result.
+    """
+    result = report_cache.lookup(report, unit_id, params, closed)
+    if result is None:
+        job = report_jobs.submit(report, unit_id, params)
+        if job.wait(current_app.config.get('REPORT_JOB_WAIT', 0.5)) and job.status == 'done':
+            result = report_jobs.get_result(job.id)
+        if result is None:
+            response = jsonify({'message': 'Relatório em processamento', 'job': job.to_dict()})
+            response.headers['Location'] = f'/api/reports/jobs/{job.id}'
+            return response, 202
+        report_cache.remember(report, unit_id, params, result, closed)
+    return jsonify(result), 200
+
+def build_dashboard(unit_id, day):
+    """Calcula o dashboard do dia a partir das parciais agregadas"""
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    partials = report_cache.day_partials(unit_id, day, day)[day.isoformat()]
+    
+    # Contadores
+    status_counts = {}
+    service_sum = 0
+    service_positive = 0
+    for row in partials:
+        status_counts[row.status] = status_counts.get(row.status, 0) + row.count
+        if row.status == 'finished':
+            service_sum += row.service_sum
+            service_positive += row.service_positive
+    
+    # Tempo médio de atendimento
+    avg_service_time = service_sum / service_positive if service_positive else 0
+    
+    # Senhas por categoria
+    category_counts = {}
+    for row in partials:
+        category_counts[row.category_id] = category_counts.get(row.category_id, 0) + row.count
+    
+    category_stats = []
+    for category_id in sorted(category_counts):
+        category = reference_cache.get('category', category_id)
+        if category:
+            category_stats.append({
+                'name': category.name,
+                'prefix': category.prefix,
+                'count': category_counts[category_id]
+            })
+    
+    # Senhas por guichê (finalizadas)
+    counter_totals = {}
+    for row in partials:
+        if row.status == 'finished' and row.counter_id is not None:
+            count, total, with_time = counter_totals.get(row.counter_id, (0, 0, 0))
+            counter_totals[row.counter_id] = (count + row.count, total + row.service_sum, with_time + row.service_count)
+    
+    counter_stats = []
+    for counter_id in sorted(counter_totals):
+        counter = reference_cache.get('counter', counter_id)
+        if counter:
+            count, total, with_time = counter_totals[counter_id]
+            avg_time = total / with_time if with_time else 0
+            counter_stats.append({
+                'name': counter.name,
+                'count': count,
+                'avg_time': round(float(avg_time), 2) if avg_time else 0
+            })
+    
+    return {
+        'summary': {
+            'total_today': sum(status_counts.values()),
+            'waiting_count': status_counts.get('waiting', 0),
+            'finished_count': status_counts.get('finished', 0),
+            'missed_count': status_counts.get('missed', 0),
+            'avg_service_time': round(avg_service_time, 2)
+        },
+        'category_stats': category_stats,
+        'counter_stats': counter_stats
+    }
+
 @reports_bp.route('/reports/dashboard', methods=['GET'])
 @token_required
+@use_replica
 def get_dashboard_data(current_user):
     """Obtém dados para o dashboard administrativo"""
     try:
@@ -24,78 +112,194 @@ def get_dashboard_data(current_user):
         # Data de hoje
         today = datetime.now().date()
         
-        # Estatísticas do dia
-        today_tickets = Ticket.query.filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                func.date(Ticket.generated_at) == today
-            )
-        ).all()
-        
-        # Contadores
-        total_today = len(today_tickets)
-        waiting_count = len([t for t in today_tickets if t.status == 'waiting'])
-        finished_count = len([t for t in today_tickets if t.status == 'finished'])
-        missed_count = len([t for t in today_tickets if t.status == 'missed'])
-        
-        # Tempo médio de atendimento
-        finished_tickets = [t for t in today_tickets if t.status == 'finished' and t.service_time]
-        avg_service_time = sum(t.service_time for t in finished_tickets) / len(finished_tickets) if finished_tickets else 0
-        
-        # Senhas por categoria
-        category_stats = db.session.query(
-            Category.name,
-            Category.prefix,
-            func.count(Ticket.id).label('count')
-        ).join(Ticket).filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                func.date(Ticket.generated_at) == today
-            )
-        ).group_by(Category.id, Category.name, Category.prefix).all()
-        
-        # Senhas por guichê
-        counter_stats = db.session.query(
-            Counter.name,
-            func.count(Ticket.id).label('count'),
-            func.avg(Ticket.service_time).label('avg_time')
-        ).join(Ticket).filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                func.date(Ticket.generated_at) == today,
-                Ticket.status == 'finished'
-            )
-        ).group_by(Counter.id, Counter.name).all()
+        return _report_response('dashboard', unit_id, {'day': today.isoformat()})
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+def _overview_rows(unit_ids, start, end):
+    return db.session.query(
+        Ticket.unit_id,
+        Ticket.status,
+        func.count(Ticket.id),
+        func.coalesce(func.sum(Ticket.service_time), 0),
+        func.sum(case((Ticket.service_time > 0, 1), else_=0)),
+        func.min(Ticket.generated_at)
+    ).filter(
+        Ticket.unit_id.in_(unit_ids),
+        Ticket.generated_at >= start,
+        Ticket.generated_at < end
+    ).group_by(Ticket.unit_id, Ticket.status).all()
+
+def build_overview(unit_ids, day):
+    """KPIs do dia de várias unidades em uma única consulta agrupada"""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    
+    if shards.is_enabled():
+        # Um banco por unidade: consultas em paralelo
+        per_unit = shards.fan_out(unit_ids, lambda unit_id: _overview_rows([unit_id], start, end))
+        rows = [row for unit_rows in per_unit.values() for row in unit_rows]
+    else:
+        rows = _overview_rows(unit_ids, start, end)
+    
+    now = datetime.utcnow()
+    stats = {
+        unit_id: {
+            'total_today': 0,
+            'waiting_count': 0,
+            'finished_count': 0,
+            'missed_count': 0,
+            'service_sum': 0,
+            'service_positive': 0,
+            'longest_wait_seconds': 0
+        } for unit_id in unit_ids
+    }
+    
+    for unit_id, status, count, service_sum, service_positive, oldest in rows:
+        unit_stats = stats[unit_id]
+        unit_stats['total_today'] += count
+        if status in ('waiting', 'finished', 'missed'):
+            unit_stats[f'{status}_count'] += count
+        if status == 'finished':
+            unit_stats['service_sum'] += int(service_sum)
+            unit_stats['service_positive'] += int(service_positive or 0)
+        if status == 'waiting' and oldest:
+            unit_stats['longest_wait_seconds'] = max(0, int((now - oldest).total_seconds()))
+    
+    for unit_stats in stats.values():
+        service_sum = unit_stats.pop('service_sum')
+        service_positive = unit_stats.pop('service_positive')
+        unit_stats['avg_service_time'] = round(service_sum / service_positive, 2) if service_positive else 0
+    
+    return stats
+
+@reports_bp.route('/reports/overview', methods=['GET'])
+@token_required
+@use_replica
+def get_overview(current_user):
+    """Resumo do dia de todas as unidades visíveis ao usuário"""
+    try:
+        query = db.session.query(Unit.id, Unit.name).filter(Unit.archived_at.is_(None))
+        if current_user.role != 'admin':
+            if not current_user.unit_id:
+                return jsonify({'message': 'Unidade é obrigatória'}), 400
+            query = query.filter(Unit.id == current_user.unit_id)
+        
+        units = query.order_by(Unit.name).all()
+        stats = build_overview([unit.id for unit in units], datetime.now().date()) if units else {}
+        
+        unit_list = [
+            {
+                'unit_id': unit.id,
+                'name': unit.name,
+                **stats[unit.id]
+            } for unit in units
+        ]
         
         return jsonify({
-            'summary': {
-                'total_today': total_today,
-                'waiting_count': waiting_count,
-                'finished_count': finished_count,
-                'missed_count': missed_count,
-                'avg_service_time': round(avg_service_time, 2)
-            },
-            'category_stats': [
-                {
-                    'name': stat.name,
-                    'prefix': stat.prefix,
-                    'count': stat.count
-                } for stat in category_stats
-            ],
-            'counter_stats': [
-                {
-                    'name': stat.name,
-                    'count': stat.count,
-                    'avg_time': round(float(stat.avg_time), 2) if stat.avg_time else 0
-                } for stat in counter_stats
-            ]
+            'units': unit_list,
+            'totals': {
+                'units': len(unit_list),
+                'waiting_count': sum(u['waiting_count'] for u in unit_list),
+                'finished_count': sum(u['finished_count'] for u in unit_list),
+                'missed_count': sum(u['missed_count'] for u in unit_list),
+                'longest_wait_seconds': max((u['longest_wait_seconds'] for u in unit_list), default=0)
+            }
         }), 200
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+def build_period_report(unit_id, start_date, end_date):
+    """Calcula o relatório por período (datas em ISO, usado também pelos jobs)"""
+    start_date = date.fromisoformat(start_date)
+    end_date = date.fromisoformat(end_date)
+    
+    # Parciais diárias do período (dias encerrados vêm do cache)
+    partials = report_cache.day_partials(unit_id, start_date, end_date)
+    
+    total_tickets = 0
+    finished_count = 0
+    missed_count = 0
+    service_sum = 0
+    service_positive = 0
+    daily_stats = {}
+    category_stats = {}
+    category_times = {}
+    
+    for date_str, rows in partials.items():
+        for row in rows:
+            total_tickets += row.count
+            if row.status == 'finished':
+                finished_count += row.count
+                service_sum += row.service_sum
+                service_positive += row.service_positive
+            elif row.status == 'missed':
+                missed_count += row.count
+            
+            # Estatísticas por dia
+            if date_str not in daily_stats:
+                daily_stats[date_str] = {
+                    'total': 0,
+                    'finished': 0,
+                    'missed': 0,
+                    'waiting': 0
+                }
+            
+            daily_stats[date_str]['total'] += row.count
+            daily_stats[date_str][row.status] = daily_stats[date_str].get(row.status, 0) + row.count
+            
+            # Estatísticas por categoria
+            category = reference_cache.get('category', row.category_id)
+            if category:
+                cat_name = category.name
+                if cat_name not in category_stats:
+                    category_stats[cat_name] = {
+                        'total': 0,
+                        'finished': 0,
+                        'missed': 0,
+                        'avg_time': 0
+                    }
+                    category_times[cat_name] = [0, 0]
+                
+                category_stats[cat_name]['total'] += row.count
+                if row.status == 'finished':
+                    category_stats[cat_name]['finished'] += row.count
+                    category_times[cat_name][0] += row.service_sum
+                    category_times[cat_name][1] += row.service_positive
+                elif row.status == 'missed':
+                    category_stats[cat_name]['missed'] += row.count
+    
+    # Tempo médio de atendimento (geral e por categoria)
+    avg_service_time = service_sum / service_positive if service_positive else 0
+    for cat_name, (total, with_time) in category_times.items():
+        if with_time:
+            category_stats[cat_name]['avg_time'] = total / with_time
+    
+    return {
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        },
+        'summary': {
+            'total_tickets': total_tickets,
+            'finished_count': finished_count,
+            'missed_count': missed_count,
+            'avg_service_time': round(avg_service_time, 2)
+        },
+        'daily_stats': daily_stats,
+        'category_stats': {
+            name: {
+                **stats,
+                'avg_time': round(stats['avg_time'], 2)
+            } for name, stats in category_stats.items()
+        }
+    }
+
 @reports_bp.route('/reports/period', methods=['GET'])
 @token_required
+@use_replica
 def get_period_report(current_user):
     """Obtém relatório por período"""
     try:
@@ -113,92 +317,204 @@ def get_period_report(current_user):
         if not start_date or not end_date:
             return jsonify({'message': 'Datas de início e fim são obrigatórias'}), 400
         
-        start_date = datetime.fromisoformat(start_date).date()
-        end_date = datetime.fromisoformat(end_date).date()
+        params = {
+            'start_date': datetime.fromisoformat(start_date).date().isoformat(),
+            'end_date': datetime.fromisoformat(end_date).date().isoformat()
+        }
         
-        # Busca senhas do período
-        tickets = Ticket.query.filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                func.date(Ticket.generated_at) >= start_date,
-                func.date(Ticket.generated_at) <= end_date
-            )
-        ).all()
+        return _report_response(
+            'period', unit_id, params,
+            closed=report_cache.is_closed_period(date.fromisoformat(params['end_date']))
+        )
         
-        # Estatísticas gerais
-        total_tickets = len(tickets)
-        finished_tickets = [t for t in tickets if t.status == 'finished']
-        missed_tickets = [t for t in tickets if t.status == 'missed']
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+def build_percentiles(unit_id, start_date, end_date, category_id=None, counter_id=None, histogram=False):
+    """Percentis de atendimento e espera a partir dos esboços diários"""
+    start_date = date.fromisoformat(start_date)
+    end_date = date.fromisoformat(end_date)
+    
+    result = {
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }
+    }
+    
+    for metric, key in (('service', 'service_time'), ('wait', 'wait_time')):
+        buckets = quantiles.merged_buckets(metric, unit_id, start_date, end_date, category_id, counter_id)
+        result[key] = quantiles.quantiles(buckets)
+        if histogram:
+            result[key]['histogram'] = quantiles.histogram(buckets)
+    
+    return result
+
+@reports_bp.route('/reports/percentiles', methods=['GET'])
+@token_required
+@use_replica
+def get_percentiles(current_user):
+    """Obtém p50/p90/p99 dos tempos de atendimento e de espera no período"""
+    try:
+        unit_id = request.args.get('unit_id')
+        if current_user.role != 'admin':
+            unit_id = current_user.unit_id
         
-        # Tempo médio de atendimento
-        service_times = [t.service_time for t in finished_tickets if t.service_time]
-        avg_service_time = sum(service_times) / len(service_times) if service_times else 0
+        if not unit_id:
+            return jsonify({'message': 'Unidade é obrigatória'}), 400
         
-        # Estatísticas por dia
-        daily_stats = {}
-        for ticket in tickets:
-            date_str = ticket.generated_at.date().isoformat()
-            if date_str not in daily_stats:
-                daily_stats[date_str] = {
-                    'total': 0,
-                    'finished': 0,
-                    'missed': 0,
-                    'waiting': 0
-                }
-            
-            daily_stats[date_str]['total'] += 1
-            daily_stats[date_str][ticket.status] += 1
-        
-        # Estatísticas por categoria
-        category_stats = {}
-        for ticket in tickets:
-            if ticket.category:
-                cat_name = ticket.category.name
-                if cat_name not in category_stats:
-                    category_stats[cat_name] = {
-                        'total': 0,
-                        'finished': 0,
-                        'missed': 0,
-                        'avg_time': 0
-                    }
-                
-                category_stats[cat_name]['total'] += 1
-                if ticket.status == 'finished':
-                    category_stats[cat_name]['finished'] += 1
-                elif ticket.status == 'missed':
-                    category_stats[cat_name]['missed'] += 1
-        
-        # Calcula tempo médio por categoria
-        for cat_name in category_stats:
-            cat_tickets = [t for t in finished_tickets if t.category and t.category.name == cat_name and t.service_time]
-            if cat_tickets:
-                category_stats[cat_name]['avg_time'] = sum(t.service_time for t in cat_tickets) / len(cat_tickets)
+        # Parâmetros de data
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
         
-        return jsonify({
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            },
-            'summary': {
-                'total_tickets': total_tickets,
-                'finished_count': len(finished_tickets),
-                'missed_count': len(missed_tickets),
-                'avg_service_time': round(avg_service_time, 2)
-            },
-            'daily_stats': daily_stats,
-            'category_stats': {
-                name: {
-                    **stats,
-                    'avg_time': round(stats['avg_time'], 2)
-                } for name, stats in category_stats.items()
-            }
-        }), 200
+        if not start_date or not end_date:
+            return jsonify({'message': 'Datas de início e fim são obrigatórias'}), 400
+        
+        category_id = request.args.get('category_id')
+        counter_id = request.args.get('counter_id')
+        
+        params = {
+            'start_date': datetime.fromisoformat(start_date).date().isoformat(),
+            'end_date': datetime.fromisoformat(end_date).date().isoformat(),
+            'category_id': int(category_id) if category_id else None,
+            'counter_id': int(counter_id) if counter_id else None,
+            'histogram': request.args.get('histogram') == 'true'
+        }
+        
+        return _report_response(
+            'percentiles', unit_id, params,
+            closed=report_cache.is_closed_period(date.fromisoformat(params['end_date']))
+        )
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+def _forecast_params(weeks, target_wait, service_level):
+    # Dias e horários da previsão no fuso local; "hoje" também
+    tz_name = current_app.config.get('LOCAL_TIMEZONE') or 'UTC'
+    return {
+        'weeks': min(max(weeks, 1), 104),
+        'target_wait': target_wait,
+        'service_level': min(max(service_level, 0.0), 0.999),
+        'today': datetime.now(ZoneInfo(tz_name)).date().isoformat(),
+        'tz_name': tz_name
+    }
+
+def build_forecast(unit_id, weeks, target_wait, service_level, today=None, tz_name='UTC'):
+    """Previsão de chegadas e guichês recomendados a partir das últimas semanas encerradas"""
+    end_day = date.fromisoformat(today) - timedelta(days=1) if today else datetime.now(ZoneInfo(tz_name)).date() - timedelta(days=1)
+    start_day = end_day - timedelta(days=weeks * 7 - 1)
+    
+    result = forecast.forecast([unit_id], start_day, end_day, target_wait, service_level, tz_name)[int(unit_id)]
+    return {
+        'history': {
+            'start_date': start_day.isoformat(),
+            'end_date': end_day.isoformat(),
+            'weeks': weeks,
+            'timezone': tz_name
+        },
+        'target': {
+            'wait_seconds': target_wait,
+            'service_level': service_level
+        },
+        **result
+    }
+
+@reports_bp.route('/reports/forecast', methods=['GET'])
+@token_required
+@use_replica
+def get_forecast(current_user):
+    """Previsão de demanda por dia da semana e intervalo, com guichês recomendados"""
+    try:
+        if not forecast.is_available():
+            return jsonify({'message': 'Previsão indisponível: numpy não está instalado'}), 501
+        
+        unit_id = request.args.get('unit_id')
+        if current_user.role != 'admin':
+            unit_id = current_user.unit_id
+        
+        if not unit_id:
+            return jsonify({'message': 'Unidade é obrigatória'}), 400
+        
+        params = _forecast_params(
+            request.args.get('weeks', 12, type=int),
+            request.args.get('target_wait', 600, type=int),
+            request.args.get('service_level', 0.8, type=float)
+        )
+        
+        # O histórico termina ontem: o resultado só muda com alterações em dias encerrados
+        return _report_response('forecast', unit_id, params, closed=True)
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@reports_bp.route('/reports/utilization', methods=['GET'])
+@token_required
+@use_replica
+def get_utilization(current_user):
+    """Obtém tempo disponível, ocupado e ocioso e senhas por hora dos guichês e atendentes"""
+    try:
+        unit_id = request.args.get('unit_id')
+        if current_user.role != 'admin':
+            unit_id = current_user.unit_id
+        
+        if not unit_id:
+            return jsonify({'message': 'Unidade é obrigatória'}), 400
+        
+        # Parâmetros de data
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if not start_date or not end_date:
+            return jsonify({'message': 'Datas de início e fim são obrigatórias'}), 400
+        
+        # Sem report_cache: as sessões abertas contam até o momento da consulta
+        result = counter_usage.utilization(
+            int(unit_id),
+            datetime.fromisoformat(start_date).date(),
+            datetime.fromisoformat(end_date).date(),
+            by_hour=request.args.get('by_hour') == 'true'
+        )
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+def build_export(unit_id, start_date=None, end_date=None, category_id=None):
+    """Monta os dados de exportação (usado também pelos jobs)"""
+    tickets = read_models.export_records(
+        unit_id,
+        start_date=datetime.fromisoformat(start_date).date() if start_date else None,
+        end_date=datetime.fromisoformat(end_date).date() if end_date else None,
+        category_id=category_id
+    )
+    
+    # Prepara dados para exportação (registros leves, sem objetos ORM)
+    export_data = []
+    for ticket in tickets:
+        export_data.append({
+            'numero_senha': ticket.ticket_number,
+            'categoria': ticket.category_name or '',
+            'guiche': ticket.counter_name or '',
+            'status': ticket.status,
+            'gerada_em': ticket.generated_at.strftime('%d/%m/%Y %H:%M:%S'),
+            'chamada_em': ticket.called_at.strftime('%d/%m/%Y %H:%M:%S') if ticket.called_at else '',
+            'finalizada_em': ticket.finished_at.strftime('%d/%m/%Y %H:%M:%S') if ticket.finished_at else '',
+            'tempo_atendimento': f'{ticket.service_time}s' if ticket.service_time else ''
+        })
+    
+    return {
+        'data': export_data,
+        'summary': {
+            'total': len(export_data),
+            'period': f"{start_date} a {end_date}" if start_date and end_date else "Todos os registros"
+        }
+    }
+
 @reports_bp.route('/reports/export', methods=['GET'])
 @token_required
+@use_replica
 def export_report(current_user):
     """Exporta relatório (dados para PDF/Excel)"""
     try:
@@ -214,41 +530,133 @@ def export_report(current_user):
         end_date = request.args.get('end_date')
         category_id = request.args.get('category_id')
         
-        query = Ticket.query.filter(Ticket.unit_id == unit_id)
+        params = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'category_id': int(category_id) if category_id else None
+        }
         
-        if start_date:
-            query = query.filter(func.date(Ticket.generated_at) >= datetime.fromisoformat(start_date).date())
+        return _report_response('export', unit_id, params)
         
-        if end_date:
-            query = query.filter(func.date(Ticket.generated_at) <= datetime.fromisoformat(end_date).date())
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+# Relatórios disponíveis na fila de processamento em segundo plano
+report_jobs.register('dashboard', build_dashboard)
+report_jobs.register('period', build_period_report)
+report_jobs.register('percentiles', build_percentiles)
+report_jobs.register('export', build_export)
+report_jobs.register('forecast', build_forecast)
+
+@reports_bp.route('/reports/jobs', methods=['POST'])
+@token_required
+def submit_report_job(current_user):
+    """Enfileira um relatório pesado para processamento em segundo plano"""
+    try:
+        data = request.get_json()
         
-        if category_id:
-            query = query.filter(Ticket.category_id == category_id)
+        if not data or not report_jobs.is_registered(data.get('report')):
+            return jsonify({'message': 'Relatório inválido'}), 400
         
-        tickets = query.order_by(Ticket.generated_at.desc()).all()
+        unit_id = data.get('unit_id')
+        if current_user.role != 'admin':
+            unit_id = current_user.unit_id
         
-        # Prepara dados para exportação
-        export_data = []
-        for ticket in tickets:
-            export_data.append({
-                'numero_senha': ticket.ticket_number,
-                'categoria': ticket.category.name if ticket.category else '',
-                'guiche': ticket.counter.name if ticket.counter else '',
-                'status': ticket.status,
-                'gerada_em': ticket.generated_at.strftime('%d/%m/%Y %H:%M:%S'),
-                'chamada_em': ticket.called_at.strftime('%d/%m/%Y %H:%M:%S') if ticket.called_at else '',
-                'finalizada_em': ticket.finished_at.strftime('%d/%m/%Y %H:%M:%S') if ticket.finished_at else '',
-                'tempo_atendimento': f'{ticket.service_time}s' if ticket.service_time else ''
-            })
+        if not unit_id:
+            return jsonify({'message': 'Unidade é obrigatória'}), 400
         
-        return jsonify({
-            'data': export_data,
-            'summary': {
-                'total': len(tickets),
-                'period': f"{start_date} a {end_date}" if start_date and end_date else "Todos os registros"
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if data['report'] == 'dashboard':
+            params = {'day': datetime.now().date().isoformat()}
+        elif data['report'] == 'period':
+            if not start_date or not end_date:
+                return jsonify({'message': 'Datas de início e fim são obrigatórias'}), 400
+            
+            params = {
+                'start_date': datetime.fromisoformat(start_date).date().isoformat(),
+                'end_date': datetime.fromisoformat(end_date).date().isoformat()
             }
-        }), 200
+        elif data['report'] == 'percentiles':
+            if not start_date or not end_date:
+                return jsonify({'message': 'Datas de início e fim são obrigatórias'}), 400
+            
+            category_id = data.get('category_id')
+            counter_id = data.get('counter_id')
+            params = {
+                'start_date': datetime.fromisoformat(start_date).date().isoformat(),
+                'end_date': datetime.fromisoformat(end_date).date().isoformat(),
+                'category_id': int(category_id) if category_id else None,
+                'counter_id': int(counter_id) if counter_id else None,
+                'histogram': bool(data.get('histogram'))
+            }
+        elif data['report'] == 'forecast':
+            if not forecast.is_available():
+                return jsonify({'message': 'Previsão indisponível: numpy não está instalado'}), 501
+            
+            params = _forecast_params(
+                int(data.get('weeks', 12)),
+                int(data.get('target_wait', 600)),
+                float(data.get('service_level', 0.8))
+            )
+        else:
+            category_id = data.get('category_id')
+            params = {
+                'start_date': start_date,
+                'end_date': end_date,
+                'category_id': int(category_id) if category_id else None
+            }
+        
+        job = report_jobs.submit(data['report'], unit_id, params)
+        
+        return jsonify({
+            'message': 'Relatório enfileirado',
+            'job': job.to_dict()
+        }), 202 if job.status != 'done' else 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@reports_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_report_job(current_user, job_id):
+    """Consulta o andamento de um relatório em segundo plano"""
+    try:
+        job = report_jobs.get_job(job_id)
+        if not job:
+            return jsonify({'message': 'Relatório não encontrado'}), 404
+        
+        # Verifica permissões
+        if current_user.role != 'admin' and current_user.unit_id != job.unit_id:
+            return jsonify({'message': 'Acesso negado'}), 403
+        
+        return jsonify(job.to_dict()), 200
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@reports_bp.route('/reports/jobs/<job_id>/result', methods=['GET'])
+@token_required
+def get_report_job_result(current_user, job_id):
+    """Baixa o resultado de um relatório concluído"""
+    try:
+        job = report_jobs.get_job(job_id)
+        if not job:
+            return jsonify({'message': 'Relatório não encontrado'}), 404
+        
+        # Verifica permissões
+        if current_user.role != 'admin' and current_user.unit_id != job.unit_id:
+            return jsonify({'message': 'Acesso negado'}), 403
+        
+        if job.status != 'done':
+            return jsonify({'message': 'Relatório ainda não concluído', 'job': job.to_dict()}), 409
+        
+        result = report_jobs.get_result(job_id)
+        if result is None:
+            return jsonify({'message': 'Resultado expirado. Gere o relatório novamente.'}), 404
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -0,0 +1,66 @@
+import gzip
+import json
+from flask import Blueprint, jsonify, request
+from src.routes.auth import sync_token_required
+from src.services import edge, reference_cache, wire_format
+
+sync_bp = Blueprint('sync', __name__)
+
+def _unit_exists(unit_id):
+    return reference_cache.get('unit', unit_id) is not None
+
+@sync_bp.route('/sync/units/<int:unit_id>/register', methods=['POST'])
+@sync_token_required
+def register_edge(unit_id):
+    """Registra o nó local da unidade; retorna o cursor e o piso dos ids de senhas"""
+    try:
+        if not _unit_exists(unit_id):
+            return jsonify({'message': 'Unidade não encontrada'}), 404
+        
+        return jsonify(edge.register(unit_id)), 200
+    
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@sync_bp.route('/sync/units/<int:unit_id>/reference', methods=['GET'])
+@sync_token_required
+def get_edge_reference(unit_id):
+    """Unidade, categorias, guichês, painel e usuários para o nó local"""
+    try:
+        if not _unit_exists(unit_id):
+            return jsonify({'message': 'Unidade não encontrada'}), 404
+        
+        return wire_format.respond(edge.reference_payload(unit_id))
+    
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@sync_bp.route('/sync/units/<int:unit_id>/events', methods=['POST'])
+@sync_token_required
+def receive_edge_events(unit_id):
+    """Aplica um lote de eventos do nó local (corpo JSON, opcionalmente gzip)"""
+    try:
+        try:
+            body = request.get_data()
+            if request.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            data = json.loads(body)
+            after = int(data.get('after', 0))
+            rows = [tuple(row) for row in data.get('events', [])]
+            numbers = data.get('numbers') or {}
+        except (ValueError, TypeError, AttributeError, OSError):
+            return jsonify({'message': 'Lote de eventos inválido'}), 400
+        
+        if any(len(row) != len(edge.EVENT_COLUMNS) for row in rows):
+            return jsonify({'message': 'Lote de eventos inválido'}), 400
+        
+        applied, last_seq = edge.apply_batch(unit_id, after, rows, numbers)
+        
+        return jsonify({'applied': applied, 'last_seq': last_seq}), 200
+    
+    except edge.NotRegistered:
+        return jsonify({'message': 'Unidade sem nó local registrado'}), 404
+    except edge.SyncGap as e:
+        return jsonify({'message': 'Lote fora de sequência', 'last_seq': e.last_seq}), 409
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -1,14 +1,22 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from sqlalchemy import func, and_, or_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from src.models.user import db
 from src.models.ticket import Ticket
 from src.models.category import Category
 from src.models.counter import Counter
 from src.routes.auth import token_required
+from src.services import events, idempotency, long_poll, quantiles, reference_cache, watermarks, wire_format
+from src.services import announcements, counter_usage, display_snapshots, edge, read_models, shards
+from src.services.replica import use_replica
+from src.services.serialization import ticket_row_to_dict
 
 tickets_bp = Blueprint('tickets', __name__)
 
+# No central, senhas de unidades com nó local só mudam pela sincronização
+tickets_bp.before_request(edge.guard_central_writes)
+
 def generate_ticket_number(category_prefix, unit_id):
     """Gera o próximo número de senha para uma categoria"""
     today = datetime.now().date()
@@ -42,7 +50,18 @@ def generate_ticket(current_user):
         if not data or not data.get('category_id'):
             return jsonify({'message': 'ID da categoria é obrigatório'}), 400
         
-        category = Category.query.get_or_404(data['category_id'])
+        # Repetições com a mesma Idempotency-Key recebem a resposta original
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key:
+            if len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+                return jsonify({'message': 'Idempotency-Key inválida'}), 400
+            
+            request_fingerprint = idempotency.fingerprint(data)
+            stored = idempotency.lookup(current_user.id, idempotency_key, request_fingerprint)
+            if stored:
+                return idempotency.replay(stored)
+        
+        category = reference_cache.get_or_404('category', data['category_id'])
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != category.unit_id:
@@ -62,13 +81,39 @@ def generate_ticket(current_user):
         )
         
         db.session.add(ticket)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Senha gerada com sucesso',
-            'ticket': ticket.to_dict()
-        }), 201
-        
+        events.append(ticket, events.GENERATED)
+        watermarks.bump(category.unit_id)
+        
+        if not idempotency_key:
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Senha gerada com sucesso',
+                'ticket': ticket.to_dict()
+            }), 201
+        
+        # Grava a resposta na mesma transação da senha
+        try:
+            db.session.flush()
+            body = current_app.json.dumps({
+                'message': 'Senha gerada com sucesso',
+                'ticket': ticket.to_dict()
+            }, separators=(',', ':'))
+            stored = idempotency.remember(current_user.id, idempotency_key, request_fingerprint, 201, body)
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição com a mesma chave foi confirmada primeiro
+            db.session.rollback()
+            stored = idempotency.lookup(current_user.id, idempotency_key, request_fingerprint)
+            if not stored:
+                raise
+            return idempotency.replay(stored)
+        
+        idempotency.cache(current_user.id, idempotency_key, stored)
+        return current_app.response_class(body, status=201, mimetype='application/json')
+        
+    except idempotency.IdempotencyConflict:
+        return jsonify({'message': 'Idempotency-Key já utilizada com outros dados'}), 422
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
@@ -85,17 +130,9 @@ def get_queue(current_user):
             return jsonify({'message': 'Unidade é obrigatória'}), 400
         
         # Busca senhas aguardando, ordenadas por prioridade e ordem de chegada
-        tickets = Ticket.query.join(Category).filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                Ticket.status == 'waiting'
-            )
-        ).order_by(
-            Category.priority.desc(),
-            Ticket.generated_at.asc()
-        ).all()
+        rows = read_models.queue_rows(unit_id)
         
-        return jsonify([ticket.to_dict() for ticket in tickets]), 200
+        return wire_format.respond([ticket_row_to_dict(row) for row in rows])
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -112,24 +149,33 @@ def call_ticket(current_user, ticket_id):
             return jsonify({'message': 'ID do guichê é obrigatório'}), 400
         
         ticket = Ticket.query.get_or_404(ticket_id)
-        counter = Counter.query.get_or_404(counter_id)
+        counter = reference_cache.get_or_404('counter', counter_id)
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != ticket.unit_id:
             return jsonify({'message': 'Acesso negado'}), 403
         
-        if ticket.status not in ['waiting', 'called']:
+        # Senha em chamada pode ser chamada de novo (RECALLED mantém a primeira chamada)
+        if ticket.status not in ['waiting', 'calling']:
             return jsonify({'message': 'Senha não pode ser chamada neste status'}), 400
         
         if not counter.is_active:
             return jsonify({'message': 'Guichê inativo'}), 400
         
         # Atualiza o status da senha
+        first_call = ticket.status == 'waiting'
         ticket.status = 'calling'
         ticket.counter_id = counter_id
         ticket.called_at = datetime.utcnow()
+        events.append(ticket, events.CALLED if first_call else events.RECALLED, ticket.called_at)
+        watermarks.bump(ticket.unit_id, ticket.generated_at)
+        
+        # Tempo de espera conta só a primeira chamada
+        if first_call:
+            quantiles.record_wait(ticket)
         
         db.session.commit()
+        announcements.warm(ticket.ticket_number, counter_id)
         
         return jsonify({
             'message': 'Senha chamada com sucesso',
@@ -150,7 +196,7 @@ def call_next_ticket(current_user):
         if not counter_id:
             return jsonify({'message': 'ID do guichê é obrigatório'}), 400
         
-        counter = Counter.query.get_or_404(counter_id)
+        counter = reference_cache.get_or_404('counter', counter_id)
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != counter.unit_id:
@@ -177,8 +223,12 @@ def call_next_ticket(current_user):
         next_ticket.status = 'calling'
         next_ticket.counter_id = counter_id
         next_ticket.called_at = datetime.utcnow()
+        events.append(next_ticket, events.CALLED, next_ticket.called_at)
+        watermarks.bump(next_ticket.unit_id, next_ticket.generated_at)
+        quantiles.record_wait(next_ticket)
         
         db.session.commit()
+        announcements.warm(next_ticket.ticket_number, counter_id)
         
         return jsonify({
             'message': 'Próxima senha chamada com sucesso',
@@ -206,6 +256,10 @@ def finish_ticket(current_user, ticket_id):
         ticket.status = 'finished'
         ticket.finished_at = datetime.utcnow()
         ticket.calculate_service_time()
+        events.append(ticket, events.FINISHED, ticket.finished_at)
+        watermarks.bump(ticket.unit_id, ticket.generated_at)
+        quantiles.record_service(ticket)
+        counter_usage.record_service(ticket)
         
         db.session.commit()
         
@@ -233,6 +287,8 @@ def miss_ticket(current_user, ticket_id):
         
         # Marca como perdida
         ticket.status = 'missed'
+        events.append(ticket, events.MISSED)
+        watermarks.bump(ticket.unit_id, ticket.generated_at)
         
         db.session.commit()
         
@@ -248,36 +304,34 @@ def miss_ticket(current_user, ticket_id):
 def get_current_display(current_user=None):
     """Obtém informações para o painel de exibição pública"""
     try:
-        unit_id = request.args.get('unit_id')
-        if not unit_id:
+        if not request.args.get('unit_id'):
             return jsonify({'message': 'ID da unidade é obrigatório'}), 400
         
-        # Senha atualmente sendo chamada
-        current_ticket = Ticket.query.filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                Ticket.status == 'calling'
-            )
-        ).order_by(Ticket.called_at.desc()).first()
+        unit_id = request.args.get('unit_id', type=int)
+        if unit_id is None:
+            return jsonify({'message': 'ID da unidade inválido'}), 400
         
-        # Últimas 5 senhas chamadas
-        recent_tickets = Ticket.query.filter(
-            and_(
-                Ticket.unit_id == unit_id,
-                or_(Ticket.status == 'finished', Ticket.status == 'missed')
-            )
-        ).order_by(Ticket.called_at.desc()).limit(5).all()
+        # Rota pública: só unidades existentes ganham snapshot em memória
+        if reference_cache.get('unit', unit_id) is None:
+            return jsonify({'message': 'Unidade não encontrada'}), 404
         
-        return jsonify({
-            'current_ticket': current_ticket.to_dict() if current_ticket else None,
-            'recent_tickets': [ticket.to_dict() for ticket in recent_tickets]
-        }), 200
+        # Senha atualmente sendo chamada e últimas 5 senhas chamadas, do
+        # snapshot compartilhado com os demais painéis (services/display_snapshots)
+        snapshot = display_snapshots.unit_snapshot(unit_id)
+        
+        return wire_format.respond({
+            'current_ticket': snapshot['current_ticket'],
+            'recent_tickets': snapshot['recent_tickets'],
+            'settings': snapshot['settings'],
+            'announcement': snapshot['announcement']
+        })
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
 @tickets_bp.route('/tickets/history', methods=['GET'])
 @token_required
+@use_replica
 def get_tickets_history(current_user):
     """Obtém histórico de senhas"""
     try:
@@ -294,24 +348,65 @@ def get_tickets_history(current_user):
         category_id = request.args.get('category_id')
         status = request.args.get('status')
         
-        query = Ticket.query.filter(Ticket.unit_id == unit_id)
+        rows = read_models.history_rows(
+            unit_id,
+            start=datetime.fromisoformat(start_date) if start_date else None,
+            end=datetime.fromisoformat(end_date) if end_date else None,
+            category_id=category_id,
+            status=status
+        )
         
-        if start_date:
-            query = query.filter(Ticket.generated_at >= datetime.fromisoformat(start_date))
+        return wire_format.respond([ticket_row_to_dict(row) for row in rows])
         
-        if end_date:
-            query = query.filter(Ticket.generated_at <= datetime.fromisoformat(end_date))
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@tickets_bp.route('/tickets/events', methods=['GET'])
+@token_required
+def get_ticket_events(current_user):
+    """Acompanha as transições de senhas a partir de um número de sequência"""
+    try:
+        unit_id = request.args.get('unit_id')
+        if current_user.role != 'admin':
+            unit_id = current_user.unit_id
+        
+        # Com um banco por unidade, cada unidade tem sua própria sequência
+        if not unit_id and shards.is_enabled():
+            return jsonify({'message': 'Unidade é obrigatória'}), 400
         
-        if category_id:
-            query = query.filter(Ticket.category_id == category_id)
+        after = request.args.get('after', 0, type=int)
+        limit = request.args.get('limit', events.MAX_PAGE, type=int)
         
-        if status:
-            query = query.filter(Ticket.status == status)
+        # Espera longa opcional: responde assim que houver um evento novo
+        # (sem vaga de espera no worker, responde na hora)
+        wait = long_poll.max_wait(request.args.get('wait', 0, type=float))
         
-        tickets = query.order_by(Ticket.generated_at.desc()).all()
+        if wait:
+            with long_poll.slot() as waiting:
+                rows = events.since(after, unit_id, limit, wait if waiting else 0)
+        else:
+            rows = events.since(after, unit_id, limit)
         
-        return jsonify([ticket.to_dict() for ticket in tickets]), 200
+        return wire_format.respond({
+            'events': [events.to_dict(row) for row in rows],
+            'last_seq': rows[-1][0] if rows else after
+        })
         
     except Exception as e:
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@tickets_bp.route('/tickets/<int:ticket_id>/events', methods=['GET'])
+@token_required
+def get_ticket_audit(current_user, ticket_id):
+    """Trilha de auditoria de uma senha"""
+    try:
+        ticket = Ticket.query.get_or_404(ticket_id)
+        
+        # Verifica permissões
+        if current_user.role != 'admin' and current_user.unit_id != ticket.unit_id:
+            return jsonify({'message': 'Acesso negado'}), 403
+        
+        return jsonify([events.to_dict(row) for row in events.for_ticket(ticket_id)]), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -1,20 +1,27 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from src.models.user import db
 from src.models.unit import Unit
 from src.routes.auth import token_required, admin_required
+from src.services import reference_cache
 
 units_bp = Blueprint('units', __name__)
 
+def _visible(query):
+    """Oculta unidades arquivadas, a menos que include_archived=true"""
+    if request.args.get('include_archived') == 'true':
+        return query
+    return query.filter(Unit.archived_at.is_(None))
+
 @units_bp.route('/units', methods=['GET'])
 @token_required
 def get_units(current_user):
     """Lista todas as unidades"""
     try:
         if current_user.role == 'admin':
-            units = Unit.query.all()
+            units = _visible(Unit.query).all()
         else:
             # Atendentes só veem sua própria unidade
-            units = Unit.query.filter_by(id=current_user.unit_id).all() if current_user.unit_id else []
+            units = _visible(Unit.query.filter_by(id=current_user.unit_id)).all() if current_user.unit_id else []
         
         return jsonify([unit.to_dict() for unit in units]), 200
     except Exception as e:
@@ -38,6 +45,7 @@ def create_unit(current_user):
         
         db.session.add(unit)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Unidade criada com sucesso',
@@ -52,7 +60,7 @@ def create_unit(current_user):
 def get_unit(current_user, unit_id):
     """Obtém uma unidade específica"""
     try:
-        unit = Unit.query.get_or_404(unit_id)
+        unit = reference_cache.get_or_404('unit', unit_id)
         
         # Verifica permissões
         if current_user.role != 'admin' and current_user.unit_id != unit_id:
@@ -78,6 +86,7 @@ def update_unit(current_user, unit_id):
         unit.address = data.get('address', unit.address)
         
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             'message': 'Unidade atualizada com sucesso',
@@ -95,12 +104,25 @@ def delete_unit(current_user, unit_id):
     try:
         unit = Unit.query.get_or_404(unit_id)
         
-        # Verifica se há dados relacionados
-        if unit.counters or unit.categories or unit.tickets:
-            return jsonify({'message': 'Não é possível excluir unidade com dados relacionados'}), 400
+        # Verifica (via EXISTS) se há dados relacionados
+        if unit.has_dependents():
+            if not current_app.config.get('ARCHIVE_ON_DELETE', True):
+                return jsonify({'message': 'Não é possível excluir unidade com dados relacionados'}), 400
+            
+            # Exclusão lógica: o histórico de senhas não é alterado
+            unit.archive()
+            db.session.commit()
+            reference_cache.invalidate()
+            
+            return jsonify({
+                'message': 'Unidade arquivada (possui dados relacionados)',
+                'archived': True,
+                'unit': unit.to_dict()
+            }), 200
         
         db.session.delete(unit)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({'message': 'Unidade excluída com sucesso'}), 200
         
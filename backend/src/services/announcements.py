@@ -0,0 +1,301 @@
+import hashlib
+import io
+import os
+import re
+import shlex
+import subprocess
+import threading
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from src.models.category import Category
+from src.models.counter import Counter
+from src.services import reference_cache
+
+# Anúncios falados das senhas chamadas ("Senha N015, Guichê 02").
+#
+# Cada anúncio é a concatenação de trechos em WAV: a palavra "senha", o nome
+# de cada letra do prefixo, o número (0 a 999) e o nome do guichê. Os trechos
+# vêm de gravações fornecidas (ANNOUNCEMENT_RECORDINGS_DIR/<trecho>.wav, ex.:
+# senha.wav, letra-N.wav, numero-15.wav, guiche-3.wav) ou de um TTS local,
+# sem rede (ANNOUNCEMENT_TTS_COMMAND, ex.:
+# 'espeak-ng -v pt-br -s 150 -w {output} {text}'), e ficam gravados em
+# ANNOUNCEMENT_CACHE_DIR. "flask announcements render" (e a thread iniciada
+# com o servidor) gera de antemão os que faltam; montar um anúncio é só
+# juntar quadros PCM, sem síntese na hora da chamada. A rota pública nunca
+# chama o TTS: senhas acima de MAX_NUMBER ou trechos ainda não gerados dão
+# 404; só a montagem em segundo plano (warm, uma thread) gera um trecho que
+# falte (ex.: guichê renomeado).
+#
+# O caminho do anúncio (announcement_path) muda junto com o nome do guichê e
+# a origem dos trechos, então a resposta pode ter cache imutável. Chamar uma
+# senha já deixa o anúncio montado em memória (warm) antes de o painel pedir.
+
+LETTER_NAMES = {
+    'A': 'á', 'B': 'bê', 'C': 'cê', 'D': 'dê', 'E': 'é', 'F': 'éfe', 'G': 'gê',
+    'H': 'agá', 'I': 'i', 'J': 'jota', 'K': 'cá', 'L': 'éle', 'M': 'ême',
+    'N': 'ene', 'O': 'ó', 'P': 'pê', 'Q': 'quê', 'R': 'érre', 'S': 'ésse',
+    'T': 'tê', 'U': 'u', 'V': 'vê', 'W': 'dáblio', 'X': 'xis', 'Y': 'ípsilon',
+    'Z': 'zê',
+}
+
+MAX_NUMBER = 999
+TTS_TIMEOUT = 10
+
+TICKET_NUMBER = re.compile(r'^([A-Za-z]{0,5})(\d{1,4})$')
+
+_enabled = {}
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_render_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_renderer_started = False
+
+
+class Unavailable(Exception):
+    """Trecho sem gravação e sem TTS configurado (ou o TTS falhou)"""
+
+
+def is_enabled():
+    # Calculado uma vez por configuração: é consultado a cada snapshot do painel
+    signature = _signature()
+    enabled = _enabled.get(signature)
+    if enabled is None:
+        config = current_app.config
+        recordings = config.get('ANNOUNCEMENT_RECORDINGS_DIR')
+        enabled = _enabled[signature] = bool(config.get('ANNOUNCEMENT_TTS_COMMAND')) or bool(
+            recordings and os.path.isdir(recordings) and os.listdir(recordings)
+        )
+    return enabled
+
+
+def parse(ticket_number):
+    """(prefixo, número) de uma senha anunciável, ou None (formato inválido ou acima de MAX_NUMBER)"""
+    match = TICKET_NUMBER.match(ticket_number or '')
+    if not match or int(match.group(2)) > MAX_NUMBER:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def _signature():
+    # Origem dos trechos: trocar a voz ou as gravações gera arquivos e URLs novos
+    config = current_app.config
+    return f"{config.get('ANNOUNCEMENT_TTS_COMMAND') or ''}|{config.get('ANNOUNCEMENT_RECORDINGS_DIR') or ''}"
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+
+
+def segments(ticket_number, counter_id):
+    """(trecho, texto) de um anúncio, na ordem em que são falados"""
+    parsed = parse(ticket_number)
+    if parsed is None:
+        raise ValueError(ticket_number)
+    prefix, number = parsed
+
+    parts = [('senha', 'Senha')]
+    parts.extend((f'letra-{letter}', LETTER_NAMES.get(letter, letter)) for letter in prefix.upper())
+    parts.append((f'numero-{number}', str(number)))
+
+    counter = reference_cache.get('counter', counter_id)
+    if counter is not None:
+        parts.append((f'guiche-{int(counter_id)}', counter.name))
+    return parts
+
+
+def _render_segment(segment, text, path):
+    template = current_app.config.get('ANNOUNCEMENT_TTS_COMMAND')
+    if not template:
+        raise Unavailable(segment)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    args = [arg.format(output=tmp_path, text=text) for arg in shlex.split(template)]
+    try:
+        subprocess.run(args, check=True, timeout=TTS_TIMEOUT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(tmp_path, path)
+    except (OSError, subprocess.SubprocessError) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise Unavailable(f'{segment}: {e}')
+
+
+def _recording(segment):
+    recordings = current_app.config.get('ANNOUNCEMENT_RECORDINGS_DIR')
+    if recordings:
+        path = os.path.join(recordings, f'{segment}.wav')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _cache_path(segment, text):
+    return os.path.join(current_app.config['ANNOUNCEMENT_CACHE_DIR'], f'{segment}-{_digest(_signature() + "|" + text)}.wav')
+
+
+def segment_path(segment, text, synthesize=False):
+    """Arquivo WAV do trecho: gravação fornecida ou cópia gerada pelo TTS
+
+    Se o trecho ainda não foi gerado, só chama o TTS com synthesize (fora das
+    requisições); senão levanta Unavailable.
+    """
+    recorded = _recording(segment)
+    if recorded:
+        return recorded
+
+    path = _cache_path(segment, text)
+    if not os.path.exists(path):
+        if not synthesize:
+            raise Unavailable(segment)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _render_segment(segment, text, path)
+    return path
+
+
+def assemble(paths, gap_ms=0):
+    """Junta arquivos WAV de mesmo formato em um só, com gap_ms de silêncio entre eles"""
+    params = None
+    chunks = []
+    for path in paths:
+        with wave.open(path, 'rb') as clip:
+            clip_params = (clip.getnchannels(), clip.getsampwidth(), clip.getframerate())
+            if params is None:
+                params = clip_params
+            elif clip_params != params:
+                raise ValueError(f'{os.path.basename(path)}: formato {clip_params} diferente de {params}')
+            chunks.append(clip.readframes(clip.getnframes()))
+
+    channels, width, rate = params
+    # Silêncio: zero em PCM com sinal; 128 no PCM de 8 bits (sem sinal)
+    silence = (b'\x80' if width == 1 else b'\x00' * width) * channels * (rate * gap_ms // 1000)
+
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as result:
+        result.setnchannels(channels)
+        result.setsampwidth(width)
+        result.setframerate(rate)
+        result.writeframes(silence.join(chunks))
+    return output.getvalue()
+
+
+def version(counter_id):
+    """Parte da URL que muda com o nome do guichê e a origem dos trechos"""
+    counter = reference_cache.get('counter', counter_id)
+    return _digest(f"{_signature()}|{counter.name if counter else ''}")
+
+
+def announcement_path(ticket_number, counter_id):
+    """Caminho do anúncio (relativo a /api) ou None se os anúncios estão desativados"""
+    if not is_enabled() or counter_id is None or parse(ticket_number) is None:
+        return None
+    return f'/announcements/{ticket_number}/{int(counter_id)}.wav?v={version(counter_id)}'
+
+
+def render(ticket_number, counter_id, synthesize=False):
+    """Bytes WAV do anúncio, montados a partir dos trechos (cache em memória)"""
+    key = (ticket_number, int(counter_id), version(counter_id))
+    with _memory_lock:
+        audio = _memory.get(key)
+        if audio is not None:
+            _memory.move_to_end(key)
+            return audio
+
+    paths = [segment_path(segment, text, synthesize) for segment, text in segments(ticket_number, counter_id)]
+    audio = assemble(paths, current_app.config.get('ANNOUNCEMENT_GAP_MS', 150))
+
+    with _memory_lock:
+        _memory[key] = audio
+        while len(_memory) > current_app.config.get('ANNOUNCEMENT_MEMORY_ITEMS', 256):
+            _memory.popitem(last=False)
+    return audio
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='announcements')
+    return _executor
+
+
+def warm(ticket_number, counter_id):
+    """Monta o anúncio em segundo plano (chamada de senha), para o painel receber da memória"""
+    if not is_enabled() or parse(ticket_number) is None:
+        return
+    app = current_app._get_current_object()
+
+    def work():
+        with app.app_context():
+            try:
+                render(ticket_number, counter_id, synthesize=True)
+            except (Unavailable, ValueError) as e:
+                app.logger.warning('Anúncio %s indisponível: %s', ticket_number, e)
+
+    _get_executor().submit(work)
+
+
+def all_segments():
+    """Todos os trechos reutilizáveis: palavra "senha", letras dos prefixos, números e guichês"""
+    parts = [('senha', 'Senha')]
+    letters = set()
+    for (prefix,) in Category.query.with_entities(Category.prefix).all():
+        letters.update(prefix.upper())
+    parts.extend((f'letra-{letter}', LETTER_NAMES.get(letter, letter)) for letter in sorted(letters))
+    parts.extend((f'numero-{number}', str(number)) for number in range(MAX_NUMBER + 1))
+    parts.extend((f'guiche-{counter.id}', counter.name) for counter in Counter.query.all())
+    return parts
+
+
+def render_all(force=False):
+    """Gera os trechos que faltam no cache; retorna (gerados, já existentes)"""
+    rendered = existing = 0
+    with _render_lock:
+        for segment, text in all_segments():
+            path = _cache_path(segment, text)
+            if _recording(segment) or (os.path.exists(path) and not force):
+                existing += 1
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _render_segment(segment, text, path)
+            rendered += 1
+    return rendered, existing
+
+
+def start_renderer(app):
+    """Gera em segundo plano os trechos que faltam (só com ANNOUNCEMENT_TTS_COMMAND)"""
+    global _renderer_started
+    if _renderer_started or not app.config.get('ANNOUNCEMENT_TTS_COMMAND'):
+        return
+    _renderer_started = True
+
+    def work():
+        with app.app_context():
+            try:
+                rendered, _ = render_all()
+                if rendered:
+                    app.logger.info('%d trechos de anúncio gerados', rendered)
+            except Unavailable as e:
+                app.logger.warning('Falha ao gerar trechos de anúncio: %s', e)
+
+    threading.Thread(target=work, name='announcements-render', daemon=True).start()
+
+
+announcements_cli = AppGroup('announcements', help='Anúncios falados das senhas')
+
+
+@announcements_cli.command('render')
+@click.option('--force', is_flag=True, help='Gera de novo mesmo os trechos já existentes')
+def render_command(force):
+    """Gera os trechos de áudio (palavras, letras, números 0-999 e guichês)"""
+    if not current_app.config.get('ANNOUNCEMENT_TTS_COMMAND'):
+        raise click.ClickException('Defina ANNOUNCEMENT_TTS_COMMAND (ex.: espeak-ng -v pt-br -w {output} {text})')
+    try:
+        rendered, existing = render_all(force)
+    except Unavailable as e:
+        raise click.ClickException(f'TTS falhou: {e}')
+    click.echo(f'{rendered} trechos gerados, {existing} já existentes')
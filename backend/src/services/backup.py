@@ -0,0 +1,309 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from src.models.user import db
+from src.services import reference_cache, report_cache, shards
+
+# Cópias de segurança do banco SQLite com o serviço em funcionamento.
+#
+# Com o banco em WAL, VACUUM INTO lê uma fotografia consistente dentro de uma
+# única transação de leitura: as escritas de senhas continuam normalmente e a
+# cópia sai compactada. Em SQLite anterior a 3.27 usa-se a API de backup em
+# um único passo, que em WAL também é só uma transação de leitura (em vários
+# passos, cada escrita de outra conexão reinicia a cópia, que sob movimento
+# contínuo não termina). A cópia é gravada em arquivo temporário e publicada
+# ao final com um nome ainda não usado (horário com microssegundos e, se
+# preciso, um contador), de modo que o diretório nunca contém fotografias
+# incompletas e duas fotografias nunca se sobrescrevem.
+#
+# O agendador (start_scheduler) mantém fotografias periódicas com rotação (as
+# BACKUP_KEEP mais recentes de cada prefixo, inclusive as gravadas antes de
+# restaurações e da migração para UNIT_SHARDS); a restauração é feita pelo
+# comando "flask backup restore".
+#
+# No modo UNIT_SHARDS os bancos das unidades entram na mesma fotografia, em
+# <nome>.units/ (copiados um após o outro, cada um consistente em si).
+
+SNAPSHOT_PREFIX = 'app'
+PRE_RESTORE_PREFIX = 'pre-restore'
+PRE_SHARDS_PREFIX = 'pre-shards'
+ROTATED_PREFIXES = (SNAPSHOT_PREFIX, PRE_RESTORE_PREFIX, PRE_SHARDS_PREFIX)
+SNAPSHOT_SUFFIX = '.db'
+UNITS_SUFFIX = '.units'
+STAMP_FORMAT = '%Y%m%d-%H%M%S-%f'
+
+# <prefixo>-<horário>[-<contador>].db; o horário de nomes antigos não tem microssegundos
+_SNAPSHOT_NAME = re.compile(r'^.+?-(\d{8}-\d{6}(?:-\d{6})?)(?:-(\d+))?\.db$')
+
+SCHEDULER_CHECK_INTERVAL = 60
+LOCK_STALE_AFTER = 3600
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def database_path():
+    return db.engine.url.database
+
+
+def backup_dir():
+    path = current_app.config['BACKUP_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _supports_vacuum_into():
+    return sqlite3.sqlite_version_info >= (3, 27, 0)
+
+
+def _copy(source, target, method):
+    source_conn = sqlite3.connect(source, timeout=30)
+    try:
+        source_conn.execute('PRAGMA busy_timeout=5000')
+        if method == 'vacuum':
+            source_conn.execute('VACUUM INTO ?', (target,))
+            return
+
+        target_conn = sqlite3.connect(target)
+        try:
+            source_conn.backup(target_conn)
+        finally:
+            target_conn.close()
+    finally:
+        source_conn.close()
+
+
+def copy_to(path, method=None):
+    """Copia o banco em funcionamento para path (substituição atômica); retorna (método, segundos)"""
+    if method is None:
+        method = 'vacuum' if _supports_vacuum_into() else 'backup'
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    started = time.perf_counter()
+    try:
+        _copy(database_path(), tmp_path, method)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return method, round(time.perf_counter() - started, 3)
+
+
+def _publish(tmp_path, prefix):
+    # os.link não substitui um arquivo existente: em caso de colisão tenta o próximo nome
+    stamp = datetime.now().strftime(STAMP_FORMAT)
+    attempt = 0
+    while True:
+        name = f"{prefix}-{stamp}{f'-{attempt}' if attempt else ''}{SNAPSHOT_SUFFIX}"
+        try:
+            os.link(tmp_path, os.path.join(backup_dir(), name))
+            return name
+        except FileExistsError:
+            attempt += 1
+
+
+def create_snapshot(prefix=SNAPSHOT_PREFIX, method=None):
+    """Grava uma fotografia do banco no diretório de backups e retorna seus dados"""
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{prefix}-', suffix='.tmp', dir=backup_dir())
+    os.close(fd)
+    try:
+        method, seconds = copy_to(tmp_path, method)
+        name = _publish(tmp_path, prefix)
+    finally:
+        os.remove(tmp_path)
+    path = os.path.join(backup_dir(), name)
+
+    shard_files = shards.shard_files()
+    if shard_files:
+        started = time.perf_counter()
+        tmp_dir = f'{path}{UNITS_SUFFIX}.{os.getpid()}.tmp'
+        os.makedirs(tmp_dir)
+        try:
+            for unit_id, source in shard_files:
+                _copy(source, os.path.join(tmp_dir, os.path.basename(source)), method)
+            os.replace(tmp_dir, f'{path}{UNITS_SUFFIX}')
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        seconds = round(seconds + time.perf_counter() - started, 3)
+
+    return {
+        'name': name,
+        'size': os.path.getsize(path),
+        'method': method,
+        'seconds': seconds
+    }
+
+
+def _age_key(name, mtime):
+    # Horário do nome e contador de colisão: pela ordem alfabética "-1" viria
+    # antes do nome sem contador. Nomes fora do padrão usam a data do arquivo.
+    match = _SNAPSHOT_NAME.match(name)
+    if match is None:
+        return datetime.fromtimestamp(mtime).strftime(STAMP_FORMAT), 0, name
+    return match.group(1), int(match.group(2) or 0), name
+
+
+def list_snapshots(prefix=None):
+    """Fotografias existentes, das mais recentes para as mais antigas"""
+    snapshots = []
+    for entry in os.scandir(backup_dir()):
+        if not entry.name.endswith(SNAPSHOT_SUFFIX):
+            continue
+        if prefix and not entry.name.startswith(f'{prefix}-'):
+            continue
+
+        stat = entry.stat()
+        snapshots.append((_age_key(entry.name, stat.st_mtime), {
+            'name': entry.name,
+            'size': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat()
+        }))
+
+    snapshots.sort(key=lambda item: item[0], reverse=True)
+    return [snapshot for key, snapshot in snapshots]
+
+
+def rotate(keep=None):
+    """Remove as fotografias mais antigas, mantendo as keep mais recentes de cada prefixo"""
+    if keep is None:
+        keep = current_app.config.get('BACKUP_KEEP', 14)
+
+    removed = []
+    for prefix in ROTATED_PREFIXES:
+        for snapshot in list_snapshots(prefix)[keep:]:
+            os.remove(os.path.join(backup_dir(), snapshot['name']))
+            shutil.rmtree(os.path.join(backup_dir(), snapshot['name'] + UNITS_SUFFIX), ignore_errors=True)
+            removed.append(snapshot['name'])
+    return removed
+
+
+def restore(name):
+    """Substitui o conteúdo do banco pelo de uma fotografia
+
+    Uma fotografia do estado atual é gravada antes (prefixo pre-restore). A
+    cópia usa a API de backup do SQLite sobre o banco em uso, respeitando os
+    bloqueios das demais conexões.
+    """
+    path = os.path.join(backup_dir(), os.path.basename(name))
+    if not os.path.isfile(path):
+        raise FileNotFoundError(name)
+
+    snapshot_conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        if snapshot_conn.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+            raise ValueError(f'Fotografia corrompida: {name}')
+
+        previous = create_snapshot(PRE_RESTORE_PREFIX)
+
+        live_conn = sqlite3.connect(database_path(), timeout=30)
+        try:
+            snapshot_conn.backup(live_conn)
+        finally:
+            live_conn.close()
+    finally:
+        snapshot_conn.close()
+
+    units_dir = path + UNITS_SUFFIX
+    if os.path.isdir(units_dir):
+        os.makedirs(current_app.config['UNIT_SHARD_DIR'], exist_ok=True)
+        for name in sorted(os.listdir(units_dir)):
+            _copy(os.path.join(units_dir, name), os.path.join(current_app.config['UNIT_SHARD_DIR'], name), 'backup')
+
+    # Resultados calculados sobre os dados substituídos deixam de valer
+    shutil.rmtree(current_app.config['REPORT_CACHE_DIR'], ignore_errors=True)
+    report_cache.clear()
+    reference_cache.invalidate()
+    return previous
+
+
+def acquire_lock(path):
+    """Cria o arquivo de trava de forma exclusiva; False se outro processo já o tem"""
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Trava esquecida por um processo encerrado no meio da cópia
+        if time.time() - os.path.getmtime(path) < LOCK_STALE_AFTER:
+            return False
+        os.remove(path)
+        return acquire_lock(path)
+    os.close(fd)
+    return True
+
+
+def run_scheduled(app):
+    """Grava uma fotografia se a mais recente for mais antiga que BACKUP_INTERVAL_HOURS"""
+    with app.app_context():
+        interval = app.config['BACKUP_INTERVAL_HOURS'] * 3600
+        latest = list_snapshots(SNAPSHOT_PREFIX)
+        if latest and time.time() - os.path.getmtime(os.path.join(backup_dir(), latest[0]['name'])) < interval:
+            return None
+
+        # Vários workers compartilham o diretório: só um grava a fotografia
+        lock_path = os.path.join(backup_dir(), '.lock')
+        if not acquire_lock(lock_path):
+            return None
+
+        try:
+            snapshot = create_snapshot()
+            rotate()
+            app.logger.info('Backup %s gravado em %.2fs', snapshot['name'], snapshot['seconds'])
+            return snapshot
+        finally:
+            os.remove(lock_path)
+
+
+def start_scheduler(app):
+    """Inicia a thread de backups periódicos (BACKUP_INTERVAL_HOURS = 0 desativa)"""
+    global _scheduler_started
+    if not app.config.get('BACKUP_INTERVAL_HOURS'):
+        return
+
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+
+    def loop():
+        while True:
+            time.sleep(SCHEDULER_CHECK_INTERVAL)
+            try:
+                run_scheduled(app)
+            except Exception:
+                app.logger.exception('Falha no backup agendado')
+
+    threading.Thread(target=loop, name='backup-scheduler', daemon=True).start()
+
+
+backup_cli = AppGroup('backup', help='Cópias de segurança do banco de dados')
+
+
+@backup_cli.command('create')
+def create_command():
+    """Grava uma fotografia do banco agora"""
+    snapshot = create_snapshot()
+    rotate()
+    click.echo(f"{snapshot['name']} ({snapshot['size']} bytes, {snapshot['method']}, {snapshot['seconds']}s)")
+
+
+@backup_cli.command('list')
+def list_command():
+    """Lista as fotografias disponíveis"""
+    for snapshot in list_snapshots():
+        click.echo(f"{snapshot['name']}\t{snapshot['size']}\t{snapshot['created_at']}")
+
+
+@backup_cli.command('restore')
+@click.argument('name')
+def restore_command(name):
+    """Restaura o banco a partir de uma fotografia"""
+    previous = restore(name)
+    click.echo(f'Banco restaurado de {name}; estado anterior salvo em {previous["name"]}')
+    click.echo('Reinicie o serviço para descartar os caches em memória dos workers.')
@@ -0,0 +1,92 @@
+import click
+from flask.cli import with_appcontext
+from src.models.user import db, User
+from src.models.unit import Unit
+from src.models.counter import Counter
+from src.models.category import Category
+from src.models.display_settings import DisplaySettings
+from src.services import events
+from src.services.schema import upgrade_schema
+
+# Inicialização explícita do banco.
+#
+# Criar tabelas, aplicar ajustes de esquema e gravar os dados iniciais não
+# acontece mais ao importar a aplicação (o que se repetia em cada worker): é
+# feito uma vez pelo comando "flask init-db", idempotente, antes de subir o
+# servidor.
+
+
+def seed_defaults():
+    """Cria admin, unidade, categorias, guichês e painel padrão em banco vazio"""
+    if User.query.first():
+        return False
+    
+    # Criar usuário admin padrão
+    admin = User(
+        username='admin',
+        email='admin@sistema.com',
+        role='admin'
+    )
+    admin.set_password('admin123')
+    db.session.add(admin)
+    
+    # Criar unidade padrão
+    unit = Unit(
+        name='Unidade Principal',
+        address='Endereço da unidade principal'
+    )
+    db.session.add(unit)
+    db.session.flush()  # Para obter o ID da unidade
+    
+    # Associar admin à unidade
+    admin.unit_id = unit.id
+    
+    # Criar categorias padrão
+    categories = [
+        Category(name='Normal', prefix='N', priority=1, unit_id=unit.id),
+        Category(name='Preferencial', prefix='P', priority=2, unit_id=unit.id),
+        Category(name='Urgência', prefix='U', priority=3, unit_id=unit.id)
+    ]
+    for category in categories:
+        db.session.add(category)
+    
+    # Criar guichês padrão
+    counters = [
+        Counter(name='Guichê 01', unit_id=unit.id),
+        Counter(name='Guichê 02', unit_id=unit.id),
+        Counter(name='Caixa 01', unit_id=unit.id)
+    ]
+    for counter in counters:
+        db.session.add(counter)
+    
+    # Criar configurações do painel
+    display_settings = DisplaySettings(
+        unit_id=unit.id,
+        message='Bem-vindos ao nosso atendimento!'
+    )
+    db.session.add(display_settings)
+    
+    db.session.commit()
+    return True
+
+
+def init_database():
+    """Cria/atualiza o esquema, preenche o registro de eventos e os dados iniciais
+
+    Com o esquema já na versão atual (services/schema.is_current) não há nada
+    a fazer: o banco foi inicializado antes por este mesmo código.
+    """
+    if not upgrade_schema():
+        return False
+    
+    events.backfill()
+    return seed_defaults()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Cria ou atualiza o banco de dados e grava os dados iniciais"""
+    if init_database():
+        click.echo('Dados iniciais criados com sucesso!')
+    click.echo('Banco de dados pronto.')
@@ -0,0 +1,206 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.counter_session import CounterSession
+from src.models.counter_usage import CounterUsage
+from src.services.sql import insert_for_dialect
+
+# Sessões de atendimento nos guichês e utilização, mantida incrementalmente.
+#
+# Um atendente abre uma sessão no guichê, pode pausar e retomar, e a fecha.
+# Cada transição soma em counter_usage o intervalo desde accounted_at
+# (disponível ou em pausa), dividido pelas horas (UTC) que ele atravessa; cada
+# atendimento finalizado soma o tempo da chamada à finalização (ocupado) e
+# uma senha, atribuídos ao atendente da sessão aberta no guichê. Atendimentos
+# em guichê sem sessão aberta não entram: não há tempo disponível com que
+# compará-los.
+#
+# O relatório de utilização soma as linhas de counter_usage do período (no
+# máximo 24 por guichê, atendente e dia) e o trecho ainda não somado das
+# sessões abertas, sem percorrer o histórico de senhas. Ocioso = disponível -
+# ocupado; utilização = ocupado / disponível, no máximo 1 (um atendimento que
+# atravessa a pausa conta como ocupado na hora em que a sessão estava em pausa).
+
+METRICS = ('available_seconds', 'paused_seconds', 'busy_seconds', 'tickets')
+
+
+class SessionError(Exception):
+    """Transição de sessão inválida no estado atual"""
+
+
+def split_by_hour(start, end):
+    """(dia, hora, segundos) de cada hora cheia atravessada pelo intervalo"""
+    moment = start
+    while moment < end:
+        boundary = moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        piece_end = min(boundary, end)
+        yield moment.date(), moment.hour, (piece_end - moment).total_seconds()
+        moment = piece_end
+
+
+def _add(unit_id, counter_id, user_id, day, hour, **values):
+    stmt = insert_for_dialect()(CounterUsage).values(
+        unit_id=unit_id, day=day, hour=hour, counter_id=counter_id, user_id=user_id,
+        **{metric: values.get(metric, 0) for metric in METRICS}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['unit_id', 'day', 'hour', 'counter_id', 'user_id'],
+        set_={metric: getattr(CounterUsage, metric) + value for metric, value in values.items()}
+    )
+    db.session.execute(stmt)
+
+
+def _add_interval(unit_id, counter_id, user_id, metric, start, end):
+    for day, hour, seconds in split_by_hour(start, end):
+        if round(seconds):
+            _add(unit_id, counter_id, user_id, day, hour, **{metric: round(seconds)})
+
+
+def _account(session, now):
+    # Soma o tempo desde a última contabilização como disponível ou pausa
+    metric = 'paused_seconds' if session.paused_at else 'available_seconds'
+    _add_interval(session.unit_id, session.counter_id, session.user_id, metric, session.accounted_at, now)
+    session.accounted_at = now
+
+
+def open_session(counter, user_id):
+    """Abre uma sessão do atendente no guichê (confirmada aqui)"""
+    now = datetime.utcnow()
+    session = CounterSession(
+        unit_id=counter.unit_id,
+        counter_id=counter.id,
+        user_id=user_id,
+        opened_at=now,
+        accounted_at=now
+    )
+    db.session.add(session)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Índice único parcial: outra sessão já está aberta no guichê
+        db.session.rollback()
+        raise SessionError('Guichê já tem uma sessão aberta')
+    return session
+
+
+def current_session(counter_id):
+    """Sessão aberta (ou pausada) do guichê, se houver"""
+    return CounterSession.query.filter(
+        CounterSession.counter_id == counter_id,
+        CounterSession.closed_at.is_(None)
+    ).first()
+
+
+def pause(session):
+    if session.paused_at:
+        raise SessionError('Sessão já está em pausa')
+    now = datetime.utcnow()
+    _account(session, now)
+    session.paused_at = now
+    db.session.commit()
+
+
+def resume(session):
+    if not session.paused_at:
+        raise SessionError('Sessão não está em pausa')
+    now = datetime.utcnow()
+    _account(session, now)
+    session.paused_seconds += round((now - session.paused_at).total_seconds())
+    session.paused_at = None
+    db.session.commit()
+
+
+def close(session):
+    now = datetime.utcnow()
+    _account(session, now)
+    if session.paused_at:
+        session.paused_seconds += round((now - session.paused_at).total_seconds())
+        session.paused_at = None
+    session.closed_at = now
+    db.session.commit()
+
+
+def record_service(ticket):
+    """Soma o atendimento finalizado ao uso do guichê (confirmado junto com a transação atual)"""
+    if ticket.counter_id is None or not ticket.called_at or not ticket.finished_at:
+        return
+
+    session = current_session(ticket.counter_id)
+    if session is None:
+        return
+
+    # Só o trecho do atendimento dentro da sessão conta como ocupado
+    start = max(ticket.called_at, session.opened_at)
+    _add_interval(ticket.unit_id, ticket.counter_id, session.user_id, 'busy_seconds', start, ticket.finished_at)
+    _add(ticket.unit_id, ticket.counter_id, session.user_id, ticket.finished_at.date(), ticket.finished_at.hour,
+         tickets=1)
+
+
+def _summary(totals):
+    available = totals['available_seconds']
+    busy = totals['busy_seconds']
+    return {
+        **totals,
+        'idle_seconds': max(available - busy, 0),
+        'utilization': round(min(busy, available) / available, 4) if available else None,
+        'tickets_per_hour': round(totals['tickets'] * 3600 / available, 2) if available else None
+    }
+
+
+def _sums(unit_id, start_day, end_day, *keys):
+    # Soma as linhas de counter_usage do período agrupadas pelas colunas keys
+    rows = db.session.query(
+        *keys, *(func.sum(getattr(CounterUsage, metric)) for metric in METRICS)
+    ).filter(
+        CounterUsage.unit_id == unit_id,
+        CounterUsage.day >= start_day,
+        CounterUsage.day <= end_day
+    ).group_by(*keys).all()
+    return [(tuple(row[:len(keys)]), dict(zip(METRICS, row[len(keys):]))) for row in rows]
+
+
+def utilization(unit_id, start_day, end_day, by_hour=False, now=None):
+    """Disponível, pausa, ocupado, ocioso, utilização e senhas/hora por guichê e por atendente"""
+    now = now or datetime.utcnow()
+    samples = _sums(unit_id, start_day, end_day, CounterUsage.counter_id, CounterUsage.user_id)
+    hour_samples = _sums(unit_id, start_day, end_day, CounterUsage.day, CounterUsage.hour) if by_hour else []
+
+    # Trecho das sessões abertas ainda não somado, limitado ao período
+    period_start = datetime.combine(start_day, time.min)
+    period_end = min(datetime.combine(end_day + timedelta(days=1), time.min), now)
+    open_sessions = CounterSession.query.filter(
+        CounterSession.unit_id == unit_id,
+        CounterSession.closed_at.is_(None)
+    ).all()
+    for session in open_sessions:
+        metric = 'paused_seconds' if session.paused_at else 'available_seconds'
+        start = max(session.accounted_at, period_start)
+        for day, hour, seconds in split_by_hour(start, period_end):
+            samples.append(((session.counter_id, session.user_id), {metric: round(seconds)}))
+            hour_samples.append(((day, hour), {metric: round(seconds)}))
+
+    groups = {'counters': {}, 'users': {}, 'total': {}, 'hours': {}}
+    for (counter_id, user_id), values in samples:
+        for group, key in (('counters', counter_id), ('users', user_id), ('total', None)):
+            totals = groups[group].setdefault(key, dict.fromkeys(METRICS, 0))
+            for metric, value in values.items():
+                totals[metric] += value or 0
+    for key, values in hour_samples:
+        totals = groups['hours'].setdefault(key, dict.fromkeys(METRICS, 0))
+        for metric, value in values.items():
+            totals[metric] += value or 0
+
+    result = {
+        'period': {'start_date': start_day.isoformat(), 'end_date': end_day.isoformat()},
+        'total': _summary(groups['total'].get(None, dict.fromkeys(METRICS, 0))),
+        'counters': [{'counter_id': key, **_summary(totals)} for key, totals in sorted(groups['counters'].items())],
+        'users': [{'user_id': key or None, **_summary(totals)} for key, totals in sorted(groups['users'].items())],
+        'open_sessions': [session.to_dict() for session in open_sessions]
+    }
+    if by_hour:
+        result['hours'] = [
+            {'day': day.isoformat(), 'hour': hour, **_summary(totals)}
+            for (day, hour), totals in sorted(groups['hours'].items())
+        ]
+    return result
@@ -0,0 +1,91 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from flask import current_app
+from src.models.user import db
+from src.services import announcements, read_models, reference_cache, shards, watermarks
+from src.services.serialization import ticket_row_to_dict
+
+# Estado dos painéis públicos, calculado uma vez por versão de cada unidade.
+#
+# O snapshot de uma unidade (senha em chamada, últimas senhas, configurações
+# do painel e caminho do anúncio falado) fica em memória junto com a marca d'água dos dados e a versão dos
+# dados de referência com que foi calculado; enquanto nenhuma das duas muda,
+# todos os painéis do processo (de uma unidade ou de uma parede com várias)
+# recebem o mesmo objeto sem consultar as senhas. A marca d'água é relida no
+# máximo a cada DISPLAY_SNAPSHOT_MAX_AGE segundos.
+#
+# wall() junta os snapshots de várias unidades em uma resposta só, com uma
+# ETag derivada das versões: o painel repete a requisição com If-None-Match
+# e recebe 304 (ou, com wait, a resposta assim que alguma unidade mudar).
+#
+# No máximo MAX_SNAPSHOTS unidades ficam em memória (LRU); as rotas públicas só
+# pedem snapshots de unidades existentes.
+
+MAX_WALL_UNITS = 24
+MAX_SNAPSHOTS = 1024
+POLL_INTERVAL = 0.5
+
+_lock = threading.Lock()
+_snapshots = OrderedDict()
+
+
+def _versions(unit_id):
+    max_age = current_app.config.get('DISPLAY_SNAPSHOT_MAX_AGE', 1.0)
+    with shards.for_unit(unit_id):
+        return watermarks.snapshot(unit_id, max_age)[0], reference_cache.current_version()
+
+
+def unit_snapshot(unit_id, versions=None):
+    """Senha em chamada, últimas senhas e configurações do painel da unidade"""
+    unit_id = int(unit_id)
+    versions = versions or _versions(unit_id)
+
+    cached = _snapshots.get(unit_id)
+    if cached is not None and cached[0] == versions:
+        with _lock:
+            if unit_id in _snapshots:
+                _snapshots.move_to_end(unit_id)
+        return cached[1]
+
+    with shards.for_unit(unit_id):
+        current_row, recent_rows = read_models.display_rows(unit_id)
+    snapshot = {
+        'unit_id': unit_id,
+        'current_ticket': ticket_row_to_dict(current_row) if current_row else None,
+        'recent_tickets': [ticket_row_to_dict(row) for row in recent_rows],
+        'settings': reference_cache.display_settings_dict(unit_id),
+        'announcement': announcements.announcement_path(current_row[1], current_row[4]) if current_row else None
+    }
+
+    with _lock:
+        _snapshots[unit_id] = (versions, snapshot)
+        _snapshots.move_to_end(unit_id)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def wall_state(unit_ids):
+    """(ETag, versões de cada unidade); a ETag muda quando qualquer unidade muda"""
+    versions = [_versions(unit_id) for unit_id in unit_ids]
+    parts = ','.join(f'{unit_id}:{version}:{reference}' for unit_id, (version, reference) in zip(unit_ids, versions))
+    return f'wall-{zlib.crc32(parts.encode()):08x}', versions
+
+
+def wall(unit_ids, versions):
+    """Snapshots das unidades, na ordem pedida (versions de wall_state)"""
+    return [unit_snapshot(unit_id, unit_versions) for unit_id, unit_versions in zip(unit_ids, versions)]
+
+
+def wait_for_change(unit_ids, etag, wait):
+    """Aguarda até wait segundos alguma unidade mudar; retorna wall_state() atual"""
+    deadline = time.monotonic() + wait
+    state = wall_state(unit_ids)
+    while state[0] == etag and time.monotonic() < deadline:
+        # Encerra a transação de leitura para enxergar novas confirmações
+        db.session.rollback()
+        time.sleep(POLL_INTERVAL)
+        state = wall_state(unit_ids)
+    return state
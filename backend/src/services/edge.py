@@ -0,0 +1,513 @@
+import gzip
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime
+import click
+from flask import current_app, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import Date, DateTime, func, text, update
+from src.models.user import User, db
+from src.models.unit import Unit
+from src.models.category import Category
+from src.models.counter import Counter
+from src.models.display_settings import DisplaySettings
+from src.models.ticket import Ticket
+from src.models.ticket_event import TicketEvent
+from src.models.edge_cursor import EdgeCursor
+from src.services import counter_usage, events, quantiles, reference_cache, schema, shards, watermarks
+from src.services.sql import insert_for_dialect
+
+# Nó local (edge) para filiais com link instável.
+#
+# Com EDGE_UNIT_ID definido, esta instância atende uma única unidade com o
+# próprio banco SQLite: as mesmas rotas emitem e chamam senhas sem passar pelo
+# servidor central. Os ids de senhas ficam na faixa da unidade
+# (unit_id << shards.ID_BITS, acima do último id que o central conhecia) e o
+# registro de eventos é enviado ao central em lotes compactos a cada
+# EDGE_SYNC_SECONDS, assim que houver conexão; sem conexão o nó só acumula.
+# Usuários, unidade, categorias, guichês e painel vêm do central
+# (pull_reference, a cada EDGE_REFERENCE_SECONDS) e são editados lá. Só vão
+# para o nó os usuários da própria unidade (inclusive administradores
+# vinculados a ela), nunca os administradores gerais; usuários, categorias e
+# guichês que deixaram de vir do central são desativados no nó.
+#
+# Cada nó se autentica com o token da sua unidade (unit_token, derivado de
+# EDGE_SYNC_SECRET no central): o token de uma filial não lê nem grava as
+# demais.
+#
+# No central (UNIT_SHARDS e EDGE_SYNC_SECRET), a unidade registrada por um nó
+# só recebe escritas de senhas pela sincronização (guard_central_writes).
+# apply_batch() aplica cada evento uma única vez (edge_cursors guarda o
+# último seq do nó) e mescla o estado da senha sem conflito: o status só
+# avança (aguardando < chamada < finalizada/perdida), uma rechamada só vale
+# se for mais recente que a chamada registrada e o primeiro status final
+# prevalece. Reenviar um lote não altera o resultado; um lote que pula
+# eventos é recusado (SyncGap) e o nó reenvia a partir do cursor do central.
+
+# Ordem das colunas de cada evento no lote enviado ao central
+EVENT_COLUMNS = ('seq', 'ticket_id', 'kind', 'category_id', 'counter_id', 'at')
+
+RANKS = {'waiting': 0, 'calling': 1, 'called': 1, 'finished': 2, 'missed': 2}
+
+STATUS_FOR = {
+    events.GENERATED: 'waiting',
+    events.CALLED: 'calling',
+    events.RECALLED: 'calling',
+    events.FINISHED: 'finished',
+    events.MISSED: 'missed',
+}
+
+# Modelos desativados no nó quando deixam de vir do central (exclusão ou arquivamento)
+DEACTIVATED_MODELS = (Category, Counter, User)
+
+# (chave no payload, modelo) na ordem de gravação no nó
+REFERENCE_MODELS = (
+    ('units', Unit),
+    ('categories', Category),
+    ('counters', Counter),
+    ('display_settings', DisplaySettings),
+    ('users', User),
+)
+
+MAX_BACKOFF = 60
+
+_state = {'online': None, 'cursor': None, 'last_sync': None, 'last_reference': None, 'error': None}
+_next_reference = 0.0
+_sync_started = False
+_sync_lock = threading.Lock()
+
+
+class SyncGap(Exception):
+    """O lote começa depois do último evento aplicado no central"""
+
+    def __init__(self, last_seq):
+        super().__init__(last_seq)
+        self.last_seq = last_seq
+
+
+class NotRegistered(Exception):
+    """Unidade sem nó local registrado no central"""
+
+
+def is_edge():
+    return bool(current_app.config.get('EDGE_UNIT_ID'))
+
+
+def accepts_sync():
+    """Se esta instância é um central que recebe eventos de nós locais"""
+    return not is_edge() and bool(current_app.config.get('EDGE_SYNC_SECRET')) and shards.is_enabled()
+
+
+def unit_token(unit_id):
+    """Token de sincronização do nó da unidade (trocar EDGE_SYNC_SECRET revoga todos)"""
+    secret = current_app.config['EDGE_SYNC_SECRET'].encode()
+    return hmac.new(secret, f'edge-unit:{int(unit_id)}'.encode(), hashlib.sha256).hexdigest()
+
+
+# --- Central -----------------------------------------------------------------
+
+def is_edge_unit(unit_id):
+    """Se a unidade é operada por um nó local (no banco da unidade da requisição)"""
+    return db.session.get(EdgeCursor, int(unit_id)) is not None
+
+
+def guard_central_writes():
+    """before_request das senhas no central: unidades de nós locais só mudam pela sincronização"""
+    if request.method != 'POST' or not accepts_sync():
+        return None
+
+    try:
+        unit_id = shards.unit_for_request()
+        unit_id = int(unit_id) if unit_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+    if unit_id and is_edge_unit(unit_id):
+        return jsonify({'message': 'Unidade operada por nó local'}), 409
+    return None
+
+
+def register(unit_id):
+    """Marca a unidade como operada por um nó local; retorna o cursor e o piso dos ids de senhas"""
+    cursor = db.session.get(EdgeCursor, unit_id)
+    if cursor is None:
+        cursor = EdgeCursor(unit_id=unit_id, last_seq=0)
+        db.session.add(cursor)
+        db.session.commit()
+
+    last_ticket = db.session.query(func.max(Ticket.id)).filter(Ticket.unit_id == unit_id).scalar()
+    return {
+        'last_seq': cursor.last_seq,
+        'ticket_floor': max(last_ticket or 0, unit_id << shards.ID_BITS)
+    }
+
+
+def _to_wire(row):
+    values = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        values[column.name] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return values
+
+
+def reference_payload(unit_id):
+    """Dados de referência de que o nó da unidade precisa para operar sozinho"""
+    payload = {
+        'units': Unit.query.filter_by(id=unit_id).all(),
+        'categories': Category.query.filter_by(unit_id=unit_id).all(),
+        'counters': Counter.query.filter_by(unit_id=unit_id).all(),
+        'display_settings': DisplaySettings.query.filter_by(unit_id=unit_id).all(),
+        # Só usuários da unidade: para administrar a filial durante uma queda,
+        # cadastre no central um administrador vinculado a ela
+        'users': User.query.filter(User.unit_id == unit_id).all(),
+    }
+    return {key: [_to_wire(row) for row in rows] for key, rows in payload.items()}
+
+
+def _merge(ticket, kind, at, counter_id):
+    # Regras de mesclagem do estado (ver cabeçalho); retorna se a senha mudou
+    rank = RANKS[STATUS_FOR[kind]]
+    current = RANKS.get(ticket.status, 0)
+    if kind == events.GENERATED or rank < current or current == 2:
+        return False
+
+    if rank == 1:
+        if ticket.called_at is not None and at < ticket.called_at:
+            return False
+        first_call = ticket.called_at is None
+        ticket.status = 'calling'
+        ticket.counter_id = counter_id
+        ticket.called_at = at
+        if first_call:
+            quantiles.record_wait(ticket)
+        return True
+
+    ticket.status = STATUS_FOR[kind]
+    ticket.counter_id = counter_id or ticket.counter_id
+    if kind == events.FINISHED:
+        ticket.finished_at = at
+        ticket.calculate_service_time()
+        quantiles.record_service(ticket)
+        counter_usage.record_service(ticket)
+    return True
+
+
+def apply_batch(unit_id, after, rows, numbers):
+    """Aplica no central um lote de eventos do nó; retorna (aplicados, último seq)
+
+    rows segue EVENT_COLUMNS; numbers traz o número das senhas geradas no lote.
+    """
+    cursor = db.session.get(EdgeCursor, unit_id)
+    if cursor is None:
+        raise NotRegistered()
+    if after > cursor.last_seq:
+        raise SyncGap(cursor.last_seq)
+
+    applied = 0
+    oldest = None
+    for seq, ticket_id, kind, category_id, counter_id, at in rows:
+        # Eventos já aplicados (lote reenviado) são ignorados
+        if seq <= cursor.last_seq:
+            continue
+
+        moment = events.from_millis(at)
+        ticket = db.session.get(Ticket, ticket_id)
+        if ticket is None:
+            ticket = Ticket(
+                id=ticket_id,
+                ticket_number=numbers.get(str(ticket_id), '?'),
+                category_id=category_id,
+                unit_id=unit_id,
+                status='waiting',
+                generated_at=moment
+            )
+            db.session.add(ticket)
+        _merge(ticket, kind, moment, counter_id)
+
+        # O registro do central repete o do nó, com a própria sequência
+        db.session.add(TicketEvent(
+            unit_id=unit_id,
+            ticket_id=ticket_id,
+            kind=kind,
+            category_id=category_id,
+            counter_id=counter_id,
+            at=at
+        ))
+        oldest = ticket.generated_at if oldest is None else min(oldest, ticket.generated_at)
+        cursor.last_seq = seq
+        applied += 1
+
+    if applied:
+        # Uma versão nova por lote basta para invalidar os relatórios da unidade
+        watermarks.bump(unit_id, oldest)
+        cursor.synced_at = datetime.utcnow()
+    db.session.commit()
+    return applied, cursor.last_seq
+
+
+# --- Nó local ----------------------------------------------------------------
+
+def _request(method, path, payload=None):
+    config = current_app.config
+    headers = {'X-Sync-Token': config['EDGE_SYNC_TOKEN'], 'Accept-Encoding': 'gzip'}
+    data = None
+    if payload is not None:
+        data = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), compresslevel=6)
+        headers['Content-Type'] = 'application/json'
+        headers['Content-Encoding'] = 'gzip'
+
+    url = f"{config['EDGE_CENTRAL_URL'].rstrip('/')}/api/sync{path}"
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=config.get('EDGE_HTTP_TIMEOUT', 10)) as response:
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def _from_wire(table, row):
+    values = {}
+    for column in table.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, Date):
+            value = date.fromisoformat(value)
+        values[column.name] = value
+    return values
+
+
+def pull_reference():
+    """Copia do central os dados de referência da unidade; retorna quantos registros"""
+    data = _request('GET', f"/units/{current_app.config['EDGE_UNIT_ID']}/reference")
+    insert = insert_for_dialect()
+
+    count = 0
+    received = {}
+    for key, model in REFERENCE_MODELS:
+        table = model.__table__
+        primary_key = [column.name for column in table.primary_key]
+        received[model] = {row.get('id') for row in data.get(key, [])}
+        for row in data.get(key, []):
+            values = _from_wire(table, row)
+            stmt = insert(table).values(**values).on_conflict_do_update(
+                index_elements=primary_key,
+                set_={name: value for name, value in values.items() if name not in primary_key}
+            )
+            db.session.execute(stmt)
+            count += 1
+
+    # O payload é o estado completo da unidade: o que não veio foi excluído (ou,
+    # para usuários, é de outra unidade) e é desativado, sem apagar o histórico
+    for model in DEACTIVATED_MODELS:
+        db.session.execute(
+            update(model).where(model.id.not_in(received[model]), model.is_active == True).values(is_active=False)
+        )
+    db.session.commit()
+
+    reference_cache.invalidate()
+    _state['last_reference'] = datetime.now().isoformat()
+    return count
+
+
+def push_events():
+    """Envia ao central os eventos ainda não aplicados lá; retorna quantos foram aplicados"""
+    unit_id = current_app.config['EDGE_UNIT_ID']
+    batch = min(current_app.config.get('EDGE_SYNC_BATCH', events.MAX_PAGE), events.MAX_PAGE)
+    if _state['cursor'] is None:
+        _state['cursor'] = _request('POST', f'/units/{unit_id}/register')['last_seq']
+
+    total = 0
+    while True:
+        after = _state['cursor']
+        rows = events.since(after, unit_id, batch)
+        if not rows:
+            break
+
+        generated = [row[2] for row in rows if row[3] == events.GENERATED]
+        numbers = dict(
+            db.session.query(Ticket.id, Ticket.ticket_number).filter(Ticket.id.in_(generated)).all()
+        ) if generated else {}
+        # Não segura a transação de leitura durante o envio
+        db.session.rollback()
+
+        payload = {
+            'after': after,
+            'events': [[seq, ticket_id, kind, category_id, counter_id, at]
+                       for seq, _, ticket_id, kind, category_id, counter_id, at in rows],
+            'numbers': {str(ticket_id): number for ticket_id, number in numbers.items()}
+        }
+        try:
+            result = _request('POST', f'/units/{unit_id}/events', payload)
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                raise
+            # O central está atrás (ex.: restaurado de um backup): reenvia a partir dele
+            _state['cursor'] = json.loads(e.read())['last_seq']
+            continue
+
+        _state['cursor'] = result['last_seq']
+        total += result['applied']
+        if len(rows) < batch:
+            break
+    return total
+
+
+def pending():
+    """Eventos do nó ainda não confirmados pelo central (None antes do primeiro contato)"""
+    if _state['cursor'] is None:
+        return None
+    return db.session.query(func.count(TicketEvent.seq)).filter(TicketEvent.seq > _state['cursor']).scalar()
+
+
+def status():
+    """Papel desta instância na sincronização e, no nó, o estado da conexão com o central"""
+    if is_edge():
+        return {
+            'mode': 'edge',
+            'unit_id': current_app.config['EDGE_UNIT_ID'],
+            'central_url': current_app.config.get('EDGE_CENTRAL_URL'),
+            'pending_events': pending(),
+            **_state
+        }
+
+    if not accepts_sync():
+        return {'mode': 'central', 'accepts_sync': False}
+
+    cursors = shards.fan_out(
+        [unit_id for unit_id, _ in shards.shard_files()],
+        lambda unit_id: db.session.get(EdgeCursor, unit_id)
+    )
+    return {
+        'mode': 'central',
+        'accepts_sync': True,
+        'edge_units': [cursor.to_dict() for cursor in cursors.values() if cursor is not None]
+    }
+
+
+def sync_once():
+    """Sincroniza dados de referência (se for a hora) e eventos; retorna eventos aplicados"""
+    global _next_reference
+    now = time.monotonic()
+    if now >= _next_reference:
+        pull_reference()
+        _next_reference = now + current_app.config.get('EDGE_REFERENCE_SECONDS', 300)
+
+    applied = push_events()
+    _state['last_sync'] = datetime.now().isoformat()
+    return applied
+
+
+def start_sync(app):
+    """Inicia a thread que envia os eventos do nó ao central (só com EDGE_UNIT_ID)"""
+    global _sync_started
+    with app.app_context():
+        if not is_edge():
+            return
+
+    with _sync_lock:
+        if _sync_started:
+            return
+        _sync_started = True
+
+    interval = app.config.get('EDGE_SYNC_SECONDS', 5)
+
+    def loop():
+        delay = interval
+        while True:
+            try:
+                with app.app_context():
+                    try:
+                        applied = sync_once()
+                    finally:
+                        db.session.remove()
+                if _state['online'] is not True:
+                    app.logger.info('Conexão com o central disponível (%d eventos enviados)', applied)
+                _state.update({'online': True, 'error': None})
+                delay = interval
+            except (urllib.error.URLError, OSError) as e:
+                # Sem conexão: a filial continua atendendo; novas tentativas cada vez mais espaçadas
+                if _state['online'] is not False:
+                    app.logger.warning('Central inacessível, eventos ficam no nó: %s', e)
+                _state.update({'online': False, 'error': str(e)[:200]})
+                delay = min(delay * 2, MAX_BACKOFF)
+            except Exception:
+                app.logger.exception('Falha na sincronização com o central')
+                delay = min(delay * 2, MAX_BACKOFF)
+            time.sleep(delay)
+
+    threading.Thread(target=loop, name='edge-sync', daemon=True).start()
+
+
+def _is_sequenced(conn, table):
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table}).scalar()
+    return sql is None or 'AUTOINCREMENT' in sql.upper()
+
+
+edge_cli = AppGroup('edge', help='Nó local da filial (EDGE_UNIT_ID) e sincronização com o central')
+
+
+@edge_cli.command('token')
+@click.argument('unit_id', type=int)
+def token_command(unit_id):
+    """No central: token de sincronização do nó da unidade (EDGE_SYNC_TOKEN do nó)"""
+    if not current_app.config.get('EDGE_SYNC_SECRET'):
+        raise click.ClickException('Defina EDGE_SYNC_SECRET no central')
+    click.echo(unit_token(unit_id))
+
+
+@edge_cli.command('init')
+def init_command():
+    """Prepara o banco do nó local: faixa de ids da unidade, esquema e dados de referência"""
+    if not is_edge() or not current_app.config.get('EDGE_CENTRAL_URL'):
+        raise click.ClickException('Defina EDGE_UNIT_ID, EDGE_CENTRAL_URL e EDGE_SYNC_TOKEN')
+    if shards.is_enabled():
+        raise click.ClickException('O nó local usa um único banco: desative UNIT_SHARDS')
+
+    unit_id = current_app.config['EDGE_UNIT_ID']
+    registration = _request('POST', f'/units/{unit_id}/register')
+
+    with db.engine.begin() as conn:
+        if not all(_is_sequenced(conn, table) for table in shards.SEQUENCED_TABLES):
+            raise click.ClickException('Banco criado sem a faixa de ids: use um arquivo novo para o nó local')
+        metadata = shards.sequenced_metadata()
+        metadata.create_all(conn, tables=[metadata.tables[table] for table in shards.SEQUENCED_TABLES])
+        # O seq do nó continua de onde o central parou, mesmo com um banco novo
+        shards.seed_sequences(conn, {
+            'tickets': registration['ticket_floor'],
+            'ticket_events': max(registration['last_seq'], unit_id << shards.ID_BITS)
+        })
+
+    schema.upgrade_schema()
+    click.echo(f'{pull_reference()} registros de referência copiados do central')
+    click.echo(f'Nó local da unidade {unit_id} pronto.')
+
+
+@edge_cli.command('sync')
+def sync_command():
+    """Sincroniza uma vez com o central (dados de referência e eventos pendentes)"""
+    if not is_edge():
+        raise click.ClickException('Disponível só no nó local (EDGE_UNIT_ID)')
+
+    click.echo(f'{pull_reference()} registros de referência atualizados')
+    click.echo(f'{push_events()} eventos aplicados no central')
+
+
+@edge_cli.command('release')
+@click.argument('unit_id', type=int)
+def release_command(unit_id):
+    """No central: devolve a unidade à operação normal (desliga o recebimento do nó)"""
+    with shards.for_unit(unit_id):
+        cursor = db.session.get(EdgeCursor, unit_id)
+        if cursor is None:
+            raise click.ClickException(f'Unidade {unit_id} não está registrada por um nó local')
+        db.session.delete(cursor)
+        db.session.commit()
+    click.echo(f'Unidade {unit_id} liberada (último evento do nó: {cursor.last_seq})')
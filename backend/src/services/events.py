@@ -0,0 +1,153 @@
+import time as _time
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from src.models.user import db
+from src.models.ticket_event import TicketEvent
+
+# Registro de eventos das senhas.
+#
+# As rotas de senhas alteram status, guichê e horários no próprio registro;
+# cada transição também é anexada aqui, na mesma transação, com um número de
+# sequência crescente (seq). O registro nunca é alterado: rechamadas preservam
+# o horário de cada chamada, consumidores acompanham o fluxo a partir do
+# último seq visto (since) e estruturas derivadas podem ser reconstruídas
+# percorrendo os eventos em ordem (replay), sem reler a tabela de senhas.
+#
+# As linhas são compactas: tipo como inteiro pequeno e horário em
+# milissegundos UTC.
+
+GENERATED = 1
+CALLED = 2
+RECALLED = 3
+FINISHED = 4
+MISSED = 5
+
+KINDS = {
+    GENERATED: 'generated',
+    CALLED: 'called',
+    RECALLED: 'recalled',
+    FINISHED: 'finished',
+    MISSED: 'missed',
+}
+
+MAX_PAGE = 1000
+REPLAY_BATCH_SIZE = 5000
+POLL_INTERVAL = 0.5
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+def to_millis(moment):
+    return (moment - _EPOCH) // _MS
+
+
+def from_millis(millis):
+    return _EPOCH + millis * _MS
+
+
+def append(ticket, kind, at=None):
+    """Anexa uma transição da senha (confirmada junto com a transação atual)
+
+    Sem at, usa o horário de geração para GENERATED e o momento atual para
+    os demais tipos.
+    """
+    if ticket.id is None:
+        db.session.flush()
+
+    if at is None:
+        at = ticket.generated_at if kind == GENERATED else datetime.utcnow()
+
+    db.session.add(TicketEvent(
+        unit_id=ticket.unit_id,
+        ticket_id=ticket.id,
+        kind=kind,
+        category_id=ticket.category_id,
+        counter_id=ticket.counter_id,
+        at=to_millis(at)
+    ))
+
+
+def to_dict(row):
+    seq, unit_id, ticket_id, kind, category_id, counter_id, at = row
+    return {
+        'seq': seq,
+        'unit_id': unit_id,
+        'ticket_id': ticket_id,
+        'event': KINDS.get(kind),
+        'category_id': category_id,
+        'counter_id': counter_id,
+        'at': from_millis(at).isoformat()
+    }
+
+
+def _query(after=0, unit_id=None, ticket_id=None):
+    query = db.session.query(
+        TicketEvent.seq, TicketEvent.unit_id, TicketEvent.ticket_id,
+        TicketEvent.kind, TicketEvent.category_id, TicketEvent.counter_id, TicketEvent.at
+    ).filter(TicketEvent.seq > after)
+
+    if unit_id:
+        query = query.filter(TicketEvent.unit_id == unit_id)
+
+    if ticket_id:
+        query = query.filter(TicketEvent.ticket_id == ticket_id)
+
+    return query.order_by(TicketEvent.seq)
+
+
+def last_seq(unit_id=None):
+    """Último número de sequência (0 se o registro estiver vazio)"""
+    query = db.session.query(func.max(TicketEvent.seq))
+    if unit_id:
+        query = query.filter(TicketEvent.unit_id == unit_id)
+    return query.scalar() or 0
+
+
+def since(after=0, unit_id=None, limit=MAX_PAGE, wait=0):
+    """Eventos com seq > after; se não houver e wait > 0, aguarda até wait segundos"""
+    deadline = _time.monotonic() + wait
+    while True:
+        rows = _query(after, unit_id).limit(min(limit, MAX_PAGE)).all()
+        if rows or _time.monotonic() >= deadline:
+            return rows
+
+        # Encerra a transação de leitura para enxergar novas confirmações
+        db.session.rollback()
+        _time.sleep(POLL_INTERVAL)
+
+
+def for_ticket(ticket_id):
+    """Trilha de auditoria de uma senha"""
+    return _query(ticket_id=ticket_id).all()
+
+
+def replay(after=0, unit_id=None):
+    """Percorre os eventos em ordem de seq, lidos em lotes do cursor"""
+    return _query(after, unit_id).execution_options(yield_per=REPLAY_BATCH_SIZE)
+
+
+def backfill():
+    """Gera eventos para senhas anteriores ao registro (só com o registro vazio)"""
+    if db.session.query(TicketEvent.seq).first() is not None:
+        return 0
+
+    # Horários convertidos para milissegundos pelo próprio SQLite; rechamadas
+    # anteriores ao registro não têm horário guardado e ficam de fora
+    millis = "CAST(ROUND((julianday({0}) - 2440587.5) * 86400000) AS INTEGER)"
+    result = db.session.execute(text(
+        'INSERT INTO ticket_events (unit_id, ticket_id, kind, category_id, counter_id, at) '
+        'SELECT unit_id, ticket_id, kind, category_id, counter_id, at FROM ('
+        f'  SELECT unit_id, id AS ticket_id, {GENERATED} AS kind, category_id, NULL AS counter_id, '
+        f'    {millis.format("generated_at")} AS at FROM tickets WHERE generated_at IS NOT NULL '
+        '  UNION ALL '
+        f'  SELECT unit_id, id, {CALLED}, category_id, counter_id, {millis.format("called_at")} '
+        '    FROM tickets WHERE called_at IS NOT NULL '
+        '  UNION ALL '
+        f"  SELECT unit_id, id, CASE status WHEN 'missed' THEN {MISSED} ELSE {FINISHED} END, category_id, counter_id, "
+        f'    {millis.format("COALESCE(finished_at, called_at)")} '
+        "    FROM tickets WHERE status IN ('finished', 'missed') AND called_at IS NOT NULL"
+        ') ORDER BY at, ticket_id, kind'
+    ))
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,214 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import Integer, cast, func
+from src.models.user import db
+from src.models.ticket import Ticket
+from src.models.counter import Counter
+from src.models.quantile_bucket import QuantileBucket
+from src.services import quantiles
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+# Previsão de demanda e dimensionamento de guichês.
+#
+# A curva de chegadas de cada unidade é a média, por dia da semana e intervalo
+# de SLOT_MINUTES no fuso local (LOCAL_TIMEZONE; generated_at é gravado em
+# UTC), das senhas geradas no histórico, com peso decrescente para
+# semanas antigas (meia-vida HALF_LIFE_WEEKS). O tempo médio de atendimento vem
+# dos esboços de quantis (services/quantiles). Para cada intervalo, o modelo
+# Erlang C indica o menor número de guichês em que a fração de senhas
+# esperando até target_wait segundos atinge service_level.
+#
+# Todo o cálculo é vetorizado com NumPy sobre (unidades, dias da semana,
+# intervalos), inclusive a recorrência de Erlang B, que avança um guichê por
+# vez para todos os intervalos ao mesmo tempo.
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+HALF_LIFE_WEEKS = 4
+MAX_COUNTERS = 50
+
+# Usado quando a unidade ainda não tem atendimentos finalizados
+DEFAULT_SERVICE_TIME = 300
+
+
+def is_available():
+    return np is not None
+
+
+def _utc(day, tz):
+    # Meia-noite local de day, em UTC sem fuso (como generated_at)
+    return datetime.combine(day, time.min, tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def arrival_counts(unit_ids, start_day, end_day, tz=timezone.utc):
+    """Matriz (unidades, dias, intervalos) com as senhas geradas em cada intervalo (dias e horários locais)"""
+    days = (end_day - start_day).days + 1
+    counts = np.zeros((len(unit_ids), days, SLOTS_PER_DAY))
+    index = {unit_id: i for i, unit_id in enumerate(unit_ids)}
+
+    # Agrupa por intervalo UTC no banco; os fusos são múltiplos de 15 minutos,
+    # então cada intervalo UTC corresponde a um único intervalo local
+    day = func.date(Ticket.generated_at)
+    slot = (
+        cast(func.strftime('%H', Ticket.generated_at), Integer) * 60 +
+        cast(func.strftime('%M', Ticket.generated_at), Integer)
+    ) // SLOT_MINUTES
+
+    rows = db.session.query(
+        Ticket.unit_id, day, slot, func.count(Ticket.id)
+    ).filter(
+        Ticket.unit_id.in_(unit_ids),
+        Ticket.generated_at >= _utc(start_day, tz),
+        Ticket.generated_at < _utc(end_day + timedelta(days=1), tz)
+    ).group_by(Ticket.unit_id, day, slot).all()
+
+    if rows:
+        unit_idx, day_idx, slot_idx, values = [], [], [], []
+        for unit_id, day_str, utc_slot, count in rows:
+            moment = datetime.fromisoformat(day_str).replace(tzinfo=timezone.utc) + timedelta(minutes=utc_slot * SLOT_MINUTES)
+            local = moment.astimezone(tz)
+            unit_idx.append(index[unit_id])
+            day_idx.append((local.date() - start_day).days)
+            slot_idx.append((local.hour * 60 + local.minute) // SLOT_MINUTES)
+            values.append(count)
+        # No fim do horário de verão dois intervalos UTC caem no mesmo intervalo local
+        np.add.at(counts, (unit_idx, day_idx, slot_idx), values)
+
+    return counts
+
+
+def arrival_curves(counts, start_day):
+    """Média ponderada de chegadas por (unidade, dia da semana, intervalo)"""
+    days = counts.shape[1]
+    age = days - 1 - np.arange(days)
+    weights = 0.5 ** (age / (7 * HALF_LIFE_WEEKS))
+
+    weekday = (start_day.weekday() + np.arange(days)) % 7
+    by_weekday = np.zeros((days, 7))
+    by_weekday[np.arange(days), weekday] = weights
+
+    totals = by_weekday.sum(axis=0)
+    curves = np.einsum('uds,dk->uks', counts, by_weekday)
+    return np.divide(curves, totals[None, :, None], out=np.zeros_like(curves), where=totals[None, :, None] > 0)
+
+
+def service_times(unit_ids, start_day, end_day):
+    """Tempo médio de atendimento por unidade e quantidade de amostras"""
+    index = {unit_id: i for i, unit_id in enumerate(unit_ids)}
+    rows = db.session.query(
+        QuantileBucket.unit_id, QuantileBucket.bucket, func.sum(QuantileBucket.count)
+    ).filter(
+        QuantileBucket.unit_id.in_(unit_ids),
+        QuantileBucket.metric == 'service',
+        QuantileBucket.bucket != quantiles.ZERO_BUCKET,
+        QuantileBucket.day >= start_day,
+        QuantileBucket.day <= end_day
+    ).group_by(QuantileBucket.unit_id, QuantileBucket.bucket).all()
+
+    samples = np.zeros(len(unit_ids))
+    means = np.full(len(unit_ids), float(DEFAULT_SERVICE_TIME))
+    if rows:
+        unit_idx, bucket, count = (np.array(column) for column in zip(*rows))
+        unit_idx = np.array([index[u] for u in unit_idx])
+        values = 2 * quantiles.GAMMA ** (bucket - 1.0) / (quantiles.GAMMA + 1)
+        samples = np.bincount(unit_idx, weights=count, minlength=len(unit_ids))
+        total = np.bincount(unit_idx, weights=values * count, minlength=len(unit_ids))
+        np.divide(total, samples, out=means, where=samples > 0)
+
+    return means, samples
+
+
+def erlang_c_staffing(load, mean_service, target_wait, service_level, max_counters=MAX_COUNTERS):
+    """Menor número de guichês por intervalo que atinge o nível de serviço (Erlang C)
+
+    load é a carga oferecida em erlangs (chegadas por segundo x tempo médio).
+    Retorna (guichês, espera média esperada, nível de serviço obtido); intervalos
+    que nem max_counters atendem ficam com -1 guichês.
+    """
+    recommended = np.zeros(load.shape, dtype=int)
+    expected_wait = np.zeros(load.shape)
+    achieved = np.ones(load.shape)
+    pending = load > 0
+
+    erlang_b = np.ones(load.shape)
+    for counters in range(1, max_counters + 1):
+        if not pending.any():
+            break
+
+        erlang_b = load * erlang_b / (counters + load * erlang_b)
+        stable = counters > load
+        spare = np.where(stable, counters - load, 1.0)
+
+        wait_probability = np.where(stable, counters * erlang_b / (counters - load * (1 - erlang_b)), 1.0)
+        level = np.where(stable, 1 - wait_probability * np.exp(-spare * target_wait / mean_service), 0.0)
+
+        done = pending & (level >= service_level)
+        recommended[done] = counters
+        expected_wait[done] = (wait_probability * mean_service / spare)[done]
+        achieved[done] = level[done]
+        pending &= ~done
+
+    recommended[pending] = -1
+    achieved[pending] = 0.0
+    return recommended, expected_wait, achieved
+
+
+def _slot_label(slot):
+    minutes = slot * SLOT_MINUTES
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def forecast(unit_ids, start_day, end_day, target_wait, service_level, tz_name='UTC'):
+    """Curvas de chegada e guichês recomendados para várias unidades de uma vez
+
+    start_day, end_day, dias da semana e horários dos intervalos estão no fuso tz_name.
+    """
+    unit_ids = [int(unit_id) for unit_id in unit_ids]
+
+    curves = arrival_curves(arrival_counts(unit_ids, start_day, end_day, ZoneInfo(tz_name)), start_day)
+    mean_service, samples = service_times(unit_ids, start_day, end_day)
+
+    load = curves / (SLOT_MINUTES * 60) * mean_service[:, None, None]
+    recommended, expected_wait, achieved = erlang_c_staffing(
+        load, mean_service[:, None, None], target_wait, service_level
+    )
+
+    available = dict(db.session.query(Counter.unit_id, func.count(Counter.id)).filter(
+        Counter.unit_id.in_(unit_ids),
+        Counter.is_active == True,
+        Counter.archived_at.is_(None)
+    ).group_by(Counter.unit_id).all())
+
+    results = {}
+    for u, unit_id in enumerate(unit_ids):
+        weekdays = []
+        for weekday in range(7):
+            slots = np.nonzero(curves[u, weekday])[0]
+            weekdays.append({
+                'weekday': weekday,
+                'expected_tickets': round(float(curves[u, weekday].sum()), 2),
+                'intervals': [
+                    {
+                        'start': _slot_label(slot),
+                        'arrivals': round(float(curves[u, weekday, slot]), 2),
+                        'recommended_counters': int(recommended[u, weekday, slot]) if recommended[u, weekday, slot] > 0 else None,
+                        'expected_wait': round(float(expected_wait[u, weekday, slot]), 2),
+                        'service_level': round(float(achieved[u, weekday, slot]), 4)
+                    } for slot in slots
+                ]
+            })
+
+        results[unit_id] = {
+            'unit_id': unit_id,
+            'avg_service_time': round(float(mean_service[u]), 2),
+            'service_time_samples': int(samples[u]),
+            'available_counters': available.get(unit_id, 0),
+            'peak_counters': int(recommended[u].max()) if recommended[u].size else 0,
+            'weekdays': weekdays
+        }
+
+    return results
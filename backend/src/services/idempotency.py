@@ -0,0 +1,129 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from src.models.user import db
+from src.models.idempotency_key import IdempotencyKey
+
+# Chaves de idempotência para emissão de senhas.
+#
+# Totens em redes instáveis repetem POST /tickets/generate após timeouts. Com o
+# cabeçalho Idempotency-Key a primeira resposta é gravada na tabela
+# idempotency_keys (na mesma transação da senha) e as repetições recebem a
+# resposta original sem gerar nova senha. Um LRU em memória atende as
+# repetições mais comuns sem consultar o banco; as chaves expiram após
+# IDEMPOTENCY_TTL segundos.
+
+MAX_KEY_LENGTH = 100
+LRU_SIZE = 2048
+
+# Intervalo mínimo entre limpezas de chaves expiradas no banco
+PURGE_INTERVAL = 60.0
+
+_lock = threading.Lock()
+_lru = OrderedDict()
+_last_purge = 0.0
+
+
+class IdempotencyConflict(Exception):
+    """Chave reutilizada com um corpo de requisição diferente"""
+
+
+class StoredResponse:
+    """Resposta original associada a uma chave"""
+
+    __slots__ = ('fingerprint', 'status_code', 'body', 'expires_at')
+
+    def __init__(self, fingerprint, status_code, body, expires_at):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at
+
+
+def fingerprint(data):
+    """Hash estável do corpo da requisição"""
+    raw = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _ttl():
+    return timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 24 * 3600))
+
+
+def _remember_local(user_id, key, stored):
+    with _lock:
+        _lru[(user_id, key)] = stored
+        _lru.move_to_end((user_id, key))
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(user_id, key, request_fingerprint):
+    """Retorna a resposta gravada para a chave, ou None se ainda não existe"""
+    now = datetime.utcnow()
+
+    with _lock:
+        stored = _lru.get((user_id, key))
+        if stored is not None:
+            _lru.move_to_end((user_id, key))
+
+    if stored is None:
+        row = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if row is None:
+            return None
+        stored = StoredResponse(row.fingerprint, row.status_code, row.response_body, row.expires_at)
+        _remember_local(user_id, key, stored)
+
+    if stored.expires_at <= now:
+        return None
+
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyConflict(key)
+
+    return stored
+
+
+def remember(user_id, key, request_fingerprint, status_code, body):
+    """Grava a resposta na sessão atual (persistida no commit da operação)"""
+    global _last_purge
+
+    now = datetime.utcnow()
+    expires_at = now + _ttl()
+
+    # Uma chave expirada pode ser reutilizada: remove o registro antigo
+    IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at <= now
+    ).delete(synchronize_session=False)
+
+    monotonic_now = time.monotonic()
+    if monotonic_now - _last_purge >= PURGE_INTERVAL:
+        _last_purge = monotonic_now
+        IdempotencyKey.query.filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+
+    db.session.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        fingerprint=request_fingerprint,
+        status_code=status_code,
+        response_body=body,
+        expires_at=expires_at
+    ))
+    return StoredResponse(request_fingerprint, status_code, body, expires_at)
+
+
+def cache(user_id, key, stored):
+    """Coloca no LRU uma resposta já confirmada no banco"""
+    _remember_local(user_id, key, stored)
+
+
+def replay(stored):
+    """Monta a resposta HTTP a partir da resposta gravada"""
+    response = current_app.response_class(stored.body, status=stored.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,41 @@
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+# Vagas de espera longa (?wait=) por processo.
+#
+# Uma requisição em espera longa ocupa uma thread do worker (gthread) até
+# haver novidade ou o tempo acabar. Para que painéis e consumidores de eventos
+# não esgotem as threads que atendem totens e guichês, no máximo
+# LONG_POLL_MAX_WAITERS requisições esperam ao mesmo tempo em cada worker, por
+# no máximo LONG_POLL_MAX_WAIT segundos; sem vaga livre, a requisição responde
+# na hora com o estado atual (304 ou lista vazia) e o cliente repete.
+
+_lock = threading.Lock()
+_semaphore = None
+
+
+def max_wait(requested):
+    """Tempo de espera pedido, limitado a LONG_POLL_MAX_WAIT segundos"""
+    return min(max(requested or 0, 0), current_app.config.get('LONG_POLL_MAX_WAIT', 10))
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        with _lock:
+            if _semaphore is None:
+                _semaphore = threading.BoundedSemaphore(current_app.config.get('LONG_POLL_MAX_WAITERS', 2))
+    return _semaphore
+
+
+@contextmanager
+def slot():
+    """Ocupa uma vaga de espera longa durante o bloco; produz False se não houver vaga livre"""
+    semaphore = _get_semaphore()
+    acquired = semaphore.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            semaphore.release()
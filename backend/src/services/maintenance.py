@@ -0,0 +1,366 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+from src.models.user import db
+from src.models.unit import Unit
+from src.models.unit_watermark import UnitWatermark
+from src.services import read_models, shards
+from src.services.backup import acquire_lock, database_path
+
+# Manutenção periódica do banco SQLite.
+#
+# Dentro da janela MAINTENANCE_WINDOW (horário local, ex.: '02:00-05:00') e no
+# máximo uma vez a cada MAINTENANCE_INTERVAL_HOURS, executa:
+#   optimize            ANALYZE limitado (analysis_limit) na primeira vez e
+#                       PRAGMA optimize nas seguintes;
+#   incremental_vacuum  devolve páginas livres em lotes pequenos, com pausa
+#                       entre os lotes (exige auto_vacuum=INCREMENTAL);
+#   quick_check         verificação de integridade somente leitura.
+#
+# Para não atrasar as senhas, a conexão de manutenção espera no máximo
+# BUSY_TIMEOUT_MS por bloqueios (um lote que não consegue o bloqueio é adiado)
+# e a execução é adiada enquanto houver movimento recente nas unidades
+# (MAINTENANCE_IDLE_SECONDS). Cada execução mede consultas de referência
+# (fila e histórico) antes e depois e registra o resultado no log da
+# aplicação e em MAINTENANCE_RUNS_FILE (uma linha JSON por execução), lido por
+# GET /api/maintenance em qualquer worker.
+#
+# No modo UNIT_SHARDS as tarefas rodam no banco principal e no de cada
+# unidade. Agendador, rota e comando compartilham uma trava em arquivo: uma
+# execução por vez, qualquer que seja o processo.
+
+TASKS = ('optimize', 'incremental_vacuum', 'quick_check')
+
+ANALYSIS_LIMIT = 1000
+BUSY_TIMEOUT_MS = 100
+VACUUM_PAGES_PER_STEP = 64
+VACUUM_STEP_SLEEP = 0.02
+MAX_RUNS = 50
+PROBE_REPEAT = 3
+SCHEDULER_CHECK_INTERVAL = 60
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def _connect(path=None):
+    conn = sqlite3.connect(path or database_path(), isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    return conn
+
+
+def _pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def _databases():
+    # Banco principal e, no modo UNIT_SHARDS, o banco de cada unidade
+    return [database_path()] + [path for unit_id, path in shards.shard_files()]
+
+
+def _run_lock_path():
+    return f"{current_app.config['MAINTENANCE_STAMP_FILE']}.lock"
+
+
+def acquire_run_lock():
+    """Reserva a execução da manutenção; False se outra já está em andamento"""
+    return acquire_lock(_run_lock_path())
+
+
+def release_run_lock():
+    os.remove(_run_lock_path())
+
+
+def _append_run(report):
+    # Uma linha por execução, gravada de uma vez (O_APPEND); o arquivo é
+    # reduzido às últimas MAX_RUNS quando passa do dobro
+    path = current_app.config['MAINTENANCE_RUNS_FILE']
+    line = json.dumps(report, ensure_ascii=False, separators=(',', ':')) + '\n'
+    fd = os.open(path, os.O_CREAT | os.O_APPEND | os.O_WRONLY, 0o644)
+    try:
+        os.write(fd, line.encode('utf-8'))
+    finally:
+        os.close(fd)
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    if len(lines) > 2 * MAX_RUNS:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[-MAX_RUNS:])
+        os.replace(tmp_path, path)
+
+
+def recent_runs():
+    """Últimas MAX_RUNS execuções (agendadas e manuais, de qualquer processo)"""
+    runs = []
+    try:
+        with open(current_app.config['MAINTENANCE_RUNS_FILE'], encoding='utf-8') as f:
+            for line in f.readlines()[-MAX_RUNS:]:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return runs
+
+
+def status():
+    """Estado de fragmentação do banco e últimas execuções"""
+    conn = _connect()
+    try:
+        return {
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(_pragma(conn, 'auto_vacuum')),
+            'page_count': _pragma(conn, 'page_count'),
+            'freelist_count': _pragma(conn, 'freelist_count'),
+            'page_size': _pragma(conn, 'page_size'),
+            'window': current_app.config.get('MAINTENANCE_WINDOW'),
+            'runs': recent_runs()
+        }
+    finally:
+        conn.close()
+
+
+def _optimize(conn, deadline):
+    conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone() is not None
+
+    if has_stats:
+        conn.execute('PRAGMA optimize')
+        return {'mode': 'optimize'}
+
+    conn.execute('ANALYZE')
+    return {'mode': 'analyze'}
+
+
+def _incremental_vacuum(conn, deadline):
+    if _pragma(conn, 'auto_vacuum') != 2:
+        return {'skipped': 'auto_vacuum não está em INCREMENTAL (use "flask maintenance enable-incremental-vacuum")'}
+
+    before = _pragma(conn, 'freelist_count')
+    deferred = 0
+    while time.monotonic() < deadline:
+        if _pragma(conn, 'freelist_count') == 0:
+            break
+        try:
+            # executescript avança o PRAGMA até o fim; execute() libera só uma página
+            conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});')
+        except sqlite3.OperationalError:
+            # Banco ocupado por escritas de senhas: tenta o lote de novo mais tarde
+            deferred += 1
+        time.sleep(VACUUM_STEP_SLEEP)
+
+    return {
+        'freed_pages': before - _pragma(conn, 'freelist_count'),
+        'remaining_free_pages': _pragma(conn, 'freelist_count'),
+        'deferred_steps': deferred
+    }
+
+
+def _quick_check(conn, deadline):
+    problems = [row[0] for row in conn.execute('PRAGMA quick_check')]
+    return {'ok': problems == ['ok'], 'problems': [] if problems == ['ok'] else problems[:20]}
+
+
+_TASK_FUNCTIONS = {
+    'optimize': _optimize,
+    'incremental_vacuum': _incremental_vacuum,
+    'quick_check': _quick_check,
+}
+
+
+def _timed(query):
+    # Melhor de PROBE_REPEAT execuções, para não medir o cache frio
+    best = None
+    for _ in range(PROBE_REPEAT):
+        started = time.perf_counter()
+        query()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def _probe():
+    """Tempos (ms) das consultas de referência na primeira unidade ativa"""
+    unit_id = db.session.query(Unit.id).filter(Unit.archived_at.is_(None)).order_by(Unit.id).scalar()
+    if unit_id is None:
+        return {}
+
+    since = datetime.now() - timedelta(days=30)
+    with shards.for_unit(unit_id):
+        timings = {
+            'queue_ms': _timed(lambda: read_models.queue_rows(unit_id)),
+            'history_30d_ms': _timed(lambda: list(read_models.history_rows(unit_id, start=since)))
+        }
+
+        db.session.rollback()
+    return timings
+
+
+def run(tasks=TASKS, max_seconds=None):
+    """Executa as tarefas de manutenção e retorna o relatório (também registrado no log)"""
+    if max_seconds is None:
+        max_seconds = current_app.config.get('MAINTENANCE_MAX_SECONDS', 600)
+
+    deadline = time.monotonic() + max_seconds
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'probes_before': _probe(),
+        'tasks': []
+    }
+
+    for path in _databases():
+        conn = _connect(path)
+        try:
+            for task in tasks:
+                started = time.perf_counter()
+                try:
+                    details = _TASK_FUNCTIONS[task](conn, deadline)
+                except sqlite3.OperationalError as e:
+                    details = {'error': str(e)}
+                report['tasks'].append({
+                    'task': task,
+                    'database': os.path.basename(path),
+                    'seconds': round(time.perf_counter() - started, 3),
+                    **details
+                })
+        finally:
+            conn.close()
+
+    report['probes_after'] = _probe()
+    report['finished_at'] = datetime.now().isoformat()
+    _append_run(report)
+
+    current_app.logger.info(
+        'Manutenção do banco: %s; consultas antes %s, depois %s',
+        ', '.join(f"{t['task']} ({t['database']}) {t['seconds']}s" for t in report['tasks']),
+        report['probes_before'], report['probes_after']
+    )
+    for task in report['tasks']:
+        if task['task'] == 'quick_check' and not task.get('ok', True):
+            current_app.logger.error('quick_check encontrou problemas em %s: %s', task['database'], task['problems'])
+
+    return report
+
+
+def in_window(now=None, window=None):
+    """Se o horário está dentro da janela 'HH:MM-HH:MM' (pode cruzar a meia-noite)"""
+    window = window or current_app.config.get('MAINTENANCE_WINDOW')
+    if not window:
+        return False
+
+    now = (now or datetime.now()).strftime('%H:%M')
+    start, end = window.split('-')
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def _last_update(unit_id=None):
+    last = db.session.query(func.max(UnitWatermark.updated_at)).scalar()
+    db.session.rollback()
+    return last
+
+
+def _recent_activity():
+    idle = current_app.config.get('MAINTENANCE_IDLE_SECONDS', 120)
+    if shards.is_enabled():
+        # As marcas d'água ficam no banco de cada unidade
+        updates = shards.fan_out([unit_id for unit_id, path in shards.shard_files()], _last_update).values()
+    else:
+        updates = [_last_update()]
+    cutoff = datetime.utcnow() - timedelta(seconds=idle)
+    return any(last is not None and last > cutoff for last in updates)
+
+
+def run_scheduled(app):
+    """Executa a manutenção se estiver na janela, sem movimento e fora do intervalo mínimo"""
+    with app.app_context():
+        if not in_window():
+            return None
+
+        stamp = app.config['MAINTENANCE_STAMP_FILE']
+        interval = app.config.get('MAINTENANCE_INTERVAL_HOURS', 24) * 3600
+        if os.path.exists(stamp) and time.time() - os.path.getmtime(stamp) < interval:
+            return None
+
+        if _recent_activity():
+            return None
+
+        # Vários workers (ou uma execução manual em andamento): só um executa
+        if not acquire_run_lock():
+            return None
+
+        try:
+            report = run()
+            with open(stamp, 'w') as f:
+                f.write(report['finished_at'])
+            return report
+        finally:
+            release_run_lock()
+
+
+def start_scheduler(app):
+    """Inicia a thread de manutenção (sem MAINTENANCE_WINDOW fica desativada)"""
+    global _scheduler_started
+    if not app.config.get('MAINTENANCE_WINDOW'):
+        return
+
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+
+    def loop():
+        while True:
+            time.sleep(SCHEDULER_CHECK_INTERVAL)
+            try:
+                run_scheduled(app)
+            except Exception:
+                app.logger.exception('Falha na manutenção agendada')
+
+    threading.Thread(target=loop, name='db-maintenance', daemon=True).start()
+
+
+maintenance_cli = AppGroup('maintenance', help='Manutenção do banco de dados')
+
+
+@maintenance_cli.command('run')
+@click.option('--task', 'tasks', multiple=True, type=click.Choice(TASKS), help='Tarefa (padrão: todas)')
+def run_command(tasks):
+    """Executa a manutenção agora, fora da janela"""
+    if not acquire_run_lock():
+        raise click.ClickException('Manutenção já em andamento')
+
+    try:
+        report = run(tasks or TASKS)
+    finally:
+        release_run_lock()
+    for task in report['tasks']:
+        click.echo(task)
+    click.echo(f"antes: {report['probes_before']}  depois: {report['probes_after']}")
+
+
+@maintenance_cli.command('enable-incremental-vacuum')
+def enable_incremental_vacuum_command():
+    """Converte os bancos para auto_vacuum=INCREMENTAL (VACUUM completo: bloqueia escritas)"""
+    for path in _databases():
+        conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        try:
+            started = time.perf_counter()
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+            click.echo(f'{os.path.basename(path)}: auto_vacuum={_pragma(conn, "auto_vacuum")} '
+                       f'em {time.perf_counter() - started:.2f}s')
+        finally:
+            conn.close()
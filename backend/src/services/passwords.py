@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hash de senhas com custo configurável e verificação em pool limitado.
+#
+# PASSWORD_HASH_METHOD segue o formato do werkzeug ('scrypt:32768:8:1',
+# 'pbkdf2:sha256:600000', ...). O custo da verificação é o dos parâmetros
+# gravados em cada hash, por isso um login bem-sucedido com hash em outro
+# formato regrava a senha no formato atual (needs_rehash).
+#
+# A verificação roda em PASSWORD_VERIFY_WORKERS threads dedicadas: no máximo
+# esse número de núcleos fica ocupado com hashes, e as threads de requisição
+# continuam livres para a fila e o painel. Com mais de
+# PASSWORD_VERIFY_MAX_PENDING verificações aguardando, verify() recusa na hora
+# (VerifyBusy) em vez de acumular logins que vão estourar o tempo limite; uma
+# verificação que passa de VERIFY_TIMEOUT também vira VerifyBusy.
+
+VERIFY_TIMEOUT = 10
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+_method_prefixes = {}
+
+
+class VerifyBusy(Exception):
+    """Muitas verificações de senha na fila"""
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _method_prefix(method):
+    # 'scrypt' e 'scrypt:32768:8:1' geram o mesmo prefixo; o werkzeug completa os padrões
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = generate_password_hash('', method=method).split('$', 1)[0]
+        _method_prefixes[method] = prefix
+    return prefix
+
+
+def needs_rehash(password_hash):
+    """Se o hash foi gerado com parâmetros diferentes dos configurados"""
+    return password_hash.split('$', 1)[0] != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('PASSWORD_VERIFY_WORKERS', 1),
+                    thread_name_prefix='password-verify'
+                )
+    return _executor
+
+
+def verify(password_hash, password):
+    """Verifica a senha no pool dedicado; levanta VerifyBusy se a fila estiver cheia ou demorar demais"""
+    global _pending
+    max_pending = current_app.config.get('PASSWORD_VERIFY_MAX_PENDING', 16)
+
+    with _pending_lock:
+        if _pending >= max_pending:
+            raise VerifyBusy()
+        _pending += 1
+
+    try:
+        future = _get_executor().submit(check_password_hash, password_hash, password)
+        return future.result(timeout=VERIFY_TIMEOUT)
+    except TimeoutError:
+        raise VerifyBusy()
+    finally:
+        with _pending_lock:
+            _pending -= 1
@@ -0,0 +1,171 @@
+import math
+from sqlalchemy import func
+from src.models.user import db
+from src.models.quantile_bucket import QuantileBucket
+from src.services import events
+from src.services.sql import insert_for_dialect
+
+# Percentis de tempo de atendimento e de espera sem varrer senhas.
+#
+# Cada amostra (em segundos) é mapeada para um intervalo logarítmico com erro
+# relativo máximo RELATIVE_ACCURACY, como no DDSketch. Os esboços ficam na
+# tabela quantile_buckets, uma linha por (unidade, dia, métrica, categoria,
+# guichê, intervalo); gravar uma amostra é um upsert "count = count + 1", sem
+# leitura prévia. Esboços são mescláveis por soma, então o percentil de
+# qualquer período é calculado com um GROUP BY bucket sobre os dias.
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Intervalo reservado para amostras iguais a zero
+ZERO_BUCKET = 0
+
+
+def bucket_for(value):
+    """Intervalo logarítmico de um valor em segundos"""
+    if value <= 0:
+        return ZERO_BUCKET
+    return max(1, math.ceil(math.log(value) / _LOG_GAMMA) + 1)
+
+
+def value_for(bucket):
+    """Valor representativo de um intervalo (erro relativo <= RELATIVE_ACCURACY)"""
+    if bucket == ZERO_BUCKET:
+        return 0.0
+    return 2 * GAMMA ** (bucket - 1) / (GAMMA + 1)
+
+
+def record(metric, unit_id, day, category_id, counter_id, value):
+    """Adiciona uma amostra ao esboço (confirmada junto com a transação atual)"""
+    if value is None:
+        return
+
+    stmt = insert_for_dialect()(QuantileBucket).values(
+        unit_id=unit_id,
+        day=day,
+        metric=metric,
+        category_id=category_id,
+        counter_id=counter_id or 0,
+        bucket=bucket_for(value),
+        count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['unit_id', 'day', 'metric', 'category_id', 'counter_id', 'bucket'],
+        set_={'count': QuantileBucket.count + 1}
+    )
+    db.session.execute(stmt)
+
+
+def record_service(ticket):
+    """Registra o tempo de atendimento de uma senha finalizada"""
+    record('service', ticket.unit_id, ticket.generated_at.date(), ticket.category_id,
+           ticket.counter_id, ticket.service_time)
+
+
+def record_wait(ticket):
+    """Registra o tempo de espera (geração até a primeira chamada)"""
+    wait = int((ticket.called_at - ticket.generated_at).total_seconds())
+    record('wait', ticket.unit_id, ticket.generated_at.date(), ticket.category_id,
+           ticket.counter_id, max(0, wait))
+
+
+def merged_buckets(metric, unit_id, start_day, end_day, category_id=None, counter_id=None):
+    """Mescla os esboços diários do período: lista ordenada de (bucket, count)"""
+    query = db.session.query(
+        QuantileBucket.bucket,
+        func.sum(QuantileBucket.count)
+    ).filter(
+        QuantileBucket.unit_id == unit_id,
+        QuantileBucket.metric == metric,
+        QuantileBucket.day >= start_day,
+        QuantileBucket.day <= end_day
+    )
+
+    if category_id:
+        query = query.filter(QuantileBucket.category_id == category_id)
+
+    if counter_id:
+        query = query.filter(QuantileBucket.counter_id == counter_id)
+
+    return [(bucket, int(count)) for bucket, count in query.group_by(QuantileBucket.bucket).order_by(QuantileBucket.bucket)]
+
+
+def quantiles(buckets, qs=DEFAULT_QUANTILES):
+    """Calcula os percentis a partir dos intervalos mesclados"""
+    total = sum(count for _, count in buckets)
+    result = {'count': total}
+
+    for q in qs:
+        key = f'p{round(q * 100):d}'
+        if not total:
+            result[key] = None
+            continue
+
+        rank = q * (total - 1)
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen > rank:
+                result[key] = round(value_for(bucket), 2)
+                break
+
+    return result
+
+
+def histogram(buckets):
+    """Histograma do esboço: lista de {min, max, count} por intervalo"""
+    return [
+        {
+            'min': 0 if bucket == ZERO_BUCKET else round(GAMMA ** (bucket - 2), 2),
+            'max': 0 if bucket == ZERO_BUCKET else round(GAMMA ** (bucket - 1), 2),
+            'count': count
+        } for bucket, count in buckets
+    ]
+
+
+def rebuild(unit_id=None):
+    """Recalcula os esboços reproduzindo o registro de eventos (uso administrativo)"""
+    delete = QuantileBucket.query
+    if unit_id:
+        delete = delete.filter(QuantileBucket.unit_id == unit_id)
+    delete.delete(synchronize_session=False)
+
+    # Só senhas em aberto ficam em memória: (dia, geração, última chamada)
+    open_tickets = {}
+    counts = {}
+
+    def add(unit, day, metric, category, counter, value):
+        key = (unit, day, metric, category, counter or 0, bucket_for(value))
+        counts[key] = counts.get(key, 0) + 1
+
+    for seq, unit, ticket_id, kind, category, counter, at in events.replay(unit_id=unit_id):
+        if kind == events.GENERATED:
+            open_tickets[ticket_id] = [events.from_millis(at).date(), at, None]
+            continue
+
+        state = open_tickets.get(ticket_id)
+        if state is None:
+            continue
+
+        if kind in (events.CALLED, events.RECALLED):
+            if state[2] is None:
+                add(unit, state[0], 'wait', category, counter, max(0, (at - state[1]) // 1000))
+            state[2] = at
+        elif kind == events.FINISHED:
+            if state[2] is not None:
+                add(unit, state[0], 'service', category, counter, (at - state[2]) // 1000)
+            del open_tickets[ticket_id]
+        elif kind == events.MISSED:
+            del open_tickets[ticket_id]
+
+    db.session.bulk_insert_mappings(QuantileBucket, [
+        {
+            'unit_id': key[0], 'day': key[1], 'metric': key[2], 'category_id': key[3],
+            'counter_id': key[4], 'bucket': key[5], 'count': count
+        } for key, count in counts.items()
+    ])
+    db.session.commit()
+    return len(counts)
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import deque
+
+# Limite de tentativas em janela deslizante, em memória.
+#
+# Cada chave (ex.: ('ip', '10.0.0.5') ou ('user', 'maria')) guarda os
+# instantes das últimas tentativas; retry_after() diz quanto falta para a mais
+# antiga sair da janela quando o limite foi atingido. As verificações são
+# O(1) amortizado e não acessam o banco, então um ataque de força bruta é
+# barrado antes de gastar CPU com hash de senha.
+#
+# O estado é por processo: com N workers do gunicorn o limite efetivo por
+# chave é até N vezes o configurado, o que ainda corta ataques em volume.
+
+MAX_KEYS = 10000
+
+
+class SlidingWindowLimiter:
+    """No máximo limit eventos por chave a cada window segundos"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, events, now):
+        while events and events[0] <= now - self.window:
+            events.popleft()
+
+    def retry_after(self, key, now=None):
+        """Segundos até a chave poder tentar de novo (0 se está liberada)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return 0
+            self._prune(events, now)
+            if len(events) < self.limit:
+                return 0
+            return events[0] + self.window - now
+
+    def hit(self, key, now=None):
+        """Registra um evento para a chave"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                if len(self._events) >= MAX_KEYS:
+                    self._sweep(now)
+                events = self._events[key] = deque()
+            self._prune(events, now)
+            events.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _sweep(self, now):
+        # Remove chaves sem eventos recentes; se ainda estiver cheio, as mais antigas
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= now - self.window]:
+            del self._events[key]
+        if len(self._events) >= MAX_KEYS:
+            oldest = sorted(self._events, key=lambda k: self._events[k][-1])
+            for key in oldest[:len(oldest) // 2]:
+                del self._events[key]
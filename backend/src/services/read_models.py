@@ -0,0 +1,127 @@
+from sqlalchemy import func, and_, or_
+from src.models.user import db
+from src.models.ticket import Ticket
+from src.models.category import Category
+from src.models.counter import Counter
+
+# Camada de leitura das senhas sem hidratação de objetos ORM.
+#
+# As consultas selecionam apenas as colunas necessárias e devolvem tuplas
+# (TICKET_COLUMNS, convertidas por serialization.ticket_row_to_dict) ou
+# registros TicketRecord com __slots__. Nada entra no identity map da sessão,
+# e listas longas são lidas do cursor em lotes de STREAM_BATCH_SIZE.
+
+STREAM_BATCH_SIZE = 2000
+
+# Colunas na ordem esperada por serialization.ticket_row_to_dict
+TICKET_COLUMNS = (
+    Ticket.id,
+    Ticket.ticket_number,
+    Ticket.category_id,
+    Ticket.unit_id,
+    Ticket.counter_id,
+    Ticket.status,
+    Ticket.generated_at,
+    Ticket.called_at,
+    Ticket.finished_at,
+    Ticket.service_time,
+)
+
+
+class TicketRecord:
+    """Linha de senha somente leitura, com nomes de categoria e guichê"""
+
+    __slots__ = (
+        'id', 'ticket_number', 'category_id', 'unit_id', 'counter_id', 'status',
+        'generated_at', 'called_at', 'finished_at', 'service_time',
+        'category_name', 'counter_name'
+    )
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f'<TicketRecord {self.ticket_number}>'
+
+
+def ticket_query(*extra_columns):
+    """Consulta base por colunas (sem objetos ORM)"""
+    return db.session.query(*TICKET_COLUMNS, *extra_columns)
+
+
+def stream(query):
+    """Itera o resultado em lotes, sem carregar a lista inteira na memória"""
+    return query.execution_options(yield_per=STREAM_BATCH_SIZE)
+
+
+def queue_rows(unit_id):
+    """Senhas aguardando, por prioridade e ordem de chegada"""
+    return ticket_query().join(Category).filter(
+        and_(
+            Ticket.unit_id == unit_id,
+            Ticket.status == 'waiting'
+        )
+    ).order_by(
+        Category.priority.desc(),
+        Ticket.generated_at.asc()
+    ).all()
+
+
+def display_rows(unit_id, recent_limit=5):
+    """Senha em chamada e últimas senhas atendidas/perdidas para o painel"""
+    current = ticket_query().filter(
+        and_(
+            Ticket.unit_id == unit_id,
+            Ticket.status == 'calling'
+        )
+    ).order_by(Ticket.called_at.desc()).first()
+
+    recent = ticket_query().filter(
+        and_(
+            Ticket.unit_id == unit_id,
+            or_(Ticket.status == 'finished', Ticket.status == 'missed')
+        )
+    ).order_by(Ticket.called_at.desc()).limit(recent_limit).all()
+
+    return current, recent
+
+
+def history_rows(unit_id, start=None, end=None, category_id=None, status=None):
+    """Histórico de senhas (mais recentes primeiro)"""
+    query = ticket_query().filter(Ticket.unit_id == unit_id)
+
+    if start:
+        query = query.filter(Ticket.generated_at >= start)
+
+    if end:
+        query = query.filter(Ticket.generated_at <= end)
+
+    if category_id:
+        query = query.filter(Ticket.category_id == category_id)
+
+    if status:
+        query = query.filter(Ticket.status == status)
+
+    return stream(query.order_by(Ticket.generated_at.desc()))
+
+
+def export_records(unit_id, start_date=None, end_date=None, category_id=None):
+    """Senhas para exportação, com nomes de categoria e guichê já resolvidos"""
+    query = ticket_query(Category.name, Counter.name).outerjoin(
+        Category, Category.id == Ticket.category_id
+    ).outerjoin(
+        Counter, Counter.id == Ticket.counter_id
+    ).filter(Ticket.unit_id == unit_id)
+
+    if start_date:
+        query = query.filter(func.date(Ticket.generated_at) >= start_date)
+
+    if end_date:
+        query = query.filter(func.date(Ticket.generated_at) <= end_date)
+
+    if category_id:
+        query = query.filter(Ticket.category_id == category_id)
+
+    for row in stream(query.order_by(Ticket.generated_at.desc())):
+        yield TicketRecord(row)
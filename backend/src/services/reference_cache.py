@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import abort, current_app
+from src.models.unit import Unit
+from src.models.category import Category
+from src.models.counter import Counter
+from src.models.display_settings import DisplaySettings
+
+# Cache de dados de referência (unidades, categorias, guichês e configurações
+# do painel). Esses registros mudam poucas vezes por mês, mas são lidos em
+# quase toda requisição. Cada entrada guarda a versão global em que foi
+# carregada; qualquer escrita incrementa a versão e invalida todas as entradas.
+#
+# Para manter vários workers coerentes a versão também é gravada em um arquivo
+# compartilhado (REFERENCE_CACHE_VERSION_FILE), relido no máximo a cada
+# REFERENCE_CACHE_CHECK_INTERVAL segundos. A versão é um carimbo de tempo em
+# nanossegundos (sempre maior que a anterior), e não a lida + 1: dois workers
+# invalidando juntos não gravam o mesmo número.
+#
+# Registros inexistentes também ficam em cache; no máximo MAX_ENTRIES entradas
+# (as menos usadas saem primeiro), já que ids arbitrários chegam por rotas
+# públicas.
+
+_MODELS = {
+    'unit': (Unit, 'id'),
+    'category': (Category, 'id'),
+    'counter': (Counter, 'id'),
+    'display_settings': (DisplaySettings, 'unit_id'),
+}
+
+MAX_ENTRIES = 4096
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_version = 0
+_last_check = 0.0
+
+
+class ReferenceEntry:
+    """Cópia imutável de um registro de referência"""
+
+    __slots__ = ('_data', 'version')
+
+    def __init__(self, data, version):
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, 'version', version)
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ReferenceEntry é somente leitura')
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+def _version_file():
+    try:
+        return current_app.config.get('REFERENCE_CACHE_VERSION_FILE')
+    except RuntimeError:
+        return None
+
+
+def _read_shared_version(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_shared_version(path, version):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+
+
+def _sync_version():
+    """Descarta as entradas se outro worker publicou uma versão mais nova"""
+    global _version, _last_check
+
+    path = _version_file()
+    if not path:
+        return _version
+
+    interval = current_app.config.get('REFERENCE_CACHE_CHECK_INTERVAL', 1.0)
+    now = time.monotonic()
+    if now - _last_check < interval:
+        return _version
+
+    shared = _read_shared_version(path)
+    with _lock:
+        _last_check = now
+        if shared > _version:
+            _version = shared
+            _entries.clear()
+    return _version
+
+
+def current_version():
+    """Retorna a versão atual dos dados de referência"""
+    return _sync_version()
+
+
+def invalidate():
+    """Invalida o cache após uma escrita (chamar depois do commit)"""
+    global _version, _last_check
+
+    path = _version_file()
+    with _lock:
+        if path:
+            _version = max(time.time_ns(), _version + 1, _read_shared_version(path) + 1)
+            _write_shared_version(path, _version)
+            _last_check = time.monotonic()
+        else:
+            _version += 1
+        _entries.clear()
+
+
+def get(kind, key):
+    """Obtém um registro de referência do cache, carregando do banco se necessário"""
+    version = _sync_version()
+    key = int(key)
+
+    entry = _entries.get((kind, key))
+    if entry is not None and entry.version == version:
+        try:
+            _entries.move_to_end((kind, key))
+        except KeyError:
+            pass
+        return entry if entry._data is not None else None
+
+    model, column = _MODELS[kind]
+    row = model.query.filter(getattr(model, column) == key).first()
+
+    # Registros inexistentes também são guardados para não consultar o banco
+    # a cada requisição (ex.: unidade sem configurações de painel)
+    entry = ReferenceEntry(row.to_dict() if row else None, version)
+    with _lock:
+        if version == _version:
+            _entries[(kind, key)] = entry
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return entry if row else None
+
+
+def get_or_404(kind, key):
+    """Como get(), mas aborta com 404 se o registro não existir"""
+    entry = get(kind, key)
+    if entry is None:
+        abort(404)
+    return entry
+
+
+def get_dict(kind, key):
+    """Retorna o registro como dicionário (ou None)"""
+    if key is None:
+        return None
+    entry = get(kind, key)
+    return entry.to_dict() if entry else None
+
+
+def clear():
+    """Remove todas as entradas locais sem alterar a versão"""
+    with _lock:
+        _entries.clear()
+
+
+def display_settings_dict(unit_id):
+    """Configurações do painel da unidade, com os padrões em memória se não houver registro"""
+    entry = get('display_settings', unit_id)
+    if entry is None:
+        return DisplaySettings.default_dict(int(unit_id))
+    return entry.to_dict()
@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db
+from src.models.session import read_engine
+from src.models.ticket_event import TicketEvent
+from src.services import backup, events
+
+# Leituras pesadas (relatórios, histórico) em uma réplica do banco.
+#
+# A réplica é um bind do Flask-SQLAlchemy ('replica'), definido por:
+#   REPLICA_DATABASE_URL      réplica externa (ex.: Postgres em streaming) ou
+#                             conexão somente leitura ao mesmo arquivo SQLite
+#                             ('sqlite:///file:/caminho/app.db?mode=ro&uri=true');
+#   REPLICA_SNAPSHOT_SECONDS  só SQLite: cópia do banco em REPLICA_SNAPSHOT_PATH,
+#                             renovada nesse intervalo pela thread de segundo
+#                             plano (0 desativa).
+#
+# Rotas marcadas com @use_replica consultam a réplica enquanto ela estiver
+# saudável. O atraso é medido a cada REPLICA_CHECK_SECONDS pelo registro de
+# eventos: idade do evento mais antigo do banco principal que ainda não está
+# na réplica. Réplica acima de REPLICA_MAX_LAG_SECONDS, inacessível ou com erro
+# de conexão: as leituras voltam para o banco principal até a próxima
+# verificação bem-sucedida. Escritas nunca vão para a réplica
+# (models/session.RoutingSession).
+
+BIND_KEY = 'replica'
+
+_state = {'healthy': False, 'lag_seconds': None, 'checked_at': None, 'error': None}
+_next_check = 0.0
+_check_lock = threading.Lock()
+_snapshot_id = None
+_refresher_started = False
+_refresher_lock = threading.Lock()
+
+
+def configure(app):
+    """Registra o bind da réplica conforme a configuração (antes de db.init_app)"""
+    url = app.config.get('REPLICA_DATABASE_URL')
+    if app.config.get('UNIT_SHARDS') and (url or app.config.get('REPLICA_SNAPSHOT_SECONDS')):
+        # Senhas e eventos ficam nos bancos das unidades, fora da réplica
+        app.logger.warning('Réplica de leitura ignorada no modo UNIT_SHARDS')
+        return
+    if not url and app.config.get('REPLICA_SNAPSHOT_SECONDS'):
+        # Somente leitura: arquivo ainda inexistente falha em vez de ser criado vazio
+        url = f"sqlite:///file:{app.config['REPLICA_SNAPSHOT_PATH']}?mode=ro&uri=true"
+
+    if url:
+        app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), BIND_KEY: url}
+
+
+def configure_engine():
+    """Pragmas da réplica SQLite e detecção de falhas de conexão (depois de db.init_app)"""
+    engine = db.engines.get(BIND_KEY)
+    if engine is None:
+        return
+
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA busy_timeout=5000')
+            cursor.execute('PRAGMA query_only=1')
+            cursor.close()
+
+    @event.listens_for(engine, 'handle_error')
+    def _mark_unhealthy(context):
+        # Erro na réplica: próximas leituras no principal até a nova verificação
+        _state['healthy'] = False
+        _state['error'] = str(context.original_exception)[:200]
+
+
+def is_configured():
+    return BIND_KEY in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def _snapshot_mode():
+    return not current_app.config.get('REPLICA_DATABASE_URL') and bool(current_app.config.get('REPLICA_SNAPSHOT_SECONDS'))
+
+
+def measure_lag(engine):
+    """Segundos de atraso da réplica (0 se ela já tem todos os eventos do principal)"""
+    with engine.connect() as conn:
+        replica_seq = conn.execute(select(func.max(TicketEvent.seq))).scalar() or 0
+
+    with db.engine.connect() as conn:
+        oldest_missing = conn.execute(
+            select(TicketEvent.at).where(TicketEvent.seq > replica_seq).order_by(TicketEvent.seq).limit(1)
+        ).scalar()
+
+    if oldest_missing is None:
+        return 0.0
+    return max(0.0, (events.to_millis(datetime.utcnow()) - oldest_missing) / 1000)
+
+
+def _reopen_if_replaced(engine):
+    # Cópia renovada (os.replace): conexões do pool ainda leem o arquivo antigo
+    global _snapshot_id
+    try:
+        stat = os.stat(current_app.config['REPLICA_SNAPSHOT_PATH'])
+        snapshot_id = (stat.st_ino, stat.st_mtime_ns)
+    except FileNotFoundError:
+        snapshot_id = None
+
+    if snapshot_id != _snapshot_id:
+        engine.dispose()
+        _snapshot_id = snapshot_id
+
+
+def _check(engine):
+    """Mede o atraso se a última verificação expirou; retorna se a réplica está utilizável"""
+    global _next_check
+    now = time.monotonic()
+    # Só uma thread verifica; as demais usam o último resultado
+    if now < _next_check or not _check_lock.acquire(blocking=False):
+        return _state['healthy']
+
+    try:
+        _next_check = now + current_app.config.get('REPLICA_CHECK_SECONDS', 5)
+        was_healthy = _state['healthy']
+        try:
+            if _snapshot_mode():
+                _reopen_if_replaced(engine)
+            lag = measure_lag(engine)
+            max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 300)
+            healthy = lag <= max_lag
+            error = None if healthy else f'atraso de {lag:.0f}s acima do limite de {max_lag}s'
+        except SQLAlchemyError as e:
+            lag, healthy, error = None, False, str(e.orig if getattr(e, 'orig', None) else e)[:200]
+
+        _state.update({
+            'healthy': healthy,
+            'lag_seconds': None if lag is None else round(lag, 3),
+            'checked_at': datetime.now().isoformat(),
+            'error': error
+        })
+        if healthy != was_healthy:
+            if healthy:
+                current_app.logger.info('Réplica de leitura disponível (atraso %.1fs)', lag)
+            else:
+                current_app.logger.warning('Leituras no banco principal: %s', error)
+        return healthy
+    finally:
+        _check_lock.release()
+
+
+@contextmanager
+def reads():
+    """Consultas do bloco vão para a réplica, se configurada e saudável; produz se foi usada"""
+    engine = db.engines.get(BIND_KEY) if is_configured() else None
+    if engine is not None and not _check(engine):
+        engine = None
+
+    token = read_engine.set(engine)
+    try:
+        yield engine is not None
+    finally:
+        read_engine.reset(token)
+
+
+def use_replica(f):
+    """Decorator para rotas somente leitura que toleram o atraso da réplica"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        with reads():
+            return f(*args, **kwargs)
+
+    return decorated
+
+
+def status():
+    """Configuração e última verificação da réplica neste processo"""
+    if not is_configured():
+        return {'configured': False}
+
+    return {
+        'configured': True,
+        'mode': 'snapshot' if _snapshot_mode() else 'url',
+        'max_lag_seconds': current_app.config.get('REPLICA_MAX_LAG_SECONDS', 300),
+        **_state
+    }
+
+
+def refresh_snapshot():
+    """Renova a cópia usada como réplica (modo REPLICA_SNAPSHOT_SECONDS)"""
+    path = current_app.config['REPLICA_SNAPSHOT_PATH']
+    lock_path = f'{path}.lock'
+    if not backup.acquire_lock(lock_path):
+        return None
+
+    try:
+        method, seconds = backup.copy_to(path)
+        current_app.logger.debug('Réplica renovada (%s) em %.2fs', method, seconds)
+        return seconds
+    finally:
+        os.remove(lock_path)
+
+
+def start_refresher(app):
+    """Inicia a thread que renova a cópia da réplica (só no modo REPLICA_SNAPSHOT_SECONDS)"""
+    global _refresher_started
+    with app.app_context():
+        if not is_configured() or not _snapshot_mode():
+            return
+
+    with _refresher_lock:
+        if _refresher_started:
+            return
+        _refresher_started = True
+
+    interval = app.config['REPLICA_SNAPSHOT_SECONDS']
+
+    def loop():
+        while True:
+            try:
+                with app.app_context():
+                    refresh_snapshot()
+            except Exception:
+                app.logger.exception('Falha ao renovar a réplica')
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name='replica-refresh', daemon=True).start()
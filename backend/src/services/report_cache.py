@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import case, func
+from src.models.user import db
+from src.models.ticket import Ticket
+from src.services import watermarks
+
+# Cache de resultados de relatórios.
+#
+# Resultados são indexados por (relatório, unidade, parâmetros normalizados) e
+# marcados com a marca d'água da unidade (services/watermarks): a versão geral
+# para períodos que incluem hoje e history_version para períodos encerrados,
+# que assim permanecem válidos indefinidamente.
+#
+# Os relatórios agregados são montados a partir de parciais diárias (contagens
+# e somas por categoria, guichê e status). Dias encerrados ficam em cache e
+# apenas o dia corrente é reconsultado quando há novas alterações.
+
+MAX_RESULTS = 1024
+MAX_DAY_PARTIALS = 20000
+
+# Uma linha agregada de um dia
+DayPartial = namedtuple('DayPartial', [
+    'category_id', 'counter_id', 'status',
+    'count', 'service_sum', 'service_count', 'service_positive'
+])
+
+_lock = threading.Lock()
+_results = OrderedDict()
+_day_partials = OrderedDict()
+
+
+def _max_age():
+    return current_app.config.get('REPORT_CACHE_WATERMARK_MAX_AGE', 1.0)
+
+
+def _remember(store, key, value, limit):
+    with _lock:
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+
+def _lookup(store, key, tag):
+    entry = store.get(key)
+    if entry is not None and entry[0] == tag:
+        return entry[1]
+    return None
+
+
+def _tag(unit_id, closed):
+    version, history_version = watermarks.snapshot(unit_id, _max_age())
+    return ('history', history_version) if closed else ('current', version)
+
+
+def _result_key(report, unit_id, params):
+    return (report, int(unit_id), tuple(sorted(params.items())))
+
+
+def lookup(report, unit_id, params, closed=False):
+    """Resultado em cache ainda válido para a marca d'água atual (ou None)"""
+    return _lookup(_results, _result_key(report, unit_id, params), _tag(int(unit_id), closed))
+
+
+def remember(report, unit_id, params, result, closed=False):
+    """Guarda um resultado calculado com a marca d'água atual"""
+    _remember(_results, _result_key(report, unit_id, params), (_tag(int(unit_id), closed), result), MAX_RESULTS)
+
+
+def _query_partials(unit_id, start_day, end_day):
+    day = func.date(Ticket.generated_at)
+    rows = db.session.query(
+        day,
+        Ticket.category_id,
+        Ticket.counter_id,
+        Ticket.status,
+        func.count(Ticket.id),
+        func.coalesce(func.sum(Ticket.service_time), 0),
+        func.count(Ticket.service_time),
+        func.sum(case((Ticket.service_time > 0, 1), else_=0))
+    ).filter(
+        Ticket.unit_id == unit_id,
+        Ticket.generated_at >= datetime.combine(start_day, time.min),
+        Ticket.generated_at < datetime.combine(end_day + timedelta(days=1), time.min)
+    ).group_by(
+        day, Ticket.category_id, Ticket.counter_id, Ticket.status
+    ).all()
+
+    partials = {}
+    current = start_day
+    while current <= end_day:
+        partials[current.isoformat()] = []
+        current += timedelta(days=1)
+
+    for row in rows:
+        partials[str(row[0])[:10]].append(DayPartial(*row[1:4], int(row[4]), int(row[5]), int(row[6]), int(row[7] or 0)))
+    return partials
+
+
+def day_partials(unit_id, start_day, end_day):
+    """Parciais por dia (dict 'YYYY-MM-DD' -> lista de DayPartial) do período"""
+    unit_id = int(unit_id)
+    today = datetime.now().date()
+    closed_tag = _tag(unit_id, closed=True)
+    current_tag = _tag(unit_id, closed=False)
+
+    result = {}
+    missing = []
+    current = start_day
+    while current <= end_day:
+        tag = closed_tag if current < today else current_tag
+        cached = _lookup(_day_partials, (unit_id, current), tag)
+        if cached is None:
+            missing.append(current)
+        else:
+            result[current.isoformat()] = cached
+        current += timedelta(days=1)
+
+    if missing:
+        # Uma única consulta cobre todos os dias que faltam
+        fetched = _query_partials(unit_id, missing[0], missing[-1])
+        for day in missing:
+            rows = fetched[day.isoformat()]
+            result[day.isoformat()] = rows
+            tag = closed_tag if day < today else current_tag
+            _remember(_day_partials, (unit_id, day), (tag, rows), MAX_DAY_PARTIALS)
+
+    return result
+
+
+def is_closed_period(end_day):
+    """Períodos que terminam antes de hoje não recebem novas senhas"""
+    return end_day < datetime.now().date()
+
+
+def clear():
+    """Remove todos os resultados em cache"""
+    with _lock:
+        _results.clear()
+        _day_partials.clear()
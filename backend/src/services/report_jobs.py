@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from src.models.user import db
+from src.services import replica, shards, watermarks
+
+# Fila de relatórios em segundo plano.
+#
+# Relatórios pesados (dashboard, período, percentis, previsão, exportação)
+# são enviados como jobs e executados em um pool de threads próprio
+# (REPORT_JOB_WORKERS), fora das threads que atendem as requisições de senhas:
+# a rota espera no máximo REPORT_JOB_WAIT segundos e, se o job não terminou,
+# responde 202 com ele para o cliente acompanhar. O resultado é gravado em disco
+# (REPORT_CACHE_DIR) com chave derivada de (relatório, unidade, parâmetros,
+# marca d'água da unidade): pedidos idênticos, inclusive simultâneos, são
+# atendidos por um único cálculo, e qualquer alteração de senhas da unidade
+# gera uma chave nova.
+#
+# A chave começa pela identificação (relatório, unidade, parâmetros) e termina
+# pela versão dos dados. Após cada gravação (no máximo a cada EVICT_INTERVAL
+# segundos) os resultados de versões superadas com mais de SUPERSEDED_GRACE
+# segundos são apagados, assim como os mais antigos que
+# REPORT_CACHE_MAX_AGE_HOURS ou, do mais antigo para o mais novo, os que
+# passam de REPORT_CACHE_MAX_MB no total.
+#
+# Com réplica de leitura configurada o cálculo é feito nela, desde que a
+# réplica já enxergue a versão dos dados usada na chave do job; caso
+# contrário, no banco principal.
+
+MAX_TRACKED_JOBS = 256
+SUPERSEDED_GRACE = 300
+EVICT_INTERVAL = 60
+
+_reports = {}
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_executor = None
+_last_evict = 0.0
+
+
+class Job:
+    """Estado de um relatório em segundo plano"""
+
+    __slots__ = ('id', 'report', 'unit_id', 'params', 'status', 'error', 'created_at', 'finished_at', 'data_version',
+                 'finished')
+
+    def __init__(self, id, report, unit_id, params, status='queued', data_version=None):
+        self.id = id
+        self.report = report
+        self.unit_id = unit_id
+        self.params = params
+        self.status = status
+        self.data_version = data_version
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        # Sinalizado quando o job termina (concluído ou com falha)
+        self.finished = threading.Event()
+        if status in ('done', 'failed'):
+            self.finished.set()
+
+    def wait(self, timeout):
+        """Aguarda até timeout segundos o fim do job; retorna se terminou"""
+        return self.finished.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report': self.report,
+            'unit_id': self.unit_id,
+            'params': self.params,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def register(name, builder):
+    """Registra uma função builder(unit_id, **params) -> dict como relatório assíncrono"""
+    _reports[name] = builder
+
+
+def is_registered(name):
+    return name in _reports
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('REPORT_JOB_WORKERS', 2),
+                    thread_name_prefix='report-job'
+                )
+    return _executor
+
+
+def _cache_dir():
+    path = current_app.config['REPORT_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _result_path(job_id):
+    return os.path.join(_cache_dir(), f'{job_id}.json')
+
+
+def _digest(value):
+    raw = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def job_key(report, unit_id, params, data_version):
+    """Chave determinística de um relatório para uma versão dos dados"""
+    return _digest([report, int(unit_id), params]) + _digest(data_version)
+
+
+def _read_result(job_id):
+    try:
+        with open(_result_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_result(job, result):
+    path = _result_path(job.id)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'job': dict(job.to_dict(), status='done'),
+            'result': result
+        }, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    _evict()
+
+
+def _evict():
+    # Apaga versões superadas, resultados antigos e o excesso acima do limite de tamanho
+    global _last_evict
+    now = time.time()
+    with _lock:
+        if now - _last_evict < EVICT_INTERVAL:
+            return
+        _last_evict = now
+
+    directory = _cache_dir()
+    files = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, name))
+    files.sort(reverse=True)
+
+    max_age = current_app.config.get('REPORT_CACHE_MAX_AGE_HOURS', 24) * 3600
+    max_bytes = current_app.config.get('REPORT_CACHE_MAX_MB', 256) * 1024 * 1024
+    newest = set()
+    total = 0
+    for mtime, size, name in files:
+        slot = name[:16]
+        superseded = slot in newest and now - mtime > SUPERSEDED_GRACE
+        newest.add(slot)
+        if superseded or now - mtime > max_age or total + size > max_bytes:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+            continue
+        total += size
+
+
+def _track(job):
+    _jobs[job.id] = job
+    while len(_jobs) > MAX_TRACKED_JOBS:
+        _jobs.popitem(last=False)
+
+
+def _build(job):
+    with replica.reads() as on_replica:
+        if not on_replica or watermarks.current(job.unit_id) == job.data_version:
+            return _reports[job.report](job.unit_id, **job.params)
+
+    # Réplica ainda sem a versão pedida: calcula no banco principal
+    return _reports[job.report](job.unit_id, **job.params)
+
+
+def _run(app, job):
+    with app.app_context():
+        try:
+            job.status = 'running'
+            with shards.for_unit(job.unit_id):
+                result = _build(job)
+            # O arquivo é gravado antes de publicar 'done': quem consulta o job
+            # nunca vê um relatório concluído sem resultado para baixar
+            job.finished_at = datetime.utcnow()
+            _write_result(job, result)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = 'Erro ao gerar relatório'
+            job.finished_at = datetime.utcnow()
+            app.logger.exception('Falha no relatório %s (job %s)', job.report, job.id)
+        finally:
+            db.session.remove()
+            job.finished.set()
+
+
+def submit(report, unit_id, params):
+    """Enfileira um relatório; pedidos idênticos reutilizam o mesmo job"""
+    unit_id = int(unit_id)
+    data_version = watermarks.current(unit_id)
+    job_id = job_key(report, unit_id, params, data_version)
+
+    with _lock:
+        # Jobs com falha ou cujo resultado já foi apagado do disco são refeitos
+        job = _jobs.get(job_id)
+        if job is not None and job.status != 'failed' and (job.status != 'done' or os.path.exists(_result_path(job_id))):
+            return job
+
+        stored = _read_result(job_id)
+        if stored is not None:
+            job = Job(job_id, report, unit_id, params, status='done')
+            job.finished_at = datetime.fromisoformat(stored['job']['finished_at'])
+            _track(job)
+            return job
+
+        job = Job(job_id, report, unit_id, params, data_version=data_version)
+        _track(job)
+
+    _get_executor().submit(_run, current_app._get_current_object(), job)
+    return job
+
+
+def get_job(job_id):
+    """Obtém um job em memória ou, após reinício, a partir do resultado em disco"""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+
+    stored = _read_result(job_id)
+    if stored is None:
+        return None
+
+    meta = stored['job']
+    job = Job(job_id, meta['report'], meta['unit_id'], meta['params'], status='done')
+    job.finished_at = datetime.fromisoformat(meta['finished_at'])
+    return job
+
+
+def get_result(job_id):
+    """Resultado de um job concluído (ou None)"""
+    stored = _read_result(job_id)
+    return stored['result'] if stored else None
@@ -0,0 +1,116 @@
+import zlib
+from sqlalchemy import inspect, text
+from src.models.user import db
+
+# Ajustes de esquema para bancos criados por versões anteriores.
+#
+# db.create_all() só cria tabelas novas; colunas e índices adicionados
+# depois a tabelas existentes são aplicados aqui. Cada passo é idempotente.
+#
+# No SQLite, a impressão digital do esquema esperado (modelos + ajustes abaixo)
+# fica em PRAGMA user_version; quando coincide, upgrade_schema() não faz
+# nenhuma inspeção e a inicialização custa uma única leitura.
+
+# (tabela, coluna, definição SQL)
+ADDED_COLUMNS = [
+    ('units', 'archived_at', 'DATETIME'),
+    ('categories', 'archived_at', 'DATETIME'),
+    ('counters', 'archived_at', 'DATETIME'),
+    ('unit_watermarks', 'history_version', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+# (nome, tabela, colunas, único)
+ADDED_INDEXES = [
+    ('uq_display_settings_unit_id', 'display_settings', 'unit_id', True),
+    ('ix_tickets_category_id', 'tickets', 'category_id', False),
+    ('ix_tickets_counter_id', 'tickets', 'counter_id', False),
+    ('ix_tickets_unit_generated_at', 'tickets', 'unit_id, generated_at', False),
+]
+
+
+def _add_missing_columns(conn, tables=None):
+    inspector = inspect(conn)
+    for table, column, definition in ADDED_COLUMNS:
+        if tables is not None and table not in tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column not in existing:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+
+
+def _dedupe_display_settings():
+    # Necessário antes do índice único: mantém o registro mais antigo de cada unidade
+    db.session.execute(text(
+        'DELETE FROM display_settings WHERE id NOT IN '
+        '(SELECT MIN(id) FROM display_settings GROUP BY unit_id)'
+    ))
+
+
+def _add_missing_indexes(conn, tables=None):
+    for name, table, columns, unique in ADDED_INDEXES:
+        if tables is not None and table not in tables:
+            continue
+        conn.execute(text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        ))
+
+
+def schema_fingerprint(tables=None):
+    """Inteiro de 31 bits derivado das tabelas, colunas e índices esperados"""
+    parts = []
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        if tables is not None and table.name not in tables:
+            continue
+        parts.append(table.name)
+        parts.extend(f'{column.name}:{column.type}' for column in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    parts.extend(repr(item) for item in ADDED_COLUMNS if tables is None or item[0] in tables)
+    parts.extend(repr(item) for item in ADDED_INDEXES if tables is None or item[1] in tables)
+    return zlib.crc32('|'.join(parts).encode('utf-8')) & 0x7FFFFFFF
+
+
+def _stored_fingerprint():
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    return db.session.execute(text('PRAGMA user_version')).scalar()
+
+
+def is_current():
+    """Se o banco já está no esquema esperado por esta versão do código"""
+    current = _stored_fingerprint() == schema_fingerprint()
+    db.session.commit()
+    return current
+
+
+def upgrade_schema():
+    """Cria as tabelas e aplica colunas/índices que faltam em bancos antigos"""
+    if is_current():
+        return False
+    
+    db.create_all()
+    conn = db.session.connection()
+    _add_missing_columns(conn)
+    _dedupe_display_settings()
+    _add_missing_indexes(conn)
+    
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text(f'PRAGMA user_version = {schema_fingerprint()}'))
+    db.session.commit()
+    return True
+
+
+def upgrade_tables(conn, metadata, tables):
+    """Cria/atualiza só as tabelas indicadas em outro banco SQLite (ex.: bancos das unidades)
+
+    metadata pode ser uma cópia de db.metadata com opções próprias do banco.
+    A impressão digital das tabelas fica no user_version desse banco.
+    """
+    fingerprint = schema_fingerprint(tables)
+    if conn.execute(text('PRAGMA user_version')).scalar() == fingerprint:
+        return False
+
+    metadata.create_all(conn, tables=[metadata.tables[name] for name in tables])
+    _add_missing_columns(conn, tables)
+    _add_missing_indexes(conn, tables)
+    conn.execute(text(f'PRAGMA user_version = {fingerprint}'))
+    return True
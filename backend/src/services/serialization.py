@@ -0,0 +1,149 @@
+import re
+from flask.json.provider import DefaultJSONProvider
+from src.services import reference_cache
+from src.services.read_models import TICKET_COLUMNS
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+# Serialização rápida de respostas JSON.
+#
+# FastJSONProvider usa orjson quando disponível e produz exatamente os mesmos
+# bytes do provider padrão do Flask (chaves ordenadas, separadores compactos,
+# escape de caracteres não ASCII e quebra de linha final). O que o orjson
+# escreve de outro jeito volta para o DefaultJSONProvider: floats NaN/Infinity
+# ou em notação exponencial (fora de [1e-4, 1e16)), inteiros acima de 64 bits,
+# chaves que não são texto e tipos que o orjson não conhece. Sem orjson, ou em
+# modo debug (saída indentada), delega ao DefaultJSONProvider. Com
+# app.json.ensure_ascii = False o passo de escape é dispensado (a saída
+# continua sendo JSON equivalente, mas em UTF-8).
+#
+# ticket_row_to_dict converte tuplas de read_models.TICKET_COLUMNS diretamente
+# no mesmo dicionário de Ticket.to_dict(), sem instanciar objetos ORM.
+
+_NON_ASCII = re.compile(rb'[\x7f-\xff]+')
+_ASCII_BYTES = bytes(range(0x7f))
+MAX_REPLACED_CHARS = 64
+_escaped_runs = {}
+
+
+def _escape_char(char):
+    code = ord(char)
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    code -= 0x10000
+    return f'\\u{0xd800 | (code >> 10):04x}\\u{0xdc00 | (code & 0x3ff):04x}'
+
+
+def _escaped(run):
+    escaped = _escaped_runs.get(run)
+    if escaped is None:
+        if len(_escaped_runs) > 4096:
+            _escaped_runs.clear()
+        escaped = ''.join(_escape_char(c) for c in run.decode('utf-8')).encode('ascii')
+        _escaped_runs[run] = escaped
+    return escaped
+
+
+def _ascii_escape(data):
+    """Aplica o mesmo escape de json.dumps(ensure_ascii=True) à saída UTF-8 do orjson"""
+    if data.isascii() and b'\x7f' not in data:
+        return data
+
+    # Poucos caracteres distintos (acentos) se repetem em toda a resposta: um
+    # replace por caractere. Tirando os bytes ASCII sobram só os caracteres
+    # a escapar, ainda em UTF-8 válido; e o UTF-8 só casa em limites de
+    # caractere, então as trocas não interferem umas nas outras
+    chars = set(data.translate(None, _ASCII_BYTES).decode('utf-8'))
+    if len(chars) > MAX_REPLACED_CHARS:
+        return _NON_ASCII.sub(lambda match: _escaped(match.group(0)), data)
+    for char in chars:
+        encoded = char.encode('utf-8')
+        data = data.replace(encoded, _escaped(encoded))
+    return data
+
+
+def _float_differs(value):
+    # NaN/Infinity viram null no orjson; fora de [1e-4, 1e16) o expoente é escrito de outro jeito
+    return value != value or not (value == 0 or 1e-4 <= abs(value) < 1e16)
+
+
+def _floats_match_stdlib(obj):
+    """Se todos os floats de obj saem no orjson como no json padrão"""
+    if not isinstance(obj, (dict, list, tuple)):
+        return not isinstance(obj, float) or not _float_differs(obj)
+
+    stack = [obj]
+    while stack:
+        container = stack.pop()
+        for value in container.values() if isinstance(container, dict) else container:
+            kind = type(value)
+            if kind is str or kind is int or value is None or kind is bool:
+                continue
+            if isinstance(value, float):
+                if _float_differs(value):
+                    return False
+            elif isinstance(value, (dict, list, tuple)):
+                stack.append(value)
+    return True
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON do Flask baseado em orjson (compatível byte a byte)"""
+
+    def _options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumpb(self, obj):
+        """Serializa para bytes (compacto, como nas respostas)"""
+        if orjson is not None and _floats_match_stdlib(obj):
+            try:
+                data = orjson.dumps(obj, default=self.default, option=self._options())
+            except TypeError:
+                # Chaves não texto, inteiros grandes, subclasses de tupla...
+                pass
+            else:
+                return _ascii_escape(data) if self.ensure_ascii else data
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # Sem separators, mesma saída espaçada do DefaultJSONProvider
+        if orjson is None or kwargs != {'separators': (',', ':')}:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj) + b'\n', mimetype=self.mimetype)
+
+
+def ticket_row_to_dict(row):
+    """Converte uma tupla de TICKET_COLUMNS no mesmo formato de Ticket.to_dict()"""
+    (id, ticket_number, category_id, unit_id, counter_id, status,
+     generated_at, called_at, finished_at, service_time) = row
+    return {
+        'id': id,
+        'ticket_number': ticket_number,
+        'category_id': category_id,
+        'unit_id': unit_id,
+        'counter_id': counter_id,
+        'status': status,
+        'generated_at': generated_at.isoformat() if generated_at else None,
+        'called_at': called_at.isoformat() if called_at else None,
+        'finished_at': finished_at.isoformat() if finished_at else None,
+        'service_time': service_time,
+        'category': reference_cache.get_dict('category', category_id),
+        'counter': reference_cache.get_dict('counter', counter_id)
+    }
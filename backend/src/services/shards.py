@@ -0,0 +1,309 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import click
+from flask import current_app, g, request
+from flask.cli import AppGroup
+from sqlalchemy import MetaData, create_engine, event, text
+from src.models.user import User, db
+from src.models.session import unit_engine
+from src.models.unit import Unit
+from src.services import reference_cache, schema
+from src.services.sql import configure_sqlite
+
+# Um banco SQLite por unidade (modo UNIT_SHARDS).
+#
+# Os dados operacionais de cada unidade (senhas, registro de eventos, esboços
+# de quantis, marca d'água, chaves de idempotência e cursor do nó local)
+# ficam em UNIT_SHARD_DIR/unit-<id>.db; usuários, unidades, categorias,
+# guichês e configurações continuam no banco principal, anexado a cada
+# conexão como "core". Nomes de tabela sem esquema são procurados primeiro no banco da
+# unidade e depois no principal, então as consultas existentes (inclusive
+# junções de senhas com categorias e guichês) funcionam sem alteração, e a
+# escrita de uma unidade não bloqueia as demais.
+#
+# Cada requisição é direcionada (route_request) pela unidade do usuário não
+# admin, pelos ids da URL (unit_id, ticket_id, category_id, counter_id), pelo
+# corpo JSON ou por ?unit_id=. Os ids de senhas e eventos de cada unidade
+# começam em unit_id << ID_BITS, de modo que a unidade sai do próprio id
+# (/tickets/<id>/call). Consultas de várias unidades usam fan_out(), que
+# consulta os bancos em paralelo.
+#
+# Bancos existentes são convertidos com "flask shards migrate".
+
+SHARDED_TABLES = ('tickets', 'ticket_events', 'quantile_buckets', 'unit_watermarks', 'idempotency_keys', 'edge_cursors',
+                  'counter_sessions', 'counter_usage')
+SEQUENCED_TABLES = {'tickets': 'id', 'ticket_events': 'seq'}
+ID_BITS = 32
+CORE_SCHEMA = 'core'
+
+_engines = {}
+_lock = threading.Lock()
+_executor = None
+_shard_metadata = None
+
+
+def is_enabled():
+    return bool(current_app.config.get('UNIT_SHARDS'))
+
+
+def shard_path(unit_id):
+    return os.path.join(current_app.config['UNIT_SHARD_DIR'], f'unit-{int(unit_id)}.db')
+
+
+def unit_for_ticket(ticket_id):
+    """Unidade de uma senha (ou evento) pelo id"""
+    return int(ticket_id) >> ID_BITS
+
+
+def sequenced_metadata():
+    """Cópia do esquema em que senhas e eventos usam AUTOINCREMENT
+
+    Assim a numeração parte do piso gravado em sqlite_sequence
+    (seed_sequences) e nunca volta, mesmo após exclusões.
+    """
+    global _shard_metadata
+    if _shard_metadata is None:
+        metadata = MetaData()
+        for table in db.metadata.sorted_tables:
+            copy = table.to_metadata(metadata)
+            if table.name in SEQUENCED_TABLES:
+                copy.dialect_options['sqlite']['autoincrement'] = True
+        _shard_metadata = metadata
+    return _shard_metadata
+
+
+def seed_sequences(conn, floors):
+    """Garante que os próximos ids de cada tabela ({tabela: piso}) fiquem acima do piso"""
+    for table, floor in floors.items():
+        conn.execute(text(
+            'UPDATE sqlite_sequence SET seq = MAX(seq, :floor) WHERE name = :name'
+        ), {'name': table, 'floor': int(floor)})
+        conn.execute(text(
+            'INSERT INTO sqlite_sequence (name, seq) SELECT :name, :floor '
+            'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)'
+        ), {'name': table, 'floor': int(floor)})
+
+
+def _prepare(path, unit_id):
+    # Sem o banco principal anexado: PRAGMA table_info sem esquema também
+    # procura nos bancos anexados e create_all acharia as tabelas de lá
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        with engine.begin() as conn:
+            schema.upgrade_tables(conn, sequenced_metadata(), SHARDED_TABLES)
+            seed_sequences(conn, {table: int(unit_id) << ID_BITS for table in SEQUENCED_TABLES})
+    finally:
+        engine.dispose()
+
+
+def _create_engine(unit_id):
+    path = shard_path(unit_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _prepare(path, unit_id)
+
+    engine = create_engine(f'sqlite:///{path}')
+    configure_sqlite(engine)
+    core_path = db.engine.url.database
+
+    @event.listens_for(engine, 'connect')
+    def _attach_core(dbapi_connection, connection_record):
+        dbapi_connection.execute(f'ATTACH DATABASE ? AS {CORE_SCHEMA}', (core_path,))
+
+    return engine
+
+
+def engine_for(unit_id):
+    """Engine do banco da unidade (criado e atualizado no primeiro uso)"""
+    unit_id = int(unit_id)
+    engine = _engines.get(unit_id)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(unit_id)
+            if engine is None:
+                engine = _engines[unit_id] = _create_engine(unit_id)
+    return engine
+
+
+@contextmanager
+def for_unit(unit_id):
+    """Instruções do bloco vão para o banco da unidade (sem efeito fora do modo UNIT_SHARDS)"""
+    if not is_enabled() or unit_id is None:
+        yield
+        return
+
+    token = unit_engine.set(engine_for(unit_id))
+    try:
+        yield
+    finally:
+        unit_engine.reset(token)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('UNIT_SHARD_FANOUT_WORKERS', 4),
+                    thread_name_prefix='shard-fanout'
+                )
+    return _executor
+
+
+def fan_out(unit_ids, fn):
+    """Executa fn(unit_id) no banco de cada unidade, em paralelo; retorna {unit_id: resultado}"""
+    app = current_app._get_current_object()
+
+    def run(unit_id):
+        with app.app_context():
+            try:
+                with for_unit(unit_id):
+                    return fn(unit_id)
+            finally:
+                db.session.remove()
+
+    return dict(zip(unit_ids, _get_executor().map(run, unit_ids)))
+
+
+def _reference_unit(kind, key):
+    try:
+        entry = reference_cache.get(kind, int(key))
+    except (TypeError, ValueError):
+        return None
+    return entry.unit_id if entry is not None else None
+
+
+def unit_for_request():
+    """Unidade a que a requisição se refere (None = banco principal)"""
+    token = request.headers.get('Authorization', '')
+    if token.startswith('Bearer '):
+        token = token[7:]
+    payload = User.verify_token(token) if token else None
+    if payload and payload.get('role') != 'admin' and payload.get('unit_id'):
+        return payload['unit_id']
+
+    view_args = request.view_args or {}
+    if 'unit_id' in view_args:
+        return view_args['unit_id']
+    if 'ticket_id' in view_args:
+        return unit_for_ticket(view_args['ticket_id'])
+    for kind in ('category', 'counter'):
+        if f'{kind}_id' in view_args:
+            return _reference_unit(kind, view_args[f'{kind}_id'])
+
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        if data.get('unit_id'):
+            return data['unit_id']
+        for kind in ('category', 'counter'):
+            if data.get(f'{kind}_id'):
+                return _reference_unit(kind, data[f'{kind}_id'])
+
+    return request.args.get('unit_id', type=int)
+
+
+def route_request():
+    """before_request: direciona a sessão para o banco da unidade da requisição"""
+    if not is_enabled():
+        return
+
+    unit_id = unit_for_request()
+    try:
+        unit_id = int(unit_id) if unit_id is not None else None
+    except (TypeError, ValueError):
+        return
+
+    # Só unidades existentes ganham banco próprio
+    if unit_id and reference_cache.get('unit', unit_id) is not None:
+        g.unit_engine_token = unit_engine.set(engine_for(unit_id))
+
+
+def end_request(exc=None):
+    """teardown_request: desfaz o direcionamento de route_request"""
+    token = g.pop('unit_engine_token', None)
+    if token is not None:
+        unit_engine.reset(token)
+
+
+def shard_files():
+    """(unit_id, caminho) dos bancos de unidade existentes"""
+    directory = current_app.config['UNIT_SHARD_DIR']
+    if not os.path.isdir(directory):
+        return []
+
+    files = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('unit-') and name.endswith('.db'):
+            files.append((int(name[5:-3]), os.path.join(directory, name)))
+    return files
+
+
+def _copy_rows(conn, table, unit_id):
+    # Ids de senhas e eventos passam para a faixa da unidade
+    columns = [column.name for column in db.metadata.tables[table].columns]
+    offset = int(unit_id) << ID_BITS
+    shifted = {'tickets': {'id'}, 'ticket_events': {'seq', 'ticket_id'}}.get(table, set())
+    select = [f'{name} + {offset}' if name in shifted else name for name in columns]
+
+    result = conn.execute(
+        f'INSERT INTO main.{table} ({", ".join(columns)}) '
+        f'SELECT {", ".join(select)} FROM {CORE_SCHEMA}.{table} WHERE unit_id = ?',
+        (unit_id,)
+    )
+    conn.execute(f'DELETE FROM {CORE_SCHEMA}.{table} WHERE unit_id = ?', (unit_id,))
+    return result.rowcount
+
+
+def migrate_unit(unit_id):
+    """Move os dados operacionais da unidade do banco principal para o banco dela"""
+    engine = engine_for(unit_id)
+    counts = {}
+    with engine.connect() as connection:
+        conn = connection.connection.driver_connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Chaves de idempotência não têm unidade: expiram no banco principal
+            for table in SHARDED_TABLES:
+                if table != 'idempotency_keys':
+                    counts[table] = _copy_rows(conn, table, unit_id)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    return counts
+
+
+shards_cli = AppGroup('shards', help='Bancos de dados por unidade (UNIT_SHARDS)')
+
+
+@shards_cli.command('migrate')
+def migrate_command():
+    """Move senhas, eventos e agregados do banco principal para os bancos das unidades"""
+    from src.services import backup, report_cache
+
+    if not is_enabled():
+        raise click.ClickException('Ative UNIT_SHARDS antes de migrar')
+
+    snapshot = backup.create_snapshot(backup.PRE_SHARDS_PREFIX)
+    click.echo(f'Fotografia do banco principal: {snapshot["name"]}')
+
+    for (unit_id,) in db.session.query(Unit.id).order_by(Unit.id).all():
+        counts = migrate_unit(unit_id)
+        click.echo(f'Unidade {unit_id}: ' + ', '.join(f'{table} {count}' for table, count in counts.items()))
+    db.session.remove()
+
+    # Ids de senhas mudaram: resultados em disco e em memória deixam de valer
+    report_cache.clear()
+    report_dir = current_app.config['REPORT_CACHE_DIR']
+    if os.path.isdir(report_dir):
+        for name in os.listdir(report_dir):
+            os.remove(os.path.join(report_dir, name))
+
+
+@shards_cli.command('list')
+def list_command():
+    """Lista os bancos de unidade e seus tamanhos"""
+    for unit_id, path in shard_files():
+        click.echo(f'unidade {unit_id}\t{os.path.getsize(path)} bytes\t{path}')
@@ -0,0 +1,31 @@
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+
+# Utilitários de SQL compartilhados pelas rotas e serviços.
+
+
+def insert_for_dialect():
+    """Retorna o insert com suporte a ON CONFLICT do banco em uso"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql_insert
+    return sqlite_insert
+
+
+def configure_sqlite(engine):
+    """Ativa WAL no SQLite: leituras longas (relatórios) não bloqueiam as escritas de senhas"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Primeiro: com o arquivo bloqueado, os pragmas seguintes esperam em vez de falhar
+        cursor.execute('PRAGMA busy_timeout=5000')
+        # Só tem efeito em bancos novos; bancos existentes são convertidos com
+        # "flask maintenance enable-incremental-vacuum"
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
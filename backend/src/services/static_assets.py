@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import click
+from flask import current_app, request, send_file
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # dependência opcional
+    brotli = None
+
+# Arquivos estáticos do frontend (build do Vite) servidos a partir de um manifesto.
+#
+# Na primeira requisição o diretório estático é percorrido uma vez: cada
+# arquivo recebe um ETag forte (hash do conteúdo) e a lista das variantes
+# pré-comprimidas (.br/.gz) existentes ao lado dele. Depois disso:
+#   - caminhos inexistentes caem no index.html (rotas do SPA) sem consultar o disco;
+#   - If-None-Match é respondido com 304 só com o manifesto;
+#   - arquivos com hash no nome (assets/index-a1B2c3D4.js) vão com
+#     Cache-Control immutable por um ano; os demais (index.html, favicon)
+#     com no-cache, revalidados pelo ETag.
+#
+# As variantes são geradas por "flask assets compress" (executado por
+# start_backend.sh), que só recomprime arquivos alterados. Em modo debug o
+# manifesto é refeito a cada requisição, acompanhando rebuilds do frontend.
+
+COMPRESSIBLE_EXTENSIONS = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.txt', '.map', '.ico', '.xml', '.webmanifest'}
+VARIANT_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Nomes gerados pelo Vite: <nome>-<hash de 8+ caracteres>.<extensão>
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Variantes menores que isso (ou que economizam pouco) não são geradas
+MIN_COMPRESS_SIZE = 512
+MIN_COMPRESS_RATIO = 0.9
+
+_manifests = {}
+_lock = threading.Lock()
+
+
+def _file_hash(path):
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_variant(name):
+    return any(name.endswith(suffix) for suffix in VARIANT_SUFFIXES.values())
+
+
+def _walk(root):
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not _is_variant(name):
+                full_path = os.path.join(directory, name)
+                yield os.path.relpath(full_path, root).replace(os.sep, '/'), full_path
+
+
+def build_manifest(root):
+    """Mapa caminho relativo -> ETag, tipo, política de cache e variantes comprimidas"""
+    manifest = {}
+    for rel_path, full_path in _walk(root):
+        mtime = os.path.getmtime(full_path)
+        variants = {}
+        for encoding, suffix in VARIANT_SUFFIXES.items():
+            variant_path = full_path + suffix
+            # Variante mais antiga que o original é de um build anterior
+            if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= mtime:
+                variants[encoding] = variant_path
+
+        mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+        manifest[rel_path] = {
+            'path': full_path,
+            'etag': _file_hash(full_path),
+            'mimetype': mimetype,
+            'immutable': HASHED_NAME.search(rel_path) is not None,
+            'variants': variants
+        }
+    return manifest
+
+
+def get_manifest(app):
+    root = app.static_folder
+    if app.debug:
+        return build_manifest(root)
+
+    manifest = _manifests.get(root)
+    if manifest is None:
+        with _lock:
+            manifest = _manifests.get(root)
+            if manifest is None:
+                manifest = build_manifest(root)
+                _manifests[root] = manifest
+    return manifest
+
+
+def clear():
+    """Descarta os manifestos (após trocar o build do frontend sem reiniciar)"""
+    _manifests.clear()
+
+
+def _choose_variant(entry):
+    encodings = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in entry['variants'] and encodings[encoding]:
+            return encoding
+    return None
+
+
+def serve(path):
+    """Resposta para o caminho do frontend (cai no index.html para rotas do SPA)"""
+    app = current_app._get_current_object()
+    manifest = get_manifest(app)
+
+    entry = manifest.get(path) or manifest.get('index.html')
+    if entry is None:
+        return "index.html not found", 404
+
+    encoding = _choose_variant(entry)
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+    cache_control = IMMUTABLE_CACHE_CONTROL if entry['immutable'] else REVALIDATE_CACHE_CONTROL
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = send_file(
+            entry['variants'][encoding] if encoding else entry['path'],
+            mimetype=entry['mimetype'], etag=False, conditional=False, max_age=None
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    if entry['variants']:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def _compress_file(full_path, encoding, data):
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+    if len(compressed) > len(data) * MIN_COMPRESS_RATIO:
+        return False
+
+    # Escrita atômica: um worker nunca enxerga a variante pela metade
+    variant_path = full_path + VARIANT_SUFFIXES[encoding]
+    with open(variant_path + '.tmp', 'wb') as f:
+        f.write(compressed)
+    os.replace(variant_path + '.tmp', variant_path)
+    return True
+
+
+def compress_assets(root, force=False):
+    """Gera as variantes .br/.gz que faltam ou estão desatualizadas; retorna (geradas, atuais)"""
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    written = unchanged = 0
+
+    for rel_path, full_path in _walk(root):
+        if os.path.splitext(rel_path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        if os.path.getsize(full_path) < MIN_COMPRESS_SIZE:
+            continue
+
+        mtime = os.path.getmtime(full_path)
+        data = None
+        for encoding in encodings:
+            variant_path = full_path + VARIANT_SUFFIXES[encoding]
+            if not force and os.path.exists(variant_path) and os.path.getmtime(variant_path) >= mtime:
+                unchanged += 1
+                continue
+
+            if data is None:
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+            if _compress_file(full_path, encoding, data):
+                written += 1
+
+    clear()
+    return written, unchanged
+
+
+assets_cli = AppGroup('assets', help='Arquivos estáticos do frontend')
+
+
+@assets_cli.command('compress')
+@click.option('--force', is_flag=True, help='Recomprime mesmo os arquivos sem alteração')
+def compress_command(force):
+    """Gera as variantes .br/.gz dos arquivos estáticos (idempotente)"""
+    root = current_app.static_folder
+    written, unchanged = compress_assets(root, force=force)
+    if brotli is None:
+        click.echo('brotli não instalado: apenas variantes gzip')
+    click.echo(f'{written} variantes geradas, {unchanged} já atualizadas em {root}')
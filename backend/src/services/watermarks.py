@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from src.models.user import db
+from src.models.session import read_engine
+from src.models.unit_watermark import UnitWatermark
+from src.services.sql import insert_for_dialect
+
+# Marca d'água de dados por unidade.
+#
+# Toda alteração de senhas chama bump() na mesma transação; caches de
+# relatórios usam a versão como parte da chave, de modo que qualquer mudança
+# na unidade torna os resultados anteriores obsoletos. history_version só
+# muda quando a senha alterada foi gerada em um dia já encerrado, permitindo
+# manter por tempo indeterminado os resultados de períodos fechados.
+#
+# snapshot() guarda as versões em memória por até max_age segundos para que
+# acertos de cache não precisem consultar o banco; bump() descarta a cópia
+# local da unidade imediatamente. As cópias são separadas por origem (banco
+# principal ou réplica, ver services/replica): um resultado calculado na
+# réplica é sempre marcado com a versão que a própria réplica enxerga. No
+# máximo MAX_SNAPSHOTS cópias ficam em memória (LRU).
+
+MAX_SNAPSHOTS = 2048
+
+_lock = threading.Lock()
+_snapshots = OrderedDict()
+
+
+def bump(unit_id, generated_at=None):
+    """Incrementa a versão dos dados da unidade (confirmado junto com a transação atual)"""
+    unit_id = int(unit_id)
+    now = datetime.utcnow()
+    closed_day = generated_at is not None and generated_at.date() < datetime.now().date()
+
+    values = {'version': UnitWatermark.version + 1, 'updated_at': now}
+    if closed_day:
+        values['history_version'] = UnitWatermark.history_version + 1
+
+    stmt = insert_for_dialect()(UnitWatermark).values(
+        unit_id=unit_id, version=1, history_version=1 if closed_day else 0, updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=['unit_id'], set_=values)
+    db.session.execute(stmt)
+
+    with _lock:
+        _snapshots.pop((unit_id, False), None)
+        _snapshots.pop((unit_id, True), None)
+
+
+def current(unit_id):
+    """Versão atual dos dados da unidade (0 se nunca houve alteração)"""
+    return snapshot(unit_id)[0]
+
+
+def snapshot(unit_id, max_age=0):
+    """Retorna (version, history_version), usando a cópia local se tiver menos de max_age segundos"""
+    unit_id = int(unit_id)
+    key = (unit_id, read_engine.get() is not None)
+    now = time.monotonic()
+
+    cached = _snapshots.get(key)
+    if cached is not None and now - cached[0] < max_age:
+        with _lock:
+            if key in _snapshots:
+                _snapshots.move_to_end(key)
+        return cached[1]
+
+    row = db.session.query(UnitWatermark.version, UnitWatermark.history_version).filter(
+        UnitWatermark.unit_id == unit_id
+    ).first()
+    versions = (row[0], row[1]) if row else (0, 0)
+
+    with _lock:
+        _snapshots[key] = (now, versions)
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return versions
@@ -0,0 +1,114 @@
+import gzip
+import json
+from flask import current_app, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # dependência opcional
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # dependência opcional
+    brotli = None
+
+# Formato compacto para painéis e atendentes em redes lentas.
+#
+# O cliente escolhe a representação pelo cabeçalho Accept (ou ?format=):
+#   application/json                  -> resposta original (padrão)
+#   application/vnd.painel.compact+json -> payload normalizado em JSON
+#   application/msgpack               -> payload normalizado em MessagePack
+#
+# No payload normalizado cada senha traz apenas category_id/counter_id e os
+# objetos completos aparecem uma única vez nos dicionários "categories" e
+# "counters", indexados pelo id. A compressão (br/gzip) segue Accept-Encoding.
+
+COMPACT_MIMETYPE = 'application/vnd.painel.compact+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Respostas menores que isso não compensam o custo de compressão
+MIN_COMPRESS_SIZE = 512
+
+
+def _requested_format():
+    fmt = request.args.get('format')
+    if fmt in ('compact', 'msgpack'):
+        return fmt
+
+    accept = request.accept_mimetypes
+    if msgpack is not None and accept.quality(MSGPACK_MIMETYPE) > accept.quality('application/json'):
+        return 'msgpack'
+    if accept.quality(COMPACT_MIMETYPE) > accept.quality('application/json'):
+        return 'compact'
+    return 'json'
+
+
+def _compact_ticket(ticket, categories, counters):
+    if ticket is None:
+        return None
+
+    compact = dict(ticket)
+    category = compact.pop('category', None)
+    counter = compact.pop('counter', None)
+    if category:
+        categories[str(category['id'])] = category
+    if counter:
+        counters[str(counter['id'])] = counter
+    return compact
+
+
+def compact_payload(payload):
+    """Normaliza as senhas do payload, referenciando categorias e guichês pelo id"""
+    categories = {}
+    counters = {}
+
+    if isinstance(payload, list):
+        result = {'tickets': [_compact_ticket(t, categories, counters) for t in payload]}
+    else:
+        result = {}
+        for key, value in payload.items():
+            if key.endswith('_tickets') or key == 'tickets':
+                result[key] = [_compact_ticket(t, categories, counters) for t in value]
+            elif key.endswith('_ticket') or key == 'ticket':
+                result[key] = _compact_ticket(value, categories, counters)
+            else:
+                result[key] = value
+
+    result['categories'] = categories
+    result['counters'] = counters
+    return result
+
+
+def _compress(response):
+    if response.direct_passthrough or len(response.get_data()) < MIN_COMPRESS_SIZE:
+        return response
+
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br']:
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif encodings['gzip']:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def respond(payload, status=200):
+    """Serializa o payload no formato negociado com o cliente"""
+    fmt = _requested_format()
+
+    if fmt == 'json':
+        response = jsonify(payload)
+    elif fmt == 'msgpack' and msgpack is not None:
+        response = current_app.response_class(
+            msgpack.packb(compact_payload(payload), use_bin_type=True),
+            mimetype=MSGPACK_MIMETYPE
+        )
+    else:
+        body = json.dumps(compact_payload(payload), ensure_ascii=False, separators=(',', ':'))
+        response = current_app.response_class(body.encode('utf-8'), mimetype=COMPACT_MIMETYPE)
+
+    response.status_code = status
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return _compress(response)
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+# Banco padrão apontado para um arquivo descartável antes de importar a aplicação
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app  # noqa: E402
+from src.models.user import User, db  # noqa: E402
+from src.services import reference_cache  # noqa: E402
+from src.services.bootstrap import init_database  # noqa: E402
+
+
+@pytest.fixture
+def extra_config():
+    # Sobrescrito (ou parametrizado) pelos testes que precisam de outra configuração
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, extra_config):
+    database = tmp_path / 'database'
+    database.mkdir()
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{database / 'app.db'}",
+        'REFERENCE_CACHE_VERSION_FILE': str(database / 'reference.version'),
+        'REPORT_CACHE_DIR': str(database / 'report_cache'),
+        'BACKUP_DIR': str(database / 'backups'),
+        'MAINTENANCE_STAMP_FILE': str(database / 'maintenance.stamp'),
+        'MAINTENANCE_RUNS_FILE': str(database / 'maintenance.runs.jsonl'),
+        'REPLICA_SNAPSHOT_PATH': str(database / 'replica.db'),
+        'UNIT_SHARD_DIR': str(database / 'units'),
+        'ANNOUNCEMENT_RECORDINGS_DIR': str(database / 'announcements' / 'recordings'),
+        'ANNOUNCEMENT_CACHE_DIR': str(database / 'announcements' / 'cache'),
+        **extra_config,
+    })
+    with app.app_context():
+        init_database()
+        # Os caches de referência são do processo: descarta o que veio de outro banco
+        reference_cache.invalidate()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(app):
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').first()
+        return {'Authorization': f'Bearer {admin.generate_token()}'}
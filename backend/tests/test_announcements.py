@@ -0,0 +1,54 @@
+import os
+import wave
+
+import pytest
+
+from src.services import announcements
+
+TTS_CALLS = []
+
+
+@pytest.fixture
+def recordings(app, monkeypatch):
+    # Gravações só para parte dos trechos; o TTS "configurado" registra as chamadas
+    directory = app.config['ANNOUNCEMENT_RECORDINGS_DIR']
+    os.makedirs(directory)
+    for segment in ('senha', 'letra-N', 'numero-15', 'guiche-1'):
+        with wave.open(os.path.join(directory, f'{segment}.wav'), 'wb') as clip:
+            clip.setnchannels(1)
+            clip.setsampwidth(2)
+            clip.setframerate(8000)
+            clip.writeframes(b'\x00\x00' * 80)
+
+    app.config['ANNOUNCEMENT_TTS_COMMAND'] = 'tts {output} {text}'
+    TTS_CALLS.clear()
+    monkeypatch.setattr(announcements, '_render_segment', lambda segment, text, path: TTS_CALLS.append(segment))
+    return directory
+
+
+def test_prerendered_announcement_is_served(client, recordings):
+    response = client.get('/api/announcements/N015/1.wav')
+    assert response.status_code == 200
+    assert response.mimetype == 'audio/wav'
+
+
+def test_numbers_above_max_are_rejected(client, recordings):
+    assert client.get('/api/announcements/N1000/1.wav').status_code == 404
+    assert announcements.parse('N1000') is None
+    assert TTS_CALLS == []
+
+
+def test_missing_segment_is_not_synthesized_in_the_request(client, recordings):
+    assert client.get('/api/announcements/N016/1.wav').status_code == 404
+    assert TTS_CALLS == []
+
+
+def test_enabled_is_computed_once(app, recordings, monkeypatch):
+    calls = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: calls.append(path) or listdir(path))
+    app.config['ANNOUNCEMENT_TTS_COMMAND'] = None
+    with app.app_context():
+        assert announcements.is_enabled()
+        assert announcements.is_enabled()
+    assert len(calls) == 1
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from src.routes import auth
+from src.services import passwords
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters():
+    # Os limitadores são do processo e guardam a configuração do primeiro uso
+    auth._login_limiters.clear()
+    yield
+    auth._login_limiters.clear()
+
+
+def _login(client, username, ip):
+    return client.post('/api/auth/login', json={'username': username, 'password': 'errada'},
+                       headers={'X-Forwarded-For': ip})
+
+
+@pytest.mark.parametrize('extra_config', [{'TRUSTED_PROXY_HOPS': 1}])
+def test_ip_limit_uses_forwarded_client_address(app, client):
+    app.config['LOGIN_RATE_LIMIT_IP'] = (3, 60)
+
+    for attempt in range(3):
+        assert _login(client, f'usuario{attempt}', '203.0.113.10').status_code == 401
+    assert _login(client, 'outro', '203.0.113.10').status_code == 429
+
+    # Outro cliente atrás do mesmo proxy não é bloqueado
+    assert _login(client, 'outro', '203.0.113.20').status_code == 401
+
+
+def test_forwarded_address_is_ignored_without_proxy(app, client):
+    app.config['LOGIN_RATE_LIMIT_IP'] = (3, 60)
+
+    # Acesso direto: um X-Forwarded-For diferente a cada tentativa não escapa do limite
+    for attempt in range(3):
+        assert _login(client, f'usuario{attempt}', f'203.0.113.{attempt}').status_code == 401
+    assert _login(client, 'outro', '203.0.113.99').status_code == 429
+
+
+def test_slow_verification_returns_503(app, client, monkeypatch):
+    monkeypatch.setattr(passwords, 'VERIFY_TIMEOUT', 0.05)
+    monkeypatch.setattr(passwords, 'check_password_hash', lambda password_hash, password: time.sleep(0.5))
+
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
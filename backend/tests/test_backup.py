@@ -0,0 +1,50 @@
+import os
+from datetime import datetime
+
+from src.services import backup
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 3, 4, 12, 0, 0, 123456)
+
+
+def test_snapshots_in_the_same_instant_get_distinct_names(app, monkeypatch):
+    monkeypatch.setattr(backup, 'datetime', _FrozenDatetime)
+    with app.app_context():
+        names = [backup.create_snapshot()['name'] for _ in range(3)]
+        assert names == [
+            'app-20240304-120000-123456.db',
+            'app-20240304-120000-123456-1.db',
+            'app-20240304-120000-123456-2.db',
+        ]
+        # Nenhum temporário sobra no diretório
+        assert sorted(os.listdir(backup.backup_dir())) == sorted(names)
+
+
+def test_rotate_keeps_newest_of_each_prefix(app):
+    with app.app_context():
+        created = {
+            prefix: [backup.create_snapshot(prefix)['name'] for _ in range(3)]
+            for prefix in backup.ROTATED_PREFIXES
+        }
+        removed = backup.rotate(keep=2)
+
+        assert sorted(removed) == sorted(names[0] for names in created.values())
+        for prefix, names in created.items():
+            assert [s['name'] for s in backup.list_snapshots(prefix)] == names[:0:-1]
+
+
+def test_rotate_orders_collisions_after_the_base_name(app, monkeypatch):
+    monkeypatch.setattr(backup, 'datetime', _FrozenDatetime)
+    with app.app_context():
+        names = [backup.create_snapshot()['name'] for _ in range(3)]
+        legacy = 'app-20240304-115959.db'
+        open(os.path.join(backup.backup_dir(), legacy), 'w').close()
+
+        # Pela ordem alfabética, 'app-...-123456-1.db' viria antes de 'app-...-123456.db'
+        assert [s['name'] for s in backup.list_snapshots()] == names[::-1] + [legacy]
+
+        assert backup.rotate(keep=2) == [names[0], legacy]
+        assert [s['name'] for s in backup.list_snapshots()] == names[:0:-1]
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from src.models.counter import Counter
+from src.models.counter_usage import CounterUsage
+from src.models.ticket import Ticket
+from src.models.user import User, db
+from src.services import counter_usage
+
+
+def _finished_ticket(called_at, finished_at):
+    return Ticket(ticket_number='N001', category_id=1, unit_id=1, counter_id=1, status='finished',
+                  generated_at=called_at, called_at=called_at, finished_at=finished_at)
+
+
+def test_service_without_open_session_is_not_counted(app):
+    with app.app_context():
+        finished_at = datetime.utcnow()
+        counter_usage.record_service(_finished_ticket(finished_at - timedelta(minutes=5), finished_at))
+        db.session.commit()
+        assert CounterUsage.query.count() == 0
+
+
+def test_busy_time_is_limited_to_the_session(app):
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').first()
+        session = counter_usage.open_session(Counter.query.get(1), admin.id)
+        opened_at = session.opened_at
+
+        # Chamada 10 minutos antes da abertura da sessão: só o trecho dentro dela é ocupado
+        ticket = _finished_ticket(opened_at - timedelta(minutes=10), opened_at + timedelta(seconds=30))
+        counter_usage.record_service(ticket)
+        db.session.commit()
+
+        rows = CounterUsage.query.all()
+        assert {row.user_id for row in rows} == {admin.id}
+        assert sum(row.busy_seconds for row in rows) == 30
+        assert sum(row.tickets for row in rows) == 1
+
+        report = counter_usage.utilization(1, opened_at.date(), opened_at.date(),
+                                           now=opened_at + timedelta(seconds=10))
+        assert report['total']['busy_seconds'] == 30
+        assert report['total']['utilization'] == 1.0
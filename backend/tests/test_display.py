@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from src.services import display_snapshots, long_poll, watermarks
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphore():
+    # As vagas são do processo: cada teste parte do limite configurado
+    long_poll._semaphore = None
+    yield
+    long_poll._semaphore = None
+
+
+def _etag(client):
+    response = client.get('/api/display/wall?units=1')
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_wall_waits_for_change_when_slot_is_free(client):
+    etag = _etag(client)
+    start = time.monotonic()
+    response = client.get('/api/display/wall?units=1&wait=1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert time.monotonic() - start >= 0.9
+
+
+def test_wall_answers_at_once_when_slots_are_taken(app, client):
+    etag = _etag(client)
+    with app.app_context():
+        semaphore = long_poll._get_semaphore()
+    for _ in range(app.config['LONG_POLL_MAX_WAITERS']):
+        assert semaphore.acquire(blocking=False)
+
+    start = time.monotonic()
+    response = client.get('/api/display/wall?units=1&wait=5', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert time.monotonic() - start < 1
+
+
+def test_wait_is_capped(app):
+    with app.app_context():
+        assert long_poll.max_wait(25) == app.config['LONG_POLL_MAX_WAIT']
+        assert long_poll.max_wait(-1) == 0
+
+
+def test_current_display_rejects_unknown_units(client):
+    assert client.get('/api/tickets/current-display?unit_id=abc').status_code == 400
+    assert client.get('/api/tickets/current-display?unit_id=999').status_code == 404
+    assert 999 not in display_snapshots._snapshots
+    assert client.get('/api/tickets/current-display?unit_id=1').status_code == 200
+
+
+def test_snapshot_caches_are_bounded(app, monkeypatch):
+    monkeypatch.setattr(display_snapshots, 'MAX_SNAPSHOTS', 2)
+    monkeypatch.setattr(watermarks, 'MAX_SNAPSHOTS', 2)
+    with app.app_context():
+        for unit_id in range(1, 6):
+            display_snapshots.unit_snapshot(unit_id)
+        assert list(display_snapshots._snapshots) == [4, 5]
+        assert len(watermarks._snapshots) == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from src.models.counter import Counter
+from src.models.user import User, db
+from src.services import edge
+
+CENTRAL = {'UNIT_SHARDS': True, 'EDGE_SYNC_SECRET': 'segredo-central'}
+
+
+@pytest.mark.parametrize('extra_config', [CENTRAL])
+def test_token_only_opens_its_own_unit(app, client):
+    with app.app_context():
+        token_unit_1 = edge.unit_token(1)
+        token_unit_2 = edge.unit_token(2)
+
+    assert client.get('/api/sync/units/1/reference', headers={'X-Sync-Token': token_unit_2}).status_code == 401
+    assert client.get('/api/sync/units/1/reference', headers={'X-Sync-Token': 'segredo-central'}).status_code == 401
+    response = client.get('/api/sync/units/1/reference', headers={'X-Sync-Token': token_unit_1})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('extra_config', [CENTRAL])
+def test_reference_payload_has_no_global_admins(app):
+    with app.app_context():
+        for username, unit_id in (('geral', None), ('gerente2', 2)):
+            user = User(username=username, email=f'{username}@exemplo', role='admin', unit_id=unit_id)
+            user.set_password('x')
+            db.session.add(user)
+        db.session.commit()
+
+        # Só o administrador vinculado à unidade 1 (o do cadastro inicial)
+        users = edge.reference_payload(1)['users']
+        assert [user['username'] for user in users] == ['admin']
+
+
+def test_pull_reference_deactivates_what_the_central_no_longer_sends(app, monkeypatch):
+    with app.app_context():
+        payload = edge.reference_payload(1)
+        payload['counters'] = [row for row in payload['counters'] if row['id'] == 1]
+        payload['users'] = []
+        monkeypatch.setattr(edge, '_request', lambda method, path, payload_=None: payload)
+        app.config['EDGE_UNIT_ID'] = 1
+
+        edge.pull_reference()
+
+        assert {counter.id: counter.is_active for counter in Counter.query.all()} == {1: True, 2: False, 3: False}
+        assert not User.query.filter_by(username='admin').one().is_active
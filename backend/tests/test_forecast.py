@@ -0,0 +1,46 @@
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src.models.ticket import Ticket
+from src.models.user import db
+from src.services import forecast
+
+np = pytest.importorskip('numpy')
+
+
+def _ticket(number, generated_at):
+    db.session.add(Ticket(ticket_number=number, category_id=1, unit_id=1, status='finished', generated_at=generated_at))
+
+
+def test_arrivals_are_bucketed_in_local_time(app):
+    with app.app_context():
+        # Segunda 2024-03-04 02:30 UTC = domingo 2024-03-03 23:30 em São Paulo (UTC-3)
+        _ticket('N001', datetime(2024, 3, 4, 2, 30))
+        _ticket('N002', datetime(2024, 3, 4, 12, 0))
+        _ticket('N003', datetime(2024, 3, 4, 12, 7))
+        db.session.commit()
+
+        start_day = date(2024, 3, 3)
+        local = forecast.arrival_counts([1], start_day, date(2024, 3, 4), ZoneInfo('America/Sao_Paulo'))
+        assert local[0, 0, 23 * 4 + 2] == 1
+        # Minutos diferentes do mesmo intervalo somam
+        assert local[0, 1, 9 * 4] == 2
+        assert local.sum() == 3
+
+        utc = forecast.arrival_counts([1], start_day, date(2024, 3, 4), timezone.utc)
+        assert utc[0, 1, 2 * 4 + 2] == 1
+        assert utc[0, 1, 12 * 4] == 2
+
+
+@pytest.fixture
+def extra_config():
+    # Espera o job terminar para que a rota responda 200 direto
+    return {'REPORT_JOB_WAIT': 30}
+
+
+def test_forecast_reports_timezone(app, client, admin_headers):
+    response = client.get('/api/reports/forecast?unit_id=1&weeks=1', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['history']['timezone'] == app.config['LOCAL_TIMEZONE']
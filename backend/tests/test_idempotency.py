@@ -0,0 +1,44 @@
+import threading
+import uuid
+
+from src.models.ticket import Ticket
+
+THREADS = 10
+
+
+def test_concurrent_duplicates_create_one_ticket(app, admin_headers):
+    headers = {**admin_headers, 'Idempotency-Key': str(uuid.uuid4())}
+    barrier = threading.Barrier(THREADS)
+    responses = [None] * THREADS
+
+    def send(index):
+        client = app.test_client()
+        barrier.wait()
+        responses[index] = client.post('/api/tickets/generate', headers=headers, json={'category_id': 1})
+
+    threads = [threading.Thread(target=send, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [201] * THREADS
+
+    # Uma resposta original; as demais são a mesma resposta repetida
+    original = [response for response in responses if 'Idempotent-Replayed' not in response.headers]
+    replayed = [response for response in responses if response.headers.get('Idempotent-Replayed') == 'true']
+    assert len(original) == 1
+    assert len(replayed) == THREADS - 1
+    assert {response.get_data() for response in responses} == {original[0].get_data()}
+
+    with app.app_context():
+        assert Ticket.query.count() == 1
+        assert Ticket.query.one().id == original[0].get_json()['ticket']['id']
+
+
+def test_same_key_with_other_data_is_rejected(client, admin_headers):
+    headers = {**admin_headers, 'Idempotency-Key': str(uuid.uuid4())}
+    assert client.post('/api/tickets/generate', headers=headers, json={'category_id': 1}).status_code == 201
+
+    response = client.post('/api/tickets/generate', headers=headers, json={'category_id': 2})
+    assert response.status_code == 422
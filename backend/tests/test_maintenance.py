@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from src.services import maintenance, shards
+
+
+def test_runs_are_read_from_the_shared_file(app, client, admin_headers):
+    with app.app_context():
+        report = maintenance.run(('quick_check',))
+
+    # Outro worker não tem nada em memória: o estado vem do arquivo
+    response = client.get('/api/maintenance', headers=admin_headers)
+    assert response.status_code == 200
+    runs = response.get_json()['runs']
+    assert [run['started_at'] for run in runs] == [report['started_at']]
+    assert runs[0]['tasks'][0]['task'] == 'quick_check'
+    assert 'probes_before' in runs[0] and 'probes_after' in runs[0]
+
+
+def test_runs_file_is_trimmed(app, monkeypatch):
+    monkeypatch.setattr(maintenance, 'MAX_RUNS', 3)
+    with app.app_context():
+        for _ in range(7):
+            maintenance.run(('quick_check',))
+        assert len(maintenance.recent_runs()) == 3
+        with open(app.config['MAINTENANCE_RUNS_FILE']) as f:
+            assert len(f.readlines()) <= 6
+
+
+def test_manual_run_is_refused_while_another_is_running(app, client, admin_headers):
+    with app.app_context():
+        assert maintenance.acquire_run_lock()
+
+    response = client.post('/api/maintenance/run', json={'tasks': ['quick_check']}, headers=admin_headers)
+    assert response.status_code == 409
+
+    with app.app_context():
+        maintenance.release_run_lock()
+
+    response = client.post('/api/maintenance/run', json={'tasks': ['quick_check']}, headers=admin_headers)
+    assert response.status_code == 202
+
+    # A trava é liberada quando a execução em segundo plano termina
+    lock_path = f"{app.config['MAINTENANCE_STAMP_FILE']}.lock"
+    deadline = time.monotonic() + 30
+    while os.path.exists(lock_path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(lock_path)
+
+
+@pytest.mark.parametrize('extra_config', [{'UNIT_SHARDS': True}])
+def test_unit_shards_are_maintained(app, monkeypatch):
+    # Engines de unidade são do processo: cria o banco da unidade neste diretório
+    monkeypatch.setattr(shards, '_engines', {})
+    with app.app_context():
+        shards.engine_for(1)
+        report = maintenance.run(('quick_check',))
+
+    assert [(task['task'], task['database']) for task in report['tasks']] == [
+        ('quick_check', 'app.db'), ('quick_check', 'unit-1.db')
+    ]
+    assert all(task['ok'] for task in report['tasks'])
@@ -0,0 +1,29 @@
+from src.services import reference_cache
+
+
+def test_concurrent_invalidations_get_distinct_versions(app, monkeypatch):
+    with app.app_context():
+        before = reference_cache._version
+        reference_cache.invalidate()
+        first = reference_cache._version
+
+        # Outro worker que leu o mesmo arquivo antes da primeira gravação
+        monkeypatch.setattr(reference_cache, '_version', before)
+        path = app.config['REFERENCE_CACHE_VERSION_FILE']
+        monkeypatch.setattr(reference_cache, '_read_shared_version', lambda p: before)
+        reference_cache.invalidate()
+        second = reference_cache._version
+
+        assert first != second
+        assert first > before and second > before
+        assert int(open(path).read()) == second
+
+
+def test_entries_are_capped(app, monkeypatch):
+    monkeypatch.setattr(reference_cache, 'MAX_ENTRIES', 10)
+    with app.app_context():
+        for unit_id in range(1000, 1050):
+            assert reference_cache.get('display_settings', unit_id) is None
+        assert len(reference_cache._entries) == 10
+        # O registro existente continua sendo encontrado
+        assert reference_cache.get('unit', 1).id == 1
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from src.services import report_cache, report_jobs
+
+
+def _write(report, unit_id, params, version, age):
+    job_id = report_jobs.job_key(report, unit_id, params, version)
+    job = report_jobs.Job(job_id, report, unit_id, params, status='done')
+    report_jobs._last_evict = 0.0
+    report_jobs._write_result(job, {'version': version})
+    path = report_jobs._result_path(job_id)
+    os.utime(path, (time.time() - age, time.time() - age))
+    return job_id
+
+
+def test_superseded_versions_are_evicted(app):
+    with app.app_context():
+        old = _write('period', 1, {'day': 1}, 'v1', age=3600)
+        recent = _write('period', 1, {'day': 1}, 'v2', age=60)
+        other = _write('period', 1, {'day': 2}, 'v1', age=3600)
+        newest = _write('period', 1, {'day': 1}, 'v3', age=0)
+
+        assert report_jobs.get_result(old) is None
+        # Versão superada há pouco continua disponível para quem a está baixando
+        assert report_jobs.get_result(recent) == {'version': 'v2'}
+        assert report_jobs.get_result(other) == {'version': 'v1'}
+        assert report_jobs.get_result(newest) == {'version': 'v3'}
+
+
+def test_old_and_excess_results_are_evicted(app):
+    app.config['REPORT_CACHE_MAX_AGE_HOURS'] = 1
+    with app.app_context():
+        expired = _write('export', 1, {'n': 1}, 'v1', age=2 * 3600)
+        kept = _write('export', 1, {'n': 2}, 'v1', age=0)
+        assert report_jobs.get_result(expired) is None
+        assert report_jobs.get_result(kept) is not None
+
+        app.config['REPORT_CACHE_MAX_MB'] = 0
+        report_jobs._last_evict = 0.0
+        report_jobs._evict()
+        assert os.listdir(app.config['REPORT_CACHE_DIR']) == []
+
+
+@pytest.mark.parametrize('extra_config', [{'REPORT_JOB_WAIT': 0}])
+def test_report_miss_returns_job_then_cached_result(app, client, admin_headers):
+    report_cache._results.clear()
+    url = '/api/reports/period?unit_id=1&start_date=2024-01-01&end_date=2024-01-31'
+
+    response = client.get(url, headers=admin_headers)
+    assert response.status_code == 202
+    job = response.get_json()['job']
+    assert response.headers['Location'] == f"/api/reports/jobs/{job['id']}"
+
+    assert report_jobs.get_job(job['id']).wait(30)
+    result = client.get(f"/api/reports/jobs/{job['id']}/result", headers=admin_headers)
+    assert result.status_code == 200
+
+    # O resultado do job também responde direto às próximas requisições
+    app.config['REPORT_JOB_WAIT'] = 30
+    assert client.get(url, headers=admin_headers).get_json() == result.get_json()
+    with app.app_context():
+        assert report_cache.lookup('period', 1, {'start_date': '2024-01-01', 'end_date': '2024-01-31'}, closed=True)
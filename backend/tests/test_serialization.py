@@ -0,0 +1,38 @@
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from src.services.serialization import FastJSONProvider
+
+CASES = [
+    {'b': 1, 'a': [1, 2.5, None, True], 'texto': 'Guichê 01 – São Paulo ✓ 😀'},
+    {'pequeno': 1e-07, 'grande': 1e16, 'normal': 0.0001, 'zero': -0.0},
+    {'nan': math.nan, 'inf': math.inf, 'menos_inf': -math.inf},
+    {2: 'dois', 10: 'dez', 1: 'um'},
+    {'enorme': 2 ** 70, 'limite': -2 ** 63},
+    {'quando': datetime(2026, 10, 19, 13, 0), 'dia': date(2026, 10, 19), 'valor': Decimal('1.10')},
+    [('tupla', 1), []],
+]
+
+
+@pytest.mark.parametrize('obj', CASES)
+def test_matches_default_provider(app, obj):
+    fast = FastJSONProvider(app)
+    stock = DefaultJSONProvider(app)
+    with app.test_request_context():
+        assert fast.response(obj).get_data() == stock.response(obj).get_data()
+        assert fast.dumps(obj) == stock.dumps(obj)
+        assert fast.dumps(obj, separators=(',', ':')) == stock.dumps(obj, separators=(',', ':'))
+
+
+def test_escapes_many_distinct_non_ascii_characters(app):
+    obj = {'nomes': [f'Guichê {chr(0xe0 + n % 32)}{n}' for n in range(200)] + ['😀 ação', 'ação', '\x7f']}
+    obj['muitos'] = ''.join(chr(code) for code in range(0x100, 0x300))
+    fast = FastJSONProvider(app)
+    stock = DefaultJSONProvider(app)
+    with app.test_request_context():
+        assert fast.response(obj).get_data() == stock.response(obj).get_data()
+        assert fast.response(obj['nomes'][-3:]).get_data() == stock.response(obj['nomes'][-3:]).get_data()
@@ -0,0 +1,51 @@
+import time
+
+from src.models.ticket_event import TicketEvent
+from src.services import events, long_poll
+
+
+def _generate(client, headers):
+    response = client.post('/api/tickets/generate', headers=headers, json={'category_id': 1})
+    assert response.status_code == 201
+    return response.get_json()['ticket']['id']
+
+
+def test_recall_keeps_first_call(app, client, admin_headers):
+    ticket_id = _generate(client, admin_headers)
+
+    first = client.post(f'/api/tickets/{ticket_id}/call', headers=admin_headers, json={'counter_id': 1})
+    assert first.status_code == 200
+    second = client.post(f'/api/tickets/{ticket_id}/call', headers=admin_headers, json={'counter_id': 2})
+    assert second.status_code == 200
+    assert second.get_json()['ticket']['counter_id'] == 2
+
+    with app.app_context():
+        kinds = [event.kind for event in TicketEvent.query.filter_by(ticket_id=ticket_id).order_by(TicketEvent.seq)]
+    assert kinds == [events.GENERATED, events.CALLED, events.RECALLED]
+
+
+def test_finished_ticket_cannot_be_called(client, admin_headers):
+    ticket_id = _generate(client, admin_headers)
+    client.post(f'/api/tickets/{ticket_id}/call', headers=admin_headers, json={'counter_id': 1})
+    assert client.post(f'/api/tickets/{ticket_id}/finish', headers=admin_headers).status_code == 200
+
+    response = client.post(f'/api/tickets/{ticket_id}/call', headers=admin_headers, json={'counter_id': 1})
+    assert response.status_code == 400
+
+
+def test_events_answer_at_once_when_wait_slots_are_taken(app, client, admin_headers):
+    last_seq = client.get('/api/tickets/events', headers=admin_headers).get_json()['last_seq']
+
+    long_poll._semaphore = None
+    with app.app_context():
+        semaphore = long_poll._get_semaphore()
+    for _ in range(app.config['LONG_POLL_MAX_WAITERS']):
+        assert semaphore.acquire(blocking=False)
+    try:
+        start = time.monotonic()
+        response = client.get(f'/api/tickets/events?after={last_seq}&wait=5', headers=admin_headers)
+        assert response.status_code == 200
+        assert response.get_json()['events'] == []
+        assert time.monotonic() - start < 1
+    finally:
+        long_poll._semaphore = None
@@ -0,0 +1,22 @@
+from src.models.category import Category
+from src.models.counter import Counter
+from src.models.unit import Unit
+
+
+def test_archiving_a_unit_archives_its_counters_and_categories(app, client, admin_headers):
+    # A unidade 1 tem guichês e categorias: é arquivada em vez de excluída
+    response = client.delete('/api/units/1', headers=admin_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['archived'] is True
+    assert body['unit']['archived_at'] is not None
+
+    with app.app_context():
+        assert Unit.query.get(1) is not None
+        for model in (Counter, Category):
+            rows = model.query.filter_by(unit_id=1).all()
+            assert rows and all(not row.is_active and row.archived_at for row in rows)
+
+    # Categorias arquivadas não emitem senhas
+    response = client.post('/api/tickets/generate', json={'category_id': 1}, headers=admin_headers)
+    assert response.status_code == 400
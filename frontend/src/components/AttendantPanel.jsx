@@ -13,7 +13,10 @@ import {
   Users, 
   Clock,
   Plus,
-  RefreshCw
+  RefreshCw,
+  Play,
+  Pause,
+  LogOut
 } from 'lucide-react';
 
 export const AttendantPanel = () => {
@@ -24,6 +27,7 @@ export const AttendantPanel = () => {
   const [selectedCounter, setSelectedCounter] = useState('');
   const [selectedCategory, setSelectedCategory] = useState('');
   const [currentTicket, setCurrentTicket] = useState(null);
+  const [counterSession, setCounterSession] = useState(null);
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
 
@@ -37,6 +41,10 @@ export const AttendantPanel = () => {
     }
   }, [user]);
 
+  useEffect(() => {
+    loadCounterSession();
+  }, [selectedCounter]);
+
   const loadData = async () => {
     await Promise.all([
       loadQueue(),
@@ -78,6 +86,34 @@ export const AttendantPanel = () => {
     }
   };
 
+  const loadCounterSession = async () => {
+    if (!selectedCounter) {
+      setCounterSession(null);
+      return;
+    }
+
+    try {
+      setCounterSession(await apiClient.getCounterSession(selectedCounter));
+    } catch (error) {
+      // 404: guichê sem sessão aberta
+      setCounterSession(null);
+    }
+  };
+
+  // Os atendimentos só contam na utilização com a sessão do guichê aberta
+  const changeCounterSession = async (action, successMessage) => {
+    setLoading(true);
+    try {
+      const response = await apiClient.changeCounterSession(selectedCounter, action);
+      setCounterSession(response.session.status === 'closed' ? null : response.session);
+      setMessage(successMessage);
+    } catch (error) {
+      setMessage(`Erro: ${error.message}`);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const generateTicket = async () => {
     if (!selectedCategory) {
       setMessage('Selecione uma categoria');
@@ -261,6 +297,46 @@ export const AttendantPanel = () => {
                   </SelectContent>
                 </Select>
               </div>
+
+              {selectedCounter && (
+                <div className="flex items-center justify-between">
+                  <Badge variant={counterSession?.status === 'open' ? 'default' : 'secondary'}>
+                    {counterSession
+                      ? (counterSession.status === 'paused' ? 'Sessão em pausa' : 'Sessão aberta')
+                      : 'Sem sessão'}
+                  </Badge>
+                  <div className="flex gap-2">
+                    {!counterSession && (
+                      <Button size="sm" variant="outline" disabled={loading}
+                        onClick={() => changeCounterSession('open', 'Sessão aberta')}>
+                        <Play className="mr-1 h-4 w-4" />
+                        Abrir
+                      </Button>
+                    )}
+                    {counterSession?.status === 'open' && (
+                      <Button size="sm" variant="outline" disabled={loading}
+                        onClick={() => changeCounterSession('pause', 'Sessão pausada')}>
+                        <Pause className="mr-1 h-4 w-4" />
+                        Pausar
+                      </Button>
+                    )}
+                    {counterSession?.status === 'paused' && (
+                      <Button size="sm" variant="outline" disabled={loading}
+                        onClick={() => changeCounterSession('resume', 'Sessão retomada')}>
+                        <Play className="mr-1 h-4 w-4" />
+                        Retomar
+                      </Button>
+                    )}
+                    {counterSession && (
+                      <Button size="sm" variant="outline" disabled={loading}
+                        onClick={() => changeCounterSession('close', 'Sessão encerrada')}>
+                        <LogOut className="mr-1 h-4 w-4" />
+                        Encerrar
+                      </Button>
+                    )}
+                  </div>
+                </div>
+              )}
               
               <Button 
                 onClick={callNextTicket} 
@@ -15,7 +15,6 @@ export const PublicDisplay = () => {
   useEffect(() => {
     if (user?.unit_id) {
       loadDisplayData();
-      loadSettings();
       
       // Atualizar dados a cada 3 segundos
       const interval = setInterval(loadDisplayData, 3000);
@@ -26,8 +25,12 @@ export const PublicDisplay = () => {
   const loadDisplayData = async () => {
     try {
       if (user?.unit_id) {
+        // O snapshot do painel já inclui as configurações da unidade
         const data = await apiClient.getCurrentDisplay(user.unit_id);
         setDisplayData(data);
+        if (data.settings) {
+          setSettings(data.settings);
+        }
       }
     } catch (error) {
       console.error('Erro ao carregar dados do painel:', error);
@@ -36,17 +39,12 @@ export const PublicDisplay = () => {
     }
   };
 
-  const loadSettings = async () => {
-    try {
-      if (user?.unit_id) {
-        const data = await apiClient.getDisplaySettings(user.unit_id);
-        setSettings(data);
-        setSoundEnabled(data.sound_enabled);
-      }
-    } catch (error) {
-      console.error('Erro ao carregar configurações:', error);
+  // Aplica a preferência de som salva quando as configurações mudam
+  useEffect(() => {
+    if (settings) {
+      setSoundEnabled(settings.sound_enabled);
     }
-  };
+  }, [settings?.sound_enabled]);
 
   const playNotificationSound = () => {
     if (soundEnabled) {
@@ -69,12 +67,24 @@ export const PublicDisplay = () => {
     }
   };
 
-  // Tocar som quando uma nova senha é chamada
+  // Anúncio falado montado no servidor (trechos pré-gravados); sem ele, só o aviso sonoro
+  const playAnnouncement = (path) => {
+    if (!soundEnabled || !path) {
+      return;
+    }
+    const audio = new Audio(`${apiClient.baseURL}${path}`);
+    setTimeout(() => {
+      audio.play().catch((error) => console.error('Erro ao tocar anúncio:', error));
+    }, 500);
+  };
+
+  // Tocar som quando uma nova senha é chamada (ou rechamada)
   useEffect(() => {
     if (displayData?.current_ticket) {
       playNotificationSound();
+      playAnnouncement(displayData.announcement);
     }
-  }, [displayData?.current_ticket?.id]);
+  }, [displayData?.current_ticket?.id, displayData?.current_ticket?.called_at]);
 
   if (loading) {
     return (
@@ -43,6 +43,11 @@ class ApiClient {
         throw new Error(data.message || 'Erro na requisição');
       }
 
+      // Relatório ainda em processamento: acompanha o job até o resultado
+      if (response.status === 202 && data.job) {
+        return this.waitForJob(data.job);
+      }
+
       return data;
     } catch (error) {
       console.error('API Error:', error);
@@ -50,6 +55,21 @@ class ApiClient {
     }
   }
 
+  async waitForJob(job) {
+    let delay = 500;
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      delay = Math.min(delay * 2, 5000);
+      job = await this.request(`/reports/jobs/${job.id}`);
+    }
+
+    if (job.status !== 'done') {
+      throw new Error(job.error || 'Erro ao gerar relatório');
+    }
+
+    return this.request(`/reports/jobs/${job.id}/result`);
+  }
+
   // Métodos de autenticação
   async login(credentials) {
     const response = await this.request('/auth/login', {
@@ -97,6 +117,17 @@ class ApiClient {
     });
   }
 
+  // Sessão do atendente no guichê (action: open, pause, resume ou close)
+  async getCounterSession(counterId) {
+    return this.request(`/counters/${counterId}/session`);
+  }
+
+  async changeCounterSession(counterId, action) {
+    return this.request(`/counters/${counterId}/session/${action}`, {
+      method: 'POST',
+    });
+  }
+
   // Métodos de categorias
   async getCategories(unitId = null) {
     const params = unitId ? `?unit_id=${unitId}` : '';
@@ -32,6 +32,10 @@ print_step() {
     echo -e "${BLUE}[STEP]${NC} $1"
 }
 
+# Proxy reverso: USE_NGINX=1 ./install.sh instala o site do nginx na frente da
+# API; só então a aplicação confia no X-Forwarded-For (TRUSTED_PROXY_HOPS=1)
+USE_NGINX="${USE_NGINX:-0}"
+
 # Verificar se o sistema é Linux
 if [[ "$OSTYPE" != "linux-gnu"* ]]; then
     print_error "Este script é compatível apenas com sistemas Linux"
@@ -117,6 +121,10 @@ print_message "Instalando dependências Python..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Criar banco de dados e dados iniciais (uma vez; o comando é idempotente)
+print_message "Inicializando banco de dados..."
+FLASK_APP=src.main flask init-db
+
 # Criar arquivo de configuração
 print_message "Criando arquivo de configuração..."
 cat > config.py << EOF
@@ -151,11 +159,28 @@ cat > start_backend.sh << 'EOF'
 cd "$(dirname "$0")"
 source venv/bin/activate
 export FLASK_ENV=production
-python src/main.py
+# Atrás do nginx instalado pelo install.sh (USE_NGINX=1): proxy confiável e API só local
+[ -f proxy.env ] && source proxy.env
+# Aplica ajustes de esquema pendentes e comprime os arquivos estáticos novos
+FLASK_APP=src.main flask init-db
+FLASK_APP=src.main flask assets compress
+exec gunicorn -c gunicorn.conf.py src.main:app
 EOF
 
 chmod +x start_backend.sh
 
+# Recarrega o código sem interromper o atendimento (novo mestre, depois encerra o antigo)
+cat > reload_backend.sh << 'EOF'
+#!/bin/bash
+cd "$(dirname "$0")"
+OLD_PID=$(cat gunicorn.pid)
+kill -USR2 "$OLD_PID"
+sleep 5
+kill -QUIT "$OLD_PID"
+EOF
+
+chmod +x reload_backend.sh
+
 print_message "Backend configurado ✓"
 
 # Configurar Frontend
@@ -240,7 +265,8 @@ cat > stop_system.sh << 'EOF'
 
 echo "🛑 Parando Sistema de Painel de Senhas..."
 
-# Parar processos Python (Flask)
+# Parar processos Python (gunicorn ou servidor de desenvolvimento)
+pkill -f "gunicorn.*src.main" || true
 pkill -f "python.*main.py" || true
 
 # Parar processos Node.js (Vite)
@@ -272,6 +298,7 @@ echo "🐍 Atualizando backend..."
 cd backend
 source venv/bin/activate
 pip install --upgrade -r requirements.txt
+FLASK_APP=src.main flask init-db
 cd ..
 
 # Atualizar dependências do frontend
@@ -315,8 +342,11 @@ EOF
     print_message "Para iniciar: sudo systemctl start sistema-painel-senhas"
 fi
 
-# Criar arquivo de configuração do Nginx (opcional)
-cat > nginx.conf << 'EOF'
+# Configurar Nginx (opcional, USE_NGINX=1)
+if [ "$USE_NGINX" = "1" ]; then
+    print_step "Configurando Nginx..."
+    
+    cat > nginx.conf << 'EOF'
 server {
     listen 80;
     server_name localhost;
@@ -340,8 +370,27 @@ server {
     }
 }
 EOF
-
-print_message "Configuração Nginx criada em: nginx.conf"
+    
+    if [ -d /etc/nginx/sites-available ]; then
+        sudo cp nginx.conf /etc/nginx/sites-available/sistema-painel-senhas
+        sudo ln -sf /etc/nginx/sites-available/sistema-painel-senhas /etc/nginx/sites-enabled/sistema-painel-senhas
+        sudo nginx -t && sudo systemctl reload nginx
+        print_message "Site Nginx instalado: /etc/nginx/sites-available/sistema-painel-senhas"
+    else
+        print_warning "Nginx não encontrado; copie nginx.conf para a configuração do Nginx"
+    fi
+    
+    # O IP do cliente (limite de login por IP) passa a vir do X-Forwarded-For do
+    # nginx; a API escuta só localmente para que ninguém forje esse cabeçalho
+    cat > backend/proxy.env << 'EOF'
+export TRUSTED_PROXY_HOPS=1
+export GUNICORN_BIND=127.0.0.1:5000
+EOF
+    
+    print_message "Configuração Nginx criada em: nginx.conf ✓"
+else
+    print_message "Nginx não configurado: API acessada diretamente (USE_NGINX=1 instala o proxy)"
+fi
 
 # Criar README de instalação
 cat > INSTALACAO.md << 'EOF'